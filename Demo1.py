@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import plotly.graph_objects as go
-import pyodbc  # To interact with MS SQL
+from db_writer import ForecastWriter, MSSQLBackend  # To interact with MS SQL
+from export import ExportCache, export_buttons
+from feature_store import FeatureStore
+from forecasting import PROPHET_PARAMS, calculate_metrics, make_predictions
+from incremental import IncrementalTrainer, predict_prophet_rows, run_incremental_parallel, warm_start_prophet
+from ingest_cache import PROPHET_SPEC, load_columnar
+from instrumentation import PROFILERS, RunProfiler, session_recorder, sidebar_panel, span
+from jobs import JobScheduler, show_progress
+from model_cache import ModelCache
+from parallel_training import fit_prophet_target
+from plotting import FigureCache, bar, figure_key, scatter
+from sql_source import PROPHET_SOURCE, REFRESH_SECONDS, SQLSource
+from stage_graph import param_token
+from startup import schedule_prewarm
+import uuid
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -12,58 +24,134 @@ st.set_page_config(page_title="Supply and Demand Forecasting", page_icon="📈",
 st.title('Supply and Demand Forecasting App')
 #st.sidebar.image("E:\\Adarsh\\AI\\Recco_Demo\\Supply_Demand_Forecasting\\AllBatteryArrow-removebg-preview.png", use_column_width=True)
 
+# Stage spans (wall/CPU time, peak RSS, rows) of this session's runs, shown in the sidebar panel
+recorder = session_recorder(st.session_state)
+run_profiler = None
+if st.sidebar.checkbox("Profile this run"):
+    try:
+        run_profiler = RunProfiler(st.sidebar.selectbox("Profiler", PROFILERS)).start()
+    except ImportError as e:
+        st.sidebar.warning(str(e))
+
 # Database connection details (adjust with your own credentials)
 server = 'iallombardia.database.windows.net'  # e.g., 'localhost\\SQLEXPRESS'
 database = 'IAL_Lombardia_DB'
 username = 'dbuser2'
 password = 'Welcome@12345'
 
+@st.cache_resource
+def get_model_cache():
+    return ModelCache()
+
+model_cache = get_model_cache()
+incremental_trainer = IncrementalTrainer(model_cache)
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+figure_cache = get_figure_cache()
+
+@st.cache_resource
+def get_export_cache():
+    return ExportCache()
+
+@st.cache_resource
+def get_feature_store():
+    # Frames the process pool reads: written once, memory-mapped by every worker
+    return FeatureStore()
+
+@st.cache_resource
+def get_forecast_writer():
+    # One pooled writer per server process, reused across clicks and sessions
+    return ForecastWriter(MSSQLBackend(server, database, username, password), pool_size=4, chunk_size=1000)
+
+@st.cache_resource
+def get_sql_source():
+    # History mirrored from the database; refreshes fetch only rows since the last one
+    return SQLSource(MSSQLBackend(server, database, username, password), PROPHET_SOURCE)
+
+@st.cache_resource
+def get_job_scheduler():
+    # Shared by all sessions, so the same forecast stored from several sessions is written once
+    return JobScheduler(max_workers=2)
+
+if 'job_owner' not in st.session_state:
+    st.session_state['job_owner'] = uuid.uuid4().hex
+
 def insert_to_db(forecast_df):
+    # Batched insert into a staging table, then MERGE so repeated clicks don't duplicate rows.
+    # The write runs in the background; the job key is polled from the session state.
     try:
-        # Establish connection to MS SQL
-        conn = pyodbc.connect(f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = conn.cursor()
-        
-        # Create table if not exists (adjust columns according to your needs)
-        cursor.execute('''
-        IF OBJECT_ID('ForecastResults', 'U') IS NULL
-        CREATE TABLE ForecastResults (
-            ForecastDate DATE,
-            SupplyForecast FLOAT,
-            DemandForecast FLOAT
-        )
-        ''')
-
-        # Insert rows
-        for _, row in forecast_df.iterrows():
-            cursor.execute('''
-                INSERT INTO ForecastResults (ForecastDate, SupplyForecast, DemandForecast)
-                VALUES (?, ?, ?)
-            ''', row['Forecast Date'], row['Supply Forecast (USD)'], row['Demand Forecast (%)'])
-
-        conn.commit()  # Commit the transaction
-        st.success("Predicted values have been stored in the database!")
+        writer = get_forecast_writer()
     except Exception as e:
         st.error(f"Error storing data in the database: {e}")
-    finally:
-        conn.close()  # Close the connection
-
-uploaded_file = st.file_uploader("Upload your Excel file for forecasting", type=["xlsx"])
-
-if uploaded_file is not None:
-    with st.spinner('Loading your data...'):
+        return
+    key = f"db_write-{param_token(forecast_df)}"
+    get_job_scheduler().submit(key, writer.write, forecast_df, name='Storing forecast',
+                               owner=st.session_state['job_owner'])
+    st.session_state['db_job'] = key
+
+def show_db_status():
+    job = get_job_scheduler().get(st.session_state.get('db_job'))
+    if job is None:
+        return
+    if job.status == 'done':
+        st.success(f"Predicted values have been stored in the database! "
+                   f"({job.result['rows']} rows, {job.result['rows_per_second']:.0f} rows/s)")
+    elif job.status == 'failed':
+        st.error(f"Error storing data in the database: {job.error}")
+    elif not job.finished:
+        show_progress(get_job_scheduler(), job.key)
+
+data_source = st.radio("Data source", ['Excel upload', 'Database'], horizontal=True)
+df = None
+
+if data_source == 'Excel upload':
+    uploaded_file = st.file_uploader("Upload your Excel file for forecasting", type=["xlsx"])
+    if uploaded_file is not None:
+        with st.spinner('Loading your data...'):
+            try:
+                # Parsed once per upload (only the needed columns), then memory-mapped from the Arrow cache
+                with span('ingest') as record:
+                    df = load_columnar(uploaded_file.getvalue(), PROPHET_SPEC)
+                    record['rows'] = len(df)
+                st.success('Your data loaded successfully!')
+            except Exception as e:
+                st.error(f"Error loading data: {e}")
+else:
+    with st.spinner('Loading history from the database...'):
         try:
-            df = pd.read_excel(uploaded_file, sheet_name='Sheet1')
-            st.success('Your data loaded successfully!')
+            # Only rows since the mirror's high-water mark are fetched, at most every REFRESH_SECONDS
+            sql_source = get_sql_source()
+            refresh = sql_source.refresh(max_age=0 if st.button("Refresh now") else REFRESH_SECONDS)
+            with span('ingest') as record:
+                df = sql_source.load()
+                record['rows'] = len(df)
+            if refresh['skipped']:
+                st.success(f"Loaded {len(df)} days from the database (watermark {refresh['watermark']})")
+            else:
+                st.success(f"Fetched {refresh['fetched_rows']} new days ({refresh['fetched_bytes'] / 1e3:.1f} kB) "
+                           f"from the database in {refresh['seconds']:.2f}s")
         except Exception as e:
-            st.error(f"Error loading data: {e}")
+            st.error(f"Error loading data from the database: {e}")
+
+if df is not None:
     st.markdown("### Accuracy Metrics")
     try:
-        df['Date of Extraction Process'] = pd.to_datetime(df['Date of Extraction Process'])
-
         # Prepare the data for Prophet for both supply and demand forecasts
-        df_supply = df[['Date of Extraction Process', 'Cobalt Market Value (USD)']].rename(columns={'Date of Extraction Process': 'ds', 'Cobalt Market Value (USD)': 'y'})
-        df_demand = df[['Date of Extraction Process', 'Recycled Content (%)']].rename(columns={'Date of Extraction Process': 'ds', 'Recycled Content (%)': 'y'})
+        with span('clean', rows=len(df)):
+            df_supply = df[['Date of Extraction Process', 'Cobalt Market Value (USD)']].rename(columns={'Date of Extraction Process': 'ds', 'Cobalt Market Value (USD)': 'y'})
+            df_demand = df[['Date of Extraction Process', 'Recycled Content (%)']].rename(columns={'Date of Extraction Process': 'ds', 'Recycled Content (%)': 'y'})
+
+        # The fit workers read the ingested frame from the feature store by handle. It is
+        # only written (and hashed) when a fit is actually sent to the pool.
+        stored = {}
+        def fit_kwargs(column):
+            if 'frame' not in stored:
+                stored['frame'] = get_feature_store().put(df)
+            return {'df_series': stored['frame'].select(['Date of Extraction Process', column], names=['ds', 'y']),
+                    'params': PROPHET_PARAMS, 'store_fitted': True}
 
         data_points = len(df_supply)
         print("value of df_supply")
@@ -73,34 +161,38 @@ if uploaded_file is not None:
         if forecast_horizon < 1:
             st.error("Not enough data for forecasting. Please upload more historical data.")
         else:
-            supply_model = Prophet(yearly_seasonality=True, weekly_seasonality=True, seasonality_mode='multiplicative')
-            supply_model.fit(df_supply)
-
-            demand_model = Prophet(yearly_seasonality=True, weekly_seasonality=True, seasonality_mode='multiplicative')
-            demand_model.fit(df_demand)
-
-            future_supply = supply_model.make_future_dataframe(periods=forecast_horizon)
-            supply_forecast = supply_model.predict(future_supply)
-
-            future_demand = demand_model.make_future_dataframe(periods=forecast_horizon)
-            demand_forecast = demand_model.predict(future_demand)
+            # Fit both series at the same time (one cmdstan process each); fitted models
+            # are cached on the input series and params, so reruns skip the Stan fit, and
+            # uploads that only append rows warm-start Stan from the previous fit
+            with st.spinner('Fitting supply and demand models...'), span('fit', rows=len(df_supply) + len(df_demand)):
+                trained, actions = run_incremental_parallel(incremental_trainer, {
+                    name: {
+                        'kind': 'prophet', 'frame': df_series, 'target': 'y', 'features': ['ds'], 'params': PROPHET_PARAMS,
+                        'fn': fit_prophet_target, 'kwargs': lambda column=column: fit_kwargs(column),
+                        'warm_fn': lambda previous, df_series=df_series: warm_start_prophet(df_series, previous, PROPHET_PARAMS, store_fitted=True),
+                        'predict': predict_prophet_rows,
+                    }
+                    for name, df_series, column in (('supply', df_supply, 'Cobalt Market Value (USD)'),
+                                                    ('demand', df_demand, 'Recycled Content (%)'))
+                })
+            st.caption(f"Supply model: {actions['supply']}, demand model: {actions['demand']}")
+            supply_model = trained['supply']
+            demand_model = trained['demand']
+
+            # Only the horizon is predicted; in-sample values come from the per-model cache
+            # and intervals are analytic instead of Monte Carlo sampled
+            supply_forecast, demand_forecast = make_predictions(supply_model, demand_model, forecast_horizon, mode='fast')
 
             merged_supply = pd.merge(df_supply, supply_forecast[['ds', 'yhat']], on='ds', how='left')
             merged_demand = pd.merge(df_demand, demand_forecast[['ds', 'yhat']], on='ds', how='left')
 
-            supply_mae = mean_absolute_error(merged_supply['y'], merged_supply['yhat'])
-            supply_rmse = mean_squared_error(merged_supply['y'], merged_supply['yhat'], squared=False)
-            supply_r2 = r2_score(merged_supply['y'], merged_supply['yhat'])
-
-            demand_mae = mean_absolute_error(merged_demand['y'], merged_demand['yhat'])
-            demand_rmse = mean_squared_error(merged_demand['y'], merged_demand['yhat'], squared=False)
-            demand_r2 = r2_score(merged_demand['y'], merged_demand['yhat'])
+            supply_mae, supply_rmse, supply_r2, demand_mae, demand_rmse, demand_r2 = calculate_metrics(merged_supply, merged_demand)
 
             st.write(f"**Supply Forecast (Prophet) - MAE:** {supply_mae:.2f}, **RMSE:** {supply_rmse:.2f}, **R²:** {supply_r2:.2f}")
             st.write(f"**Demand Forecast (Prophet) - MAE:** {demand_mae:.2f}, **RMSE:** {demand_rmse:.2f}, **R²:** {demand_r2:.2f}")
 
             forecast_df = pd.DataFrame({
-                'Forecast Date': future_supply['ds'],
+                'Forecast Date': supply_forecast['ds'],
                 'Supply Forecast (USD)': supply_forecast['yhat'],
                 'Demand Forecast (%)': demand_forecast['yhat']
             })
@@ -108,112 +200,134 @@ if uploaded_file is not None:
             st.subheader(f"Forecasted Supply and Demand Values ")
             st.dataframe(forecast_df)
 
-            st.download_button(
-                label="Download Forecasted Supply and Demand Data",
-                data=forecast_df.to_csv(index=False),
-                file_name="forecasted_supply_demand.csv",
-                mime="text/csv"
-            )
+            # Encoded on request, in chunks, and kept per forecast version and format
+            export_buttons(get_export_cache(), forecast_df, "forecasted_supply_demand",
+                           "Download Forecasted Supply and Demand Data")
 
             # Button to store the predicted values in MS SQL database
             if st.button('Store Predicted Values in Database'):
                 insert_to_db(forecast_df)
+            show_db_status()
+
+            # Long histories are LTTB-decimated (WebGL above the point threshold) and zooming in
+            # redraws just the selected range at full resolution; built figures are cached per dataset
+            full_range = (forecast_df['Forecast Date'].min().to_pydatetime(), forecast_df['Forecast Date'].max().to_pydatetime())
+            x_range = None
+            if full_range[0] < full_range[1]:
+                plot_range = st.slider("Plot date range", min_value=full_range[0], max_value=full_range[1], value=full_range)
+                if tuple(plot_range) != full_range:
+                    x_range = (pd.Timestamp(plot_range[0]), pd.Timestamp(plot_range[1]))
 
             # ========== Actual vs Predicted Supply Area Plot ========== 
             st.subheader("Actual vs Predicted Supply Area Plot")
-            supply_fig = go.Figure()
-
-            supply_fig.add_trace(go.Scatter(
-                x=merged_supply['ds'], 
-                y=merged_supply['y'],
-                mode='lines', name='Actual Supply (USD)',
-                fill='tozeroy', line=dict(color='blue')
-            ))
-
-            supply_fig.add_trace(go.Scatter(
-                x=merged_supply['ds'], 
-                y=merged_supply['yhat'],
-                mode='lines', name='Predicted Supply (USD)',
-                fill='tozeroy', line=dict(color='red')
-            ))
-
-            supply_fig.update_layout(
-                title='Actual vs Predicted Supply (Area Plot)',
-                xaxis_title='Date',
-                yaxis_title='Supply Value (USD)',
-                legend_title='Supply',
-            )
-
+            def build_supply_fig():
+                supply_fig = go.Figure()
+
+                supply_fig.add_trace(scatter(
+                    merged_supply['ds'], merged_supply['y'], x_range,
+                    mode='lines', name='Actual Supply (USD)',
+                    fill='tozeroy', line=dict(color='blue')
+                ))
+
+                supply_fig.add_trace(scatter(
+                    merged_supply['ds'], merged_supply['yhat'], x_range,
+                    mode='lines', name='Predicted Supply (USD)',
+                    fill='tozeroy', line=dict(color='red')
+                ))
+
+                supply_fig.update_layout(
+                    title='Actual vs Predicted Supply (Area Plot)',
+                    xaxis_title='Date',
+                    yaxis_title='Supply Value (USD)',
+                    legend_title='Supply',
+                )
+                return supply_fig
+
+            with span('plot', rows=len(merged_supply)):
+                supply_fig = figure_cache.get_or_build(figure_key('supply_fig', merged_supply, x_range=x_range), build_supply_fig)
             st.plotly_chart(supply_fig)
 
             # ========== Actual vs Predicted Demand ========== 
             st.subheader("Actual vs Predicted Demand Area Plot")
-            demand_fig = go.Figure()
-
-            demand_fig.add_trace(go.Scatter(
-                x=merged_demand['ds'], 
-                y=merged_demand['y'],
-                mode='lines', name='Actual Demand (%)',
-                fill='tozeroy', line=dict(color='green')
-            ))
-
-            demand_fig.add_trace(go.Scatter(
-                x=merged_demand['ds'], 
-                y=merged_demand['yhat'],
-                mode='lines', name='Predicted Demand (%)',
-                fill='tozeroy', line=dict(color='orange')
-            ))
-
-            demand_fig.update_layout(
-                title='Actual vs Predicted Demand (Area Plot)',
-                xaxis_title='Date',
-                yaxis_title='Demand Value (%)',
-                legend_title='Demand',
-            )
-
+            def build_demand_fig():
+                demand_fig = go.Figure()
+
+                demand_fig.add_trace(scatter(
+                    merged_demand['ds'], merged_demand['y'], x_range,
+                    mode='lines', name='Actual Demand (%)',
+                    fill='tozeroy', line=dict(color='green')
+                ))
+
+                demand_fig.add_trace(scatter(
+                    merged_demand['ds'], merged_demand['yhat'], x_range,
+                    mode='lines', name='Predicted Demand (%)',
+                    fill='tozeroy', line=dict(color='orange')
+                ))
+
+                demand_fig.update_layout(
+                    title='Actual vs Predicted Demand (Area Plot)',
+                    xaxis_title='Date',
+                    yaxis_title='Demand Value (%)',
+                    legend_title='Demand',
+                )
+                return demand_fig
+
+            with span('plot', rows=len(merged_demand)):
+                demand_fig = figure_cache.get_or_build(figure_key('demand_fig', merged_demand, x_range=x_range), build_demand_fig)
             st.plotly_chart(demand_fig)
 
             # ========== Forecasted Supply (Bar Plot) ========== 
             st.subheader(f"Forecasted Supply Bar Plot")
-            supply_forecast_bar_fig = go.Figure()
-
-            supply_forecast_bar_fig.add_trace(go.Bar(
-                x=forecast_df['Forecast Date'], 
-                y=forecast_df['Supply Forecast (USD)'],
-                name='Supply Forecast (USD)',
-                marker=dict(color='red')
-            ))
-
-            supply_forecast_bar_fig.update_layout(
-                title=f'Forecasted Supply ',
-                xaxis_title='Date',
-                yaxis_title='Supply Value (USD)',
-                legend_title='Forecasts',
-            )
-
+            def build_supply_forecast_bar_fig():
+                supply_forecast_bar_fig = go.Figure()
+
+                supply_forecast_bar_fig.add_trace(bar(
+                    forecast_df['Forecast Date'], forecast_df['Supply Forecast (USD)'], x_range,
+                    name='Supply Forecast (USD)',
+                    marker=dict(color='red')
+                ))
+
+                supply_forecast_bar_fig.update_layout(
+                    title=f'Forecasted Supply ',
+                    xaxis_title='Date',
+                    yaxis_title='Supply Value (USD)',
+                    legend_title='Forecasts',
+                )
+                return supply_forecast_bar_fig
+
+            with span('plot', rows=len(forecast_df)):
+                supply_forecast_bar_fig = figure_cache.get_or_build(figure_key('supply_forecast_bar_fig', forecast_df[['Forecast Date', 'Supply Forecast (USD)']], x_range=x_range), build_supply_forecast_bar_fig)
             st.plotly_chart(supply_forecast_bar_fig)
 
             # ========== Forecasted Demand ========== 
             st.subheader(f"Forecasted Demand Bar Plot ")
-            demand_forecast_bar_fig = go.Figure()
-
-            demand_forecast_bar_fig.add_trace(go.Bar(
-                x=forecast_df['Forecast Date'], 
-                y=forecast_df['Demand Forecast (%)'],
-                name='Demand Forecast (%)',
-                marker=dict(color='green')
-            ))
-
-            demand_forecast_bar_fig.update_layout(
-                title=f'Forecasted Demand ',
-                xaxis_title='Date',
-                yaxis_title='Demand Value (%)',
-                legend_title='Forecasts',
-            )
-
+            def build_demand_forecast_bar_fig():
+                demand_forecast_bar_fig = go.Figure()
+
+                demand_forecast_bar_fig.add_trace(bar(
+                    forecast_df['Forecast Date'], forecast_df['Demand Forecast (%)'], x_range,
+                    name='Demand Forecast (%)',
+                    marker=dict(color='green')
+                ))
+
+                demand_forecast_bar_fig.update_layout(
+                    title=f'Forecasted Demand ',
+                    xaxis_title='Date',
+                    yaxis_title='Demand Value (%)',
+                    legend_title='Forecasts',
+                )
+                return demand_forecast_bar_fig
+
+            with span('plot', rows=len(forecast_df)):
+                demand_forecast_bar_fig = figure_cache.get_or_build(figure_key('demand_forecast_bar_fig', forecast_df[['Forecast Date', 'Demand Forecast (%)']], x_range=x_range), build_demand_forecast_bar_fig)
             st.plotly_chart(demand_forecast_bar_fig)
 
     except Exception as e:
         st.error(f"Error during processing: {e}")
-else:
-    st.write("Please upload an Excel file to proceed.")
\ No newline at end of file
+elif data_source == 'Excel upload':
+    st.write("Please upload an Excel file to proceed.")
+
+sidebar_panel(recorder, run_profiler.stop() if run_profiler else None)
+# Optional (FORECAST_PREWARM=1): once the page is out, import Prophet and load recent
+# models in the background so the first forecast doesn't pay for them
+schedule_prewarm(get_job_scheduler(), 'prophet', model_cache)
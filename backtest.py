@@ -0,0 +1,245 @@
+import json
+import logging
+import numbers
+import os
+import time
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from feature_store import resolve
+from grouped_metrics import METRIC_COLUMNS, series_metrics
+from parallel_training import get_executor, thread_budget
+
+logger = logging.getLogger('Backtest')
+
+WINDOWS = ['expanding', 'sliding']
+RESULT_COLUMNS = ['cutoff', 'train_start', 'train_rows', 'test_rows', 'warm_start', 'seconds'] + METRIC_COLUMNS
+
+
+# Function to read integers (Python or NumPy) as days and anything else as a Timedelta
+def _as_timedelta(value):
+    return pd.Timedelta(days=int(value)) if isinstance(value, numbers.Integral) else pd.Timedelta(value)
+
+
+# Function to list rolling-origin cutoffs as (train_start, cutoff) pairs. The first cutoff
+# leaves `initial` of history, later ones move forward by `period`, and every cutoff has a
+# full `horizon` of data after it. Sliding windows keep the training span at `initial`.
+def make_cutoffs(dates, initial, horizon, period, window='expanding'):
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window {window!r}, expected one of {WINDOWS}")
+    initial, horizon, period = _as_timedelta(initial), _as_timedelta(horizon), _as_timedelta(period)
+    dates = pd.to_datetime(pd.Series(dates))
+    first, last = dates.min(), dates.max()
+
+    cutoffs = []
+    cutoff = first + initial
+    while cutoff + horizon <= last:
+        cutoffs.append((cutoff - initial if window == 'sliding' else first, cutoff))
+        cutoff += period
+    return cutoffs
+
+
+# Function to fit Prophet (or its least-squares stand-in) on one cutoff's training rows
+def _fit_prophet(train, date_column, target_column, feature_columns, params, threads, engine='prophet'):
+    from forecasting import fit_prophet_model
+    return fit_prophet_model(train[[date_column, target_column]].set_axis(['ds', 'y'], axis=1), params, engine)
+
+
+# Function to refit Prophet from the previous cutoff's Stan parameters
+def _warm_prophet(train, date_column, target_column, feature_columns, params, threads, previous):
+    from incremental import warm_start_prophet
+    return warm_start_prophet(train[[date_column, target_column]].set_axis(['ds', 'y'], axis=1), previous, params)
+
+
+# Function to predict one cutoff's test dates with a Prophet model
+def _predict_prophet(model, test, date_column, feature_columns):
+    return model.predict(pd.DataFrame({'ds': test[date_column].to_numpy()}))['yhat'].to_numpy()
+
+
+# Function to fit the least-squares Prophet engine
+def _fit_numpy(train, date_column, target_column, feature_columns, params, threads):
+    return _fit_prophet(train, date_column, target_column, feature_columns, params, threads, engine='numpy')
+
+
+# Function to fit CatBoost on one cutoff's training rows, continuing previous when given
+def _fit_catboost(train, date_column, target_column, feature_columns, params, threads, previous=None):
+    from catboost import CatBoostRegressor
+    params = {k: v for k, v in params.items() if k != 'update_iterations'}
+    model = CatBoostRegressor(**params, thread_count=threads)
+    model.fit(train[feature_columns], train[target_column], init_model=previous)
+    return model
+
+
+# A warm-started CatBoost model only adds update_iterations trees on top of the previous cutoff's model
+def _warm_catboost(train, date_column, target_column, feature_columns, params, threads, previous):
+    params = {**params, 'iterations': params.get('update_iterations', 100)}
+    return _fit_catboost(train, date_column, target_column, feature_columns, params, threads, previous)
+
+
+# Function to predict one cutoff's test rows with a CatBoost model
+def _predict_catboost(model, test, date_column, feature_columns):
+    return model.predict(test[feature_columns])
+
+
+# Engine name: (fit, warm, predict). warm is None where warm starts don't apply (the
+# least-squares fit is already cheap)
+ENGINES = {
+    'prophet': (_fit_prophet, _warm_prophet, _predict_prophet),
+    'numpy': (_fit_numpy, None, _predict_prophet),
+    'catboost': (_fit_catboost, _warm_catboost, _predict_catboost),
+}
+
+
+def _default_params(engine):
+    if engine == 'catboost':
+        from batch_forecast import CATBOOST_PARAMS
+        return {**CATBOOST_PARAMS, 'update_iterations': 100}
+    from forecasting import PROPHET_PARAMS
+    # Backtests only need yhat, so Prophet's interval sampling is skipped
+    return {**PROPHET_PARAMS, 'uncertainty_samples': 0}
+
+
+# Function run in a worker: evaluate consecutive cutoffs of one series, warm-starting each
+# fit from the previous cutoff's model. Only metrics are returned, never forecast frames.
+# series is the run's rows, or a feature store handle to them.
+def _backtest_chunk(key, series, cutoffs, engine, date_column, target_column, feature_columns, horizon, params,
+                    warm_start, threads=1):
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    series = resolve(series)
+    fit, warm, predict = ENGINES[engine]
+    rows = []
+    previous = None
+    for train_start, cutoff in cutoffs:
+        train = series[(series[date_column] >= train_start) & (series[date_column] <= cutoff)]
+        test = series[(series[date_column] > cutoff) & (series[date_column] <= cutoff + horizon)]
+        start = time.perf_counter()
+        row = {'key': key, 'cutoff': cutoff, 'train_start': train_start, 'train_rows': len(train),
+               'test_rows': len(test), 'warm_start': False}
+        try:
+            if warm_start and warm is not None and previous is not None:
+                model = warm(train, date_column, target_column, feature_columns, params, threads, previous)
+                row['warm_start'] = True
+            else:
+                model = fit(train, date_column, target_column, feature_columns, params, threads)
+            row.update(series_metrics(test[target_column].to_numpy(), predict(model, test, date_column, feature_columns)))
+            previous = model
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+            previous = None
+        row['seconds'] = time.perf_counter() - start
+        rows.append(row)
+    return rows
+
+
+# Function to backtest every series over rolling-origin cutoffs across a worker pool,
+# yielding one metrics dict per (series, cutoff) as soon as its chunk finishes.
+# Each task is a run of cutoffs_per_task adjacent cutoffs of one series, so warm starts
+# carry over between neighbours while separate runs spread across workers.
+# With a FeatureStore, the sorted series are written to it once and each task is sent a
+# handle to its rows instead of a pickled copy of them. group_params optionally gives a
+# series (by its group key) its own params.
+def iter_backtest(df, date_column, target_column, horizon, initial, period, group_keys=None, engine='prophet',
+                  feature_columns=None, params=None, window='expanding', warm_start=True, max_workers=None,
+                  cutoffs_per_task=10, feature_store=None, group_params=None):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {sorted(ENGINES)}")
+    group_keys = list(group_keys or [])
+    feature_columns = list(feature_columns or [])
+    params = _default_params(engine) if params is None else params
+    horizon_delta = _as_timedelta(horizon)
+
+    columns = list(dict.fromkeys(group_keys + [date_column, target_column] + feature_columns))
+    frame = df[columns].assign(**{date_column: pd.to_datetime(df[date_column])})
+    if group_keys:
+        groups = frame.groupby(group_keys if len(group_keys) > 1 else group_keys[0], sort=True, observed=True)
+    else:
+        groups = [(None, frame)]
+
+    value_columns = list(dict.fromkeys([date_column, target_column] + feature_columns))
+    ordered, offset, runs = [], 0, []
+    for key, series in groups:
+        series = series.sort_values(date_column, kind='stable').reset_index(drop=True)
+        cutoffs = make_cutoffs(series[date_column], initial, horizon, period, window)
+        for i in range(0, len(cutoffs), cutoffs_per_task):
+            run = cutoffs[i:i + cutoffs_per_task]
+            # Ship only the rows this run of cutoffs touches, a contiguous range of the sorted series
+            start = offset + int(series[date_column].searchsorted(run[0][0], side='left'))
+            stop = offset + int(series[date_column].searchsorted(run[-1][1] + horizon_delta, side='right'))
+            runs.append((key, start, stop, run))
+        ordered.append(series[value_columns])
+        offset += len(series)
+
+    stored = pd.concat(ordered, ignore_index=True) if ordered else frame[value_columns].iloc[:0]
+    if feature_store is not None:
+        handle = feature_store.put(stored)
+        tasks = [(key, handle.take(start, stop), run) for key, start, stop, run in runs]
+    else:
+        tasks = [(key, stored.iloc[start:stop], run) for key, start, stop, run in runs]
+    logger.info(f"Backtesting {sum(len(run) for _, _, run in tasks)} cutoff(s) in {len(tasks)} task(s) with {engine}")
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(tasks) or 1))
+    threads = thread_budget(max_workers)
+    group_params = group_params or {}
+
+    def args(key):
+        return (engine, date_column, target_column, feature_columns, horizon_delta, group_params.get(key, params),
+                warm_start)
+
+    def label(rows):
+        for row in rows:
+            key = row.pop('key')
+            key = key if isinstance(key, tuple) else (key,)
+            yield {**dict(zip(group_keys, key)), **row}
+
+    if max_workers == 1:
+        for key, span, run in tasks:
+            yield from label(_backtest_chunk(key, span, run, *args(key), threads=threads))
+        return
+
+    executor = get_executor(max_workers, threads)
+    futures = {executor.submit(_backtest_chunk, key, span, run, *args(key), threads=threads): (key, run)
+               for key, span, run in tasks}
+    for future in as_completed(futures):
+        key, run = futures[future]
+        try:
+            rows = future.result()
+        except Exception as e:
+            # A crashed worker only fails the cutoffs it was given
+            rows = [{'key': key, 'cutoff': cutoff, 'train_start': train_start, 'error': f"{type(e).__name__}: {e}"}
+                    for train_start, cutoff in run]
+        yield from label(rows)
+
+
+# Function to run a backtest to completion. Rows are appended to `output` (JSON lines)
+# as they arrive, and returned as one frame sorted by series and cutoff.
+def run_backtest(df, date_column, target_column, horizon, initial, period, group_keys=None, output=None,
+                 progress=None, **kwargs):
+    group_keys = list(group_keys or [])
+    rows = []
+    sink = open(output, 'a') if output else None
+    try:
+        for row in iter_backtest(df, date_column, target_column, horizon, initial, period, group_keys, **kwargs):
+            rows.append(row)
+            if sink is not None:
+                sink.write(json.dumps(row, default=str) + '\n')
+                sink.flush()
+            if progress is not None:
+                progress(len(rows))
+    finally:
+        if sink is not None:
+            sink.close()
+
+    results = pd.DataFrame(rows, columns=list(dict.fromkeys(group_keys + RESULT_COLUMNS + [c for r in rows for c in r])))
+    return results.sort_values(group_keys + ['cutoff'], kind='stable').reset_index(drop=True)
+
+
+# Function to average the per-cutoff metrics for each series
+def summarize_backtest(results, group_keys=None):
+    group_keys = list(group_keys or [])
+    scored = results.dropna(subset=['rmse'])
+    metrics = ['mae', 'rmse', 'r2', 'mape', 'bias', 'seconds']
+    if not group_keys:
+        return scored[metrics].mean().to_frame().T.assign(cutoffs=len(scored))
+    summary = scored.groupby(group_keys, observed=True)[metrics].mean()
+    return summary.assign(cutoffs=scored.groupby(group_keys, observed=True).size())
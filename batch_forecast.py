@@ -0,0 +1,168 @@
+import logging
+import os
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from parallel_training import get_executor, thread_budget
+
+logger = logging.getLogger('BatchForecast')
+
+# CatBoost configuration used by Suppy_Demand_Forecasting.py
+CATBOOST_PARAMS = {
+    'iterations': 500,
+    'depth': 6,
+    'learning_rate': 0.1,
+    'loss_function': 'RMSE',
+    'verbose': 0  # Silent training
+}
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+# Function to forecast one series with Prophet: fitted history plus the horizon
+def _forecast_prophet(series, date_column, target_column, feature_columns, horizon, params, threads):
+    from forecasting import fit_prophet_model, predict_prophet_model
+    df_series = series[[date_column, target_column]].rename(columns={date_column: 'ds', target_column: 'y'})
+    model = fit_prophet_model(df_series, params)
+    return predict_prophet_model(model, horizon, mode='fast')[FORECAST_COLUMNS]
+
+
+# Function to forecast one series with the least-squares Prophet approximation
+def _forecast_numpy(series, date_column, target_column, feature_columns, horizon, params, threads):
+    from forecasting import fit_prophet_model, predict_prophet_model
+    df_series = series[[date_column, target_column]].rename(columns={date_column: 'ds', target_column: 'y'})
+    model = fit_prophet_model(df_series, params, engine='numpy')
+    return predict_prophet_model(model, horizon, mode='fast')[FORECAST_COLUMNS]
+
+
+# Function to forecast one series with CatBoost: 80/20 split as in the app, predictions on the test rows
+def _forecast_catboost(series, date_column, target_column, feature_columns, horizon, params, threads):
+    from catboost import CatBoostRegressor
+    series = series.sort_values(date_column)
+    split = int(len(series) * 0.8)
+    X, y = series[feature_columns], series[target_column]
+    model = CatBoostRegressor(**{**CATBOOST_PARAMS, **(params or {})}, thread_count=threads)
+    model.fit(X[:split], y[:split], eval_set=(X[split:], y[split:]), use_best_model=True)
+    yhat = model.predict(X[split:])[:horizon]
+    return pd.DataFrame({
+        'ds': series[date_column].iloc[split:split + len(yhat)].to_numpy(),
+        'yhat': yhat,
+        'yhat_lower': float('nan'),
+        'yhat_upper': float('nan'),
+    })
+
+
+# Function to forecast a chunk of series with the least-squares approximation: all of
+# them are fitted together in one batched solve (fast_prophet.fit_many)
+def _forecast_numpy_batch(chunk, date_column, target_column, feature_columns, horizon, params, threads):
+    from fast_prophet import LinearProphet, fit_many
+    from forecasting import PROPHET_PARAMS, predict_prophet_model
+    params = PROPHET_PARAMS if params is None else params
+    frames = [series[[date_column, target_column]].rename(columns={date_column: 'ds', target_column: 'y'})
+              for _, series in chunk]
+    models = fit_many([LinearProphet(**params) for _ in frames], frames)
+    return [(key, predict_prophet_model(model, horizon, mode='fast')[FORECAST_COLUMNS])
+            for (key, _), model in zip(chunk, models)]
+
+
+ENGINES = {
+    'prophet': _forecast_prophet,
+    'catboost': _forecast_catboost,
+    'numpy': _forecast_numpy,
+}
+# Engines that fit a whole chunk at once; a chunk whose batch fails is retried series by series
+BATCH_ENGINES = {
+    'numpy': _forecast_numpy_batch,
+}
+
+
+# Function run in a worker: forecast a chunk of series, isolating failures per series
+def _forecast_chunk(chunk, engine, date_column, target_column, feature_columns, horizon, params, min_points, threads=1):
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    forecast_fn = ENGINES[engine]
+    forecasts = []
+    failures = []
+    short = [(key, series) for key, series in chunk if len(series) < min_points]
+    failures.extend((key, f"ValueError: only {len(series)} rows, need at least {min_points}") for key, series in short)
+    chunk = [(key, series) for key, series in chunk if len(series) >= min_points]
+    if engine in BATCH_ENGINES and chunk:
+        try:
+            return BATCH_ENGINES[engine](chunk, date_column, target_column, feature_columns, horizon, params, threads), failures
+        except Exception as e:
+            logger.warning(f"Batched {engine} fit failed ({type(e).__name__}: {e}), fitting series one by one")
+    for key, series in chunk:
+        try:
+            forecast = forecast_fn(series, date_column, target_column, feature_columns, horizon, params, threads)
+            forecasts.append((key, forecast))
+        except Exception as e:
+            failures.append((key, f"{type(e).__name__}: {e}"))
+    return forecasts, failures
+
+
+def _with_keys(frame, group_keys, key):
+    key = key if isinstance(key, tuple) else (key,)
+    return frame.assign(**dict(zip(group_keys, key)))[list(group_keys) + list(frame.columns)]
+
+
+# Function to forecast every group of a long-format frame across a worker pool.
+# Returns (forecasts, failures): one concatenated forecast frame keyed by the group
+# columns, and one row per series that could not be forecast with its error.
+# progress, if given, is called as progress(done_series, total_series).
+def batch_forecast(df, group_keys, date_column, target_column, horizon, engine='prophet', feature_columns=None,
+                   params=None, max_workers=None, chunk_size=8, min_points=2, progress=None):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {sorted(ENGINES)}")
+    group_keys = list(group_keys)
+    feature_columns = list(feature_columns or [])
+    columns = list(dict.fromkeys(group_keys + [date_column, target_column] + feature_columns))
+
+    groups = [(key, series.drop(columns=group_keys).reset_index(drop=True))
+              for key, series in df[columns].groupby(group_keys if len(group_keys) > 1 else group_keys[0], sort=True, observed=True)]
+    chunks = [groups[i:i + chunk_size] for i in range(0, len(groups), chunk_size)]
+    total = len(groups)
+    logger.info(f"Forecasting {total} series with {engine} in {len(chunks)} chunk(s)")
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(chunks) or 1))
+    threads = thread_budget(max_workers)
+    args = (engine, date_column, target_column, feature_columns, horizon, params, min_points)
+
+    forecasts = []
+    failures = []
+    done = 0
+
+    def collect(chunk, result):
+        nonlocal done
+        chunk_forecasts, chunk_failures = result
+        forecasts.extend(_with_keys(frame, group_keys, key) for key, frame in chunk_forecasts)
+        failures.extend(chunk_failures)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, total)
+
+    if max_workers == 1:
+        for chunk in chunks:
+            collect(chunk, _forecast_chunk(chunk, *args, threads=threads))
+    else:
+        executor = get_executor(max_workers, threads)
+        futures = {executor.submit(_forecast_chunk, chunk, *args, threads=threads): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # A crashed worker only fails the series in its own chunk
+                result = ([], [(key, f"{type(e).__name__}: {e}") for key, _ in chunk])
+            collect(chunk, result)
+
+    forecast_columns = group_keys + FORECAST_COLUMNS
+    forecasts = pd.concat(forecasts, ignore_index=True) if forecasts else pd.DataFrame(columns=forecast_columns)
+    forecasts = forecasts.sort_values(group_keys + ['ds'], kind='stable').reset_index(drop=True)
+
+    failures = pd.DataFrame(
+        [dict(zip(group_keys, key if isinstance(key, tuple) else (key,)), error=error) for key, error in failures],
+        columns=group_keys + ['error'],
+    )
+    if len(failures):
+        logger.warning(f"{len(failures)} of {total} series failed")
+    return forecasts, failures
@@ -0,0 +1,300 @@
+import argparse
+import ast
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import peak_rss_mb
+
+logger = logging.getLogger('Benchmark')
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+STAGES = [
+    'excel_parse', 'csv_parse', 'datetime_conversion',
+    'catboost_cv', 'catboost_fit', 'catboost_predict',
+    'prophet_fit', 'prophet_predict', 'prophet_predict_fast', 'numpy_prophet_fit',
+    'metrics', 'to_csv', 'db_insert',
+]
+MAX_DB_ROWS = 100000
+FEATURE_COLUMNS = ['Vendor Quality History', 'Vendor Consistency', 'Processing Efficiency (%)']
+# Libraries and modules whose cold import time is measured, plus the apps' startup imports
+IMPORT_MODULES = ['pandas', 'pyarrow', 'plotly.graph_objects', 'streamlit', 'sklearn', 'catboost', 'prophet',
+                  'forecasting', 'joint_training', 'ingest_cache']
+APP_SCRIPTS = ['Demo1.py', 'Suppy_Demand_Forecasting.py']
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_IMPORT_TIMER = '''
+import importlib, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+'''
+
+
+# Function to generate an extraction log shaped like ascend_elements_sample_dataset.xlsx.
+# Rows are spread over at most max_days days, so large sizes have many rows per day.
+def generate_extraction_log(rows, seed=0, max_days=1095):
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, min(rows, max_days), rows)
+    days.sort()
+    return pd.DataFrame({
+        'Batch ID': [f"BATCH_{i + 1:07d}" for i in range(rows)],
+        'Battery Type': rng.choice(['Industrial', 'EV', 'Consumer'], rows),
+        'Cobalt (%)': rng.uniform(5, 30, rows).round(2),
+        'Nickel (%)': rng.uniform(5, 30, rows).round(2),
+        'Lithium Carbonate (kg)': rng.uniform(5, 15, rows).round(2),
+        'Extraction Efficiency (%)': rng.uniform(80, 98, rows).round(2),
+        'Energy Consumption (kWh)': rng.uniform(1000, 2000, rows).round(2),
+        'Cobalt Market Value (USD)': (70000 + 10000 * np.sin(days / 58.0) + rng.normal(0, 5000, rows)).round(2),
+        'Recycled Content (%)': rng.uniform(60, 98, rows).round(2),
+        'CO2 Emissions (kg)': rng.uniform(100, 300, rows).round(2),
+        'Recycling Method': rng.choice(['Pyrometallurgy', 'Hydrometallurgy'], rows),
+        'Date of Extraction Process': (pd.Timestamp('2024-01-01') + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d'),
+        'Processing Time (hours)': rng.uniform(10, 24, rows).round(2),
+        'Water Usage (Liters)': rng.uniform(2000, 5000, rows).round(2),
+        'Waste Generated (kg)': rng.uniform(100, 150, rows).round(2),
+        'Energy Source': rng.choice(['Renewable', 'Non-renewable'], rows),
+        'Compliance with Environmental Regulations': rng.choice(['Y', 'N'], rows),
+    })
+
+
+# Function to generate a ledger shaped like the CSV used by Suppy_Demand_Forecasting.py
+def generate_ledger(rows, seed=0, max_days=1095):
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.integers(0, min(rows, max_days), rows))
+    quality = rng.uniform(0.5, 1.0, rows)
+    consistency = rng.uniform(0.5, 1.0, rows)
+    efficiency = rng.uniform(80, 98, rows)
+    return pd.DataFrame({
+        'Date': (pd.Timestamp('2024-01-01') + pd.to_timedelta(days, unit='D')).strftime('%d-%m-%Y'),
+        'Vendor': rng.choice([f"Vendor {i}" for i in range(20)], rows),
+        'Material': rng.choice(['Cobalt', 'Nickel', 'Lithium'], rows),
+        'Stockroom': rng.choice(['North', 'South', 'East'], rows),
+        'Debit EUR': (1000 * quality + 10 * efficiency + rng.normal(0, 50, rows)).round(2),
+        'Credit EUR': (800 * consistency + 5 * efficiency + rng.normal(0, 50, rows)).round(2),
+        'Vendor Quality History': quality.round(3),
+        'Vendor Consistency': consistency.round(3),
+        'Processing Efficiency (%)': efficiency.round(2),
+    })
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+# Function to run each selected pipeline stage on one dataset size
+def run_size(rows, stages, iterations=100, max_excel_rows=100000, seed=0):
+    from catboost import CatBoostRegressor, Pool, cv
+    from db_writer import ForecastWriter, SQLiteBackend
+    from forecasting import (attach_fitted_values, fit_prophet_model, predict_prophet_model, prophet_from_json,
+                             prophet_to_json)
+    from grouped_metrics import grouped_metrics
+
+    results = []
+
+    def record(stage, seconds, stage_rows):
+        results.append({'rows': rows, 'stage': stage, 'seconds': seconds, 'stage_rows': stage_rows,
+                        'peak_rss_mb': peak_rss_mb()})
+        logger.info(f"{rows} rows - {stage}: {seconds:.3f}s")
+
+    params = {'iterations': iterations, 'depth': 6, 'learning_rate': 0.1, 'loss_function': 'RMSE', 'verbose': 0}
+    ledger = generate_ledger(rows, seed)
+    csv_bytes = ledger.to_csv(index=False).encode()
+
+    if 'excel_parse' in stages and rows <= max_excel_rows:
+        buffer = io.BytesIO()
+        generate_extraction_log(rows, seed).to_excel(buffer, sheet_name='Sheet1', index=False)
+        _, seconds = _timed(lambda: pd.read_excel(io.BytesIO(buffer.getvalue()), sheet_name='Sheet1'))
+        record('excel_parse', seconds, rows)
+
+    data, seconds = _timed(lambda: pd.read_csv(io.BytesIO(csv_bytes)))
+    if 'csv_parse' in stages:
+        record('csv_parse', seconds, rows)
+
+    dates, seconds = _timed(lambda: pd.to_datetime(data['Date'], format='%d-%m-%Y'))
+    data['Date'] = dates
+    if 'datetime_conversion' in stages:
+        record('datetime_conversion', seconds, rows)
+
+    n_train = rows - int(np.ceil(rows * 0.2))
+    X, y = data[FEATURE_COLUMNS], data['Debit EUR']
+    X_train, y_train, X_test, y_test = X[:n_train], y[:n_train], X[n_train:], y[n_train:]
+
+    if 'catboost_cv' in stages:
+        _, seconds = _timed(lambda: cv(params=params, pool=Pool(X_train, label=y_train), fold_count=3,
+                                       partition_random_seed=42, shuffle=False, stratified=False,
+                                       verbose=False, plot=False))
+        record('catboost_cv', seconds, n_train)
+
+    if {'catboost_fit', 'catboost_predict', 'metrics'} & set(stages):
+        model, seconds = _timed(lambda: CatBoostRegressor(**params).fit(X_train, y_train, eval_set=(X_test, y_test),
+                                                                        use_best_model=True))
+        if 'catboost_fit' in stages:
+            record('catboost_fit', seconds, n_train)
+
+        predictions, seconds = _timed(lambda: model.predict(X_test))
+        if 'catboost_predict' in stages:
+            record('catboost_predict', seconds, len(X_test))
+
+    df_series = data[['Date', 'Debit EUR']].rename(columns={'Date': 'ds', 'Debit EUR': 'y'})
+    horizon = 30
+    if {'prophet_fit', 'prophet_predict', 'prophet_predict_fast'} & set(stages):
+        prophet_model, seconds = _timed(lambda: fit_prophet_model(df_series))
+        if 'prophet_fit' in stages:
+            record('prophet_fit', seconds, rows)
+        _, seconds = _timed(lambda: predict_prophet_model(prophet_model, horizon))
+        if 'prophet_predict' in stages:
+            record('prophet_predict', seconds, rows + horizon)
+        # First call on a model as it comes back from the model cache: the app's fits store the
+        # in-sample values with the model (store_fitted=True), so nothing is recomputed here
+        cached_model = prophet_from_json(prophet_to_json(attach_fitted_values(prophet_model)))
+        _, seconds = _timed(lambda: predict_prophet_model(cached_model, horizon, mode='fast'))
+        if 'prophet_predict_fast' in stages:
+            record('prophet_predict_fast', seconds, horizon)
+    if 'numpy_prophet_fit' in stages:
+        _, seconds = _timed(lambda: fit_prophet_model(df_series, engine='numpy'))
+        record('numpy_prophet_fit', seconds, rows)
+
+    if 'metrics' in stages:
+        _, seconds = _timed(lambda: grouped_metrics(y_test, predictions, data['Vendor'][n_train:]))
+        record('metrics', seconds, len(y_test))
+
+    forecast_df = pd.DataFrame({
+        'Forecast Date': data['Date'],
+        'Supply Forecast (USD)': data['Debit EUR'].to_numpy(),
+        'Demand Forecast (%)': data['Credit EUR'].to_numpy(),
+    })
+    if 'to_csv' in stages:
+        _, seconds = _timed(lambda: forecast_df.to_csv(index=False))
+        record('to_csv', seconds, rows)
+
+    if 'db_insert' in stages:
+        # ForecastResults holds one row per date, so the insert is capped at the
+        # number of distinct days pandas can represent from 1800 onwards
+        db_rows = min(rows, MAX_DB_ROWS)
+        db_frame = forecast_df.iloc[:db_rows].assign(
+            **{'Forecast Date': pd.Timestamp('1800-01-01') + pd.to_timedelta(np.arange(db_rows), unit='D')})
+        writer = ForecastWriter(SQLiteBackend(), pool_size=1, chunk_size=10000)
+        _, seconds = _timed(lambda: writer.write(db_frame))
+        writer.close()
+        record('db_insert', seconds, db_rows)
+
+    return results
+
+
+# Function to time importing modules in a fresh interpreter, so nothing is already loaded
+def cold_import_seconds(modules):
+    out = subprocess.run([sys.executable, '-c', _IMPORT_TIMER, *modules], capture_output=True, text=True,
+                         check=True, cwd=REPO_DIR)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+# Function to list the modules an app script imports at the top level, i.e. on every cold start
+def app_imports(path):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+# Function to record cold import times per module and for each app's startup imports (rows is 0)
+def measure_imports(modules=IMPORT_MODULES, apps=APP_SCRIPTS):
+    targets = [(f"import:{module}", [module]) for module in modules]
+    targets += [(f"startup:{app}", app_imports(os.path.join(REPO_DIR, app))) for app in apps]
+    results = []
+    for stage, names in targets:
+        try:
+            seconds = cold_import_seconds(names)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Skipping {stage}: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        results.append({'rows': 0, 'stage': stage, 'seconds': seconds, 'stage_rows': None, 'peak_rss_mb': None})
+        logger.info(f"{stage}: {seconds:.3f}s")
+    return results
+
+
+# Function to run the benchmark over every dataset size
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=STAGES, iterations=100, max_excel_rows=100000, seed=0, imports=False):
+    results = measure_imports() if imports else []
+    for rows in sizes:
+        results.extend(run_size(rows, stages, iterations, max_excel_rows, seed))
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'catboost_iterations': iterations,
+        },
+        'results': results,
+    }
+
+
+# Function to flag stages that got slower than the baseline by more than tolerance
+# (a fraction) and by at least min_seconds, so sub-millisecond noise is ignored
+def compare_to_baseline(current, baseline, tolerance=0.2, min_seconds=0.05):
+    baseline_times = {(r['rows'], r['stage']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = baseline_times.get((result['rows'], result['stage']))
+        if before is None:
+            continue
+        after = result['seconds']
+        if after > before * (1 + tolerance) and after - before >= min_seconds:
+            regressions.append({'rows': result['rows'], 'stage': result['stage'], 'baseline_seconds': before,
+                                'seconds': after, 'ratio': after / before if before else float('inf')})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time each forecasting pipeline stage at several dataset sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--iterations', type=int, default=100, help='CatBoost iterations per fit')
+    parser.add_argument('--max-excel-rows', type=int, default=100000,
+                        help='Skip the Excel stage above this size (writing the input is very slow)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--no-imports', action='store_true', help='Skip the cold import timings')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    current = run_benchmarks(args.sizes, args.stages, args.iterations, args.max_excel_rows, imports=not args.no_imports)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Wrote {len(current['results'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(current, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} @ {r['rows']} rows: {r['baseline_seconds']:.3f}s -> {r['seconds']:.3f}s "
+                  f"({r['ratio']:.2f}x)")
+        if regressions:
+            return 1
+        print('No regressions against baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import uuid
+
+import pyarrow as pa
+
+from model_cache import frame_fingerprint
+
+logger = logging.getLogger('Export')
+
+DEFAULT_EXPORT_DIR = os.environ.get('FORECAST_EXPORT_CACHE', '.export_cache')
+# Rows encoded at a time, so only one chunk's text or Arrow batch is in memory at once
+CHUNK_ROWS = 100000
+
+# Format name: (file extension, mime type)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'csv.zst': ('csv.zst', 'application/zstd'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+CSV_CODECS = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+
+def check_format(export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {list(EXPORT_FORMATS)}")
+
+
+def iter_chunks(frame, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield start, frame.iloc[start:start + chunk_rows]
+
+
+# Function to encode a frame to path chunk by chunk. CSV chunks are written by pandas (so
+# the text matches to_csv(index=False)) through a gzip/zstd stream; Parquet gets one row
+# group and Arrow IPC one record batch per chunk.
+def write_export(frame, path, export_format, chunk_rows=CHUNK_ROWS):
+    check_format(export_format)
+    if export_format in CSV_CODECS:
+        codec = CSV_CODECS[export_format]
+        with pa.OSFile(path, 'wb') as sink:
+            stream = sink if codec is None else pa.CompressedOutputStream(sink, codec)
+            try:
+                for start, chunk in iter_chunks(frame, chunk_rows):
+                    stream.write(chunk.to_csv(index=False, header=start == 0).encode())
+            finally:
+                if codec is not None:
+                    stream.close()
+        return
+
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    if export_format == 'parquet':
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(path, schema) as writer:
+            for _, chunk in iter_chunks(frame, chunk_rows):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for _, chunk in iter_chunks(frame, chunk_rows):
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_file_name(base_name, export_format):
+    return f"{base_name}.{EXPORT_FORMATS[export_format][0]}"
+
+
+class ExportCache:
+    # Encoded exports on disk, keyed by the forecast's content and the format, so each
+    # forecast version is encoded once per format however many sessions download it.
+    # Only the newest max_files files are kept.
+    def __init__(self, root=DEFAULT_EXPORT_DIR, max_files=64, chunk_rows=CHUNK_ROWS):
+        self.root = root
+        self.max_files = max_files
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, frame, export_format, version=None):
+        check_format(export_format)
+        version = version or frame_fingerprint(frame)
+        return os.path.join(self.root, f"{version}.{EXPORT_FORMATS[export_format][0]}")
+
+    def contains(self, frame, export_format, version=None):
+        return os.path.exists(self.path(frame, export_format, version))
+
+    # Function to return the path of the encoded export, encoding it first on a miss
+    def get_or_write(self, frame, export_format, version=None):
+        path = self.path(frame, export_format, version)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write_export(frame, tmp_path, export_format, self.chunk_rows)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Encoded {len(frame)} rows as {export_format} ({os.path.getsize(path) / 1e3:.1f} kB)")
+        self._evict()
+        return path
+
+    def _evict(self):
+        with self._lock:
+            paths = [os.path.join(self.root, name) for name in os.listdir(self.root) if not name.endswith('.tmp')]
+            paths.sort(key=os.path.getmtime, reverse=True)
+            for path in paths[self.max_files:]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.root):
+                os.remove(os.path.join(self.root, name))
+
+
+# Function to show a format picker and a download button that encodes the forecast only
+# once asked to. Until then (or until the export is cached) no bytes are built on reruns.
+def export_buttons(cache, frame, base_name, label, key='export'):
+    import streamlit as st
+
+    export_format = st.selectbox("Download format", list(EXPORT_FORMATS), key=f"{key}_format")
+    version = frame_fingerprint(frame)
+    if not cache.contains(frame, export_format, version):
+        if not st.button(f"Prepare {export_format} download", key=f"{key}_prepare"):
+            return
+        with st.spinner(f"Encoding {len(frame)} rows as {export_format}..."):
+            cache.get_or_write(frame, export_format, version)
+    with open(cache.get_or_write(frame, export_format, version), 'rb') as f:
+        st.download_button(label=label, data=f, file_name=export_file_name(base_name, export_format),
+                           mime=EXPORT_FORMATS[export_format][1], key=f"{key}_download")
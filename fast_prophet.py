@@ -0,0 +1,285 @@
+import argparse
+import logging
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('FastProphet')
+
+YEARLY_PERIOD = 365.25
+WEEKLY_PERIOD = 7.0
+
+
+def _fourier_order(setting, default):
+    if setting is True or setting == 'auto':
+        return default
+    if setting is False or setting is None:
+        return 0
+    return int(setting)
+
+
+# Function to convert dates to days since the epoch, as Prophet does for seasonality
+def _days(ds):
+    return (_datetimes(ds) - np.datetime64('1970-01-01', 'ns')) / np.timedelta64(1, 'D')
+
+
+def _datetimes(ds):
+    return pd.to_datetime(pd.Series(ds)).to_numpy(dtype='datetime64[ns]')
+
+
+class LinearProphet:
+    # Least-squares approximation of Prophet: a piecewise-linear trend with changepoints
+    # plus Fourier seasonality, with Gaussian (ridge) priors in place of Prophet's
+    # Laplace/normal priors. Multiplicative seasonality is fitted by alternating
+    # weighted least squares between the trend and the seasonal terms. Exposes the
+    # same fit / make_future_dataframe / predict surface as Prophet.
+    def __init__(self, yearly_seasonality=True, weekly_seasonality=True, seasonality_mode='additive',
+                 n_changepoints=25, changepoint_range=0.8, changepoint_prior_scale=0.05,
+                 seasonality_prior_scale=10.0, interval_width=0.8, n_iter=10, noise_scale=0.2, **ignored):
+        self.yearly_order = _fourier_order(yearly_seasonality, 10)
+        self.weekly_order = _fourier_order(weekly_seasonality, 3)
+        self.seasonality_mode = seasonality_mode
+        self.n_changepoints = n_changepoints
+        self.changepoint_range = changepoint_range
+        self.changepoint_prior_scale = changepoint_prior_scale
+        self.seasonality_prior_scale = seasonality_prior_scale
+        self.interval_width = interval_width
+        self.n_iter = n_iter
+        self.noise_scale = noise_scale
+        self.history = None
+        self.history_dates = None
+        if ignored:
+            logger.debug(f"LinearProphet ignores {sorted(ignored)}")
+
+    # Function to fix the time and value scales and place the changepoints over the history
+    def _setup(self, history):
+        ds = pd.to_datetime(history['ds'])
+        self.start = ds.min()
+        self.t_scale = max((ds.max() - self.start).total_seconds(), 1.0)
+        self.y_scale = float(np.max(np.abs(history['y']))) or 1.0
+
+        t = self._t(ds)
+        hist_size = int(np.floor(len(history) * self.changepoint_range))
+        n_changepoints = min(self.n_changepoints, hist_size - 1)
+        if n_changepoints > 0:
+            cp_indexes = np.linspace(0, hist_size - 1, n_changepoints + 1).round().astype(int)[1:]
+            self.changepoints_t = np.sort(t[cp_indexes])
+        else:
+            self.changepoints_t = np.array([])
+
+    # Function to map dates to the scaled time the trend uses (0 at the first date, 1 at the last)
+    def _t(self, ds):
+        return (_datetimes(ds) - self.start.to_datetime64()) / np.timedelta64(1, 's') / self.t_scale
+
+    # Function to build the trend columns: intercept, slope and one hinge per changepoint
+    def trend_design(self, ds):
+        t = self._t(ds)
+        hinges = np.maximum(t[:, None] - self.changepoints_t[None, :], 0.0)
+        return np.column_stack([np.ones_like(t), t, hinges])
+
+    # Function to build the yearly and weekly Fourier columns
+    def seasonal_design(self, ds):
+        days = _days(ds)
+        columns = []
+        for period, order in ((YEARLY_PERIOD, self.yearly_order), (WEEKLY_PERIOD, self.weekly_order)):
+            for k in range(1, order + 1):
+                angle = 2 * np.pi * k * days / period
+                columns.extend([np.sin(angle), np.cos(angle)])
+        return np.column_stack(columns) if columns else np.zeros((len(days), 0))
+
+    # Function to return the ridge penalty of each trend column; only changepoint deltas are shrunk
+    def trend_penalty(self):
+        lam = (self.noise_scale / self.changepoint_prior_scale) ** 2
+        return np.concatenate([[1e-10, 1e-10], np.full(len(self.changepoints_t), lam)])
+
+    # Function to return the ridge penalty of each seasonal column
+    def seasonal_penalty(self, n_columns):
+        return np.full(n_columns, max((self.noise_scale / self.seasonality_prior_scale) ** 2, 1e-10))
+
+    # Function to fit one series, with the same solve fit_many runs for a batch
+    def fit(self, df):
+        fit_many([self], [df])
+        return self
+
+    # Function to list the dates to predict, as Prophet's make_future_dataframe does
+    def make_future_dataframe(self, periods, freq='D', include_history=True):
+        last_date = self.history_dates.max()
+        dates = pd.date_range(start=last_date, periods=periods + 1, freq=freq)
+        dates = dates[dates > last_date][:periods]
+        if include_history:
+            dates = np.concatenate((np.array(self.history_dates), dates))
+        return pd.DataFrame({'ds': dates})
+
+    # Function to predict the trend, the seasonal components and yhat with its interval for
+    # df's dates (the history when df is None)
+    def predict(self, df=None):
+        ds = pd.to_datetime((self.history if df is None else df)['ds']).reset_index(drop=True)
+        trend = self.trend_design(ds) @ self.trend_coef
+        seasonal_columns = self.seasonal_design(ds)
+        n_yearly = 2 * self.yearly_order
+        yearly = seasonal_columns[:, :n_yearly] @ self.seasonal_coef[:n_yearly]
+        weekly = seasonal_columns[:, n_yearly:] @ self.seasonal_coef[n_yearly:]
+        seasonal = yearly + weekly
+
+        if self.seasonality_mode == 'multiplicative':
+            yhat = trend * (1 + seasonal)
+            scale = 1.0
+        else:
+            yhat = trend + seasonal
+            scale = self.y_scale
+        z = NormalDist().inv_cdf(0.5 + self.interval_width / 2)
+        result = pd.DataFrame({
+            'ds': ds,
+            'trend': trend * self.y_scale,
+            'yearly': yearly * scale,
+            'weekly': weekly * scale,
+            'yhat': yhat * self.y_scale,
+        })
+        result['yhat_lower'] = result['yhat'] - z * self.sigma * self.y_scale
+        result['yhat_upper'] = result['yhat'] + z * self.sigma * self.y_scale
+        return result
+
+
+def _pad(arrays, width=None):
+    n = max(a.shape[0] for a in arrays)
+    width = width or max(a.shape[1] for a in arrays)
+    out = np.zeros((len(arrays), n, width))
+    for i, a in enumerate(arrays):
+        out[i, :a.shape[0], :a.shape[1]] = a
+    return out
+
+
+# Function to solve a batch of ridge-weighted least-squares problems in one call.
+# X: (S, N, P), weights and z: (S, N), penalty: (S, P). Returns (S, P).
+def _batched_wls(X, weights, z, penalty):
+    Xw = X * weights[..., None]
+    gram = Xw.transpose(0, 2, 1) @ X
+    gram[:, np.arange(X.shape[2]), np.arange(X.shape[2])] += penalty
+    rhs = Xw.transpose(0, 2, 1) @ z[..., None]
+    return np.linalg.solve(gram, rhs)[..., 0]
+
+
+# Function to fit many LinearProphet models in batched least-squares solves.
+# Series may have different dates and lengths; they are padded and masked.
+def fit_many(models, frames, batch_size=256):
+    for start in range(0, len(models), batch_size):
+        _fit_batch(models[start:start + batch_size], frames[start:start + batch_size])
+    return models
+
+
+def _fit_batch(models, frames):
+    histories = []
+    for model, df in zip(models, frames):
+        history = df[['ds', 'y']].dropna().copy()
+        history['ds'] = pd.to_datetime(history['ds'])
+        history = history.sort_values('ds').reset_index(drop=True)
+        model.history = history
+        model.history_dates = pd.Series(history['ds'].unique())
+        model._setup(history)
+        histories.append(history)
+
+    trend_width = max(2 + len(m.changepoints_t) for m in models)
+    X_trend = _pad([m.trend_design(h['ds']) for m, h in zip(models, histories)], trend_width)
+    X_seasonal = _pad([m.seasonal_design(h['ds']) for m, h in zip(models, histories)])
+    y = np.zeros(X_trend.shape[:2])
+    mask = np.zeros(X_trend.shape[:2])
+    for i, (m, h) in enumerate(zip(models, histories)):
+        y[i, :len(h)] = h['y'].to_numpy(dtype=np.float64) / m.y_scale
+        mask[i, :len(h)] = 1.0
+
+    # Padded trend columns (series with fewer changepoints) get a unit penalty so they stay at zero
+    trend_penalty = np.ones((len(models), trend_width))
+    for i, m in enumerate(models):
+        p = m.trend_penalty()
+        trend_penalty[i, :len(p)] = p
+    seasonal_penalty = np.stack([m.seasonal_penalty(X_seasonal.shape[2]) for m in models])
+
+    multiplicative = [m.seasonality_mode == 'multiplicative' for m in models]
+    if any(multiplicative) and not all(multiplicative):
+        raise ValueError('All series in a batch must use the same seasonality_mode')
+
+    if multiplicative[0]:
+        seasonal = np.zeros_like(y)
+        for _ in range(max(1, models[0].n_iter)):
+            # y = T(1 + s): fit T on y / (1 + s) weighted by (1 + s)^2, then s on y / T - 1 weighted by T^2
+            factor = 1 + seasonal
+            z = np.divide(y, factor, out=np.zeros_like(y), where=np.abs(factor) > 1e-12)
+            trend_coef = _batched_wls(X_trend, mask * factor ** 2, z, trend_penalty)
+            trend = (X_trend @ trend_coef[..., None])[..., 0]
+            z = np.divide(y, trend, out=np.ones_like(y), where=np.abs(trend) > 1e-12) - 1
+            seasonal_coef = _batched_wls(X_seasonal, mask * trend ** 2, z, seasonal_penalty)
+            seasonal = (X_seasonal @ seasonal_coef[..., None])[..., 0]
+        fitted = trend * (1 + seasonal)
+    else:
+        X = np.concatenate([X_trend, X_seasonal], axis=2)
+        coef = _batched_wls(X, mask, y, np.concatenate([trend_penalty, seasonal_penalty], axis=1))
+        trend_coef, seasonal_coef = coef[:, :trend_width], coef[:, trend_width:]
+        fitted = (X @ coef[..., None])[..., 0]
+
+    residual_sq = ((y - fitted) * mask) ** 2
+    dof = np.maximum(mask.sum(axis=1) - 1, 1)
+    for i, m in enumerate(models):
+        m.trend_coef = trend_coef[i, :2 + len(m.changepoints_t)]
+        m.seasonal_coef = seasonal_coef[i]
+        m.sigma = float(np.sqrt(residual_sq[i].sum() / dof[i]))
+
+
+# Function to compare LinearProphet with Prophet on synthetic series: fit time and
+# holdout MAPE for each engine, plus how far the two engines' forecasts are apart
+def compare_engines(n_series=10, days=730, horizon=60, seed=0):
+    from forecasting import PROPHET_PARAMS, fit_prophet_model
+
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range('2022-01-01', periods=days + horizon, freq='D')
+    t = np.arange(days + horizon)
+    frames = []
+    for _ in range(n_series):
+        level = rng.uniform(50000, 90000)
+        trend = level * (1 + rng.uniform(-0.3, 0.3) * t / days)
+        season = 1 + 0.1 * np.sin(2 * np.pi * t / 365.25 + rng.uniform(0, 6)) + 0.05 * np.sin(2 * np.pi * t / 7)
+        frames.append(pd.DataFrame({'ds': ds, 'y': trend * season * (1 + rng.normal(0, 0.02, len(t)))}))
+    train = [f.iloc[:days] for f in frames]
+    test = [f.iloc[days:] for f in frames]
+
+    start = time.perf_counter()
+    prophet_models = [fit_prophet_model(f, PROPHET_PARAMS) for f in train]
+    prophet_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear_models = fit_many([LinearProphet(**PROPHET_PARAMS) for _ in train], train)
+    linear_seconds = time.perf_counter() - start
+
+    def mape(actual, predicted):
+        return float(np.mean(np.abs((predicted - actual) / actual)))
+
+    rows = []
+    for i in range(n_series):
+        prophet_yhat = prophet_models[i].predict(test[i][['ds']])['yhat'].to_numpy()
+        linear_yhat = linear_models[i].predict(test[i][['ds']])['yhat'].to_numpy()
+        actual = test[i]['y'].to_numpy()
+        rows.append({'series': i, 'prophet_mape': mape(actual, prophet_yhat), 'linear_mape': mape(actual, linear_yhat),
+                     'engine_gap_mape': mape(prophet_yhat, linear_yhat)})
+    timings = {'prophet_seconds': prophet_seconds, 'linear_seconds': linear_seconds,
+               'speedup': prophet_seconds / linear_seconds if linear_seconds else float('inf')}
+    return pd.DataFrame(rows), timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare LinearProphet with Prophet for accuracy and speed')
+    parser.add_argument('--series', type=int, default=10)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--horizon', type=int, default=60)
+    args = parser.parse_args(argv)
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    accuracy, timings = compare_engines(args.series, args.days, args.horizon)
+    print(accuracy.to_string(index=False))
+    print(accuracy[['prophet_mape', 'linear_mape', 'engine_gap_mape']].mean().to_string())
+    print(f"Prophet: {timings['prophet_seconds']:.2f}s, LinearProphet: {timings['linear_seconds']:.3f}s "
+          f"({timings['speedup']:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
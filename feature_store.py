@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from model_cache import frame_fingerprint
+
+logger = logging.getLogger('FeatureStore')
+
+DEFAULT_STORE_DIR = os.environ.get('FORECAST_FEATURE_STORE', '.feature_store')
+
+
+class FrameHandle(namedtuple('FrameHandle', ['path', 'rows', 'columns', 'names'])):
+    # What a worker receives instead of a frame: the stored frame's directory, a row
+    # slice and the columns to read (a single column name reads a Series). names
+    # optionally renames the columns on attach. A few hundred bytes to pickle,
+    # whatever the number of rows.
+    __slots__ = ()
+
+    # Function to narrow the handle to rows [start, stop) of its current rows
+    def take(self, start=None, stop=None):
+        offset, end = self.rows.start, self.rows.stop
+        start = offset if start is None else offset + start
+        stop = end if stop is None else min(end, offset + stop)
+        return self._replace(rows=slice(start, stop))
+
+    def select(self, columns, names=None):
+        return self._replace(columns=columns, names=names)
+
+    @property
+    def n_rows(self):
+        return self.rows.stop - self.rows.start
+
+
+class FeatureStore:
+    # Content-addressed store of frames as one contiguous .npy file per column. A frame
+    # is written once; every worker then memory-maps the same files, so the operating
+    # system keeps a single copy of the pages however many workers read them. Least
+    # recently put frames are removed once the store exceeds max_disk_bytes.
+    def __init__(self, root=DEFAULT_STORE_DIR, max_disk_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.max_disk_bytes = max_disk_bytes
+        os.makedirs(root, exist_ok=True)
+
+    # Function to write a frame (unless already stored) and return a handle to all of it.
+    # Strings are stored as categoricals; a non-default index is stored as a column and
+    # restored on attach.
+    def put(self, frame):
+        path = os.path.join(self.root, frame_fingerprint(frame))
+        manifest = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest):
+            os.utime(manifest)
+        else:
+            self._write(frame, path)
+            self.evict(keep=path)
+        columns = list(frame.columns)
+        return FrameHandle(path, slice(0, len(frame)), columns, None)
+
+    def _write(self, frame, path):
+        index = None
+        if not isinstance(frame.index, pd.RangeIndex):
+            index = frame.index.name or 'index'
+            frame = frame.reset_index(names=index)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        manifest = {'rows': len(frame), 'index': index, 'columns': {}}
+        for i, (name, column) in enumerate(frame.items()):
+            entry = {'file': f"{i}.npy"}
+            if column.dtype == object or isinstance(column.dtype, pd.StringDtype):
+                column = column.astype('category')
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                entry['categories'] = column.cat.categories.tolist()
+                values = column.cat.codes.to_numpy()
+            else:
+                values = column.to_numpy()
+            np.save(os.path.join(tmp_path, entry['file']), np.ascontiguousarray(values), allow_pickle=False)
+            manifest['columns'][str(name)] = entry
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, default=str)
+        try:
+            os.replace(tmp_path, path)
+            logger.info(f"Stored {len(frame)} rows x {frame.shape[1]} columns in {path}")
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)  # Another process stored the same frame first
+
+    # Remove least recently put frames until the store fits in max_disk_bytes. keep (the
+    # frame just written, which workers are about to read) is never removed.
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            manifest = os.path.join(path, 'manifest.json')
+            if path != keep and os.path.exists(manifest):
+                entries.append((os.path.getmtime(manifest), _folder_size(path), path))
+        total = self.disk_usage()
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted {path} from feature store")
+
+    def disk_usage(self):
+        return _folder_size(self.root)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+
+def _folder_size(path):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(path) for name in names)
+
+
+def _load_manifest(path):
+    with open(os.path.join(path, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def _attach_column(path, entry, rows):
+    values = np.load(os.path.join(path, entry['file']), mmap_mode='r')[rows]
+    if 'categories' in entry:
+        return pd.Categorical.from_codes(values, entry['categories'])
+    return values
+
+
+# Function for a worker to turn a handle into the frame (or Series) it stands for. Numeric
+# and datetime columns are read-only views of the memory-mapped files, not copies.
+def attach(handle):
+    manifest = _load_manifest(handle.path)
+    single = isinstance(handle.columns, str)
+    columns = [handle.columns] if single else list(handle.columns)
+    names = columns if handle.names is None else ([handle.names] if single else list(handle.names))
+    index = None
+    if manifest['index'] is not None:
+        index = pd.Index(_attach_column(handle.path, manifest['columns'][manifest['index']], handle.rows),
+                         name=manifest['index'], copy=False)
+    data = {name: _attach_column(handle.path, manifest['columns'][column], handle.rows)
+            for column, name in zip(columns, names)}
+    if single:
+        return pd.Series(data[names[0]], index=index, name=names[0], copy=False)
+    return pd.DataFrame(data, index=index, columns=names, copy=False)
+
+
+# Function to attach a value if it is a handle and return it unchanged otherwise
+def resolve(value):
+    return attach(value) if isinstance(value, FrameHandle) else value
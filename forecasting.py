@@ -0,0 +1,179 @@
+import copy
+import io
+import json
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from grouped_metrics import frame_metrics
+from instrumentation import span
+
+
+# Prophet configuration shared by both apps and the tests
+PROPHET_PARAMS = {'yearly_seasonality': True, 'weekly_seasonality': True, 'seasonality_mode': 'multiplicative'}
+
+# 'prophet' fits with Stan; 'numpy' fits fast_prophet.LinearProphet by least squares
+ENGINES = ['prophet', 'numpy']
+
+# 'full' runs Prophet's own predict over history plus horizon with Monte Carlo intervals;
+# 'fast' predicts only the horizon and reuses the in-sample fitted values stored at fit time
+PREDICTION_MODES = ['full', 'fast']
+# How 'fast' mode computes yhat_lower/yhat_upper for the horizon
+INTERVAL_METHODS = ['analytic', 'sample', None]
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+
+# Function to fit a single Prophet model. store_fitted=True also stores its in-sample
+# predictions, for models that will be predicted in 'fast' mode.
+def fit_prophet_model(df_series, params=None, engine='prophet', store_fitted=False):
+    _check_engine(engine)
+    params = PROPHET_PARAMS if params is None else params
+    if engine == 'numpy':
+        from fast_prophet import LinearProphet
+        model = LinearProphet(**params).fit(df_series)
+    else:
+        from prophet import Prophet
+        model = Prophet(**params)
+        model.fit(df_series)
+    return attach_fitted_values(model) if store_fitted else model
+
+
+# Function to fit the Prophet models
+def fit_prophet_models(df_supply, df_demand, engine='prophet', store_fitted=False):
+    _check_engine(engine)
+    with span('fit', rows=len(df_supply) + len(df_demand)):
+        if engine == 'numpy':
+            # Both series are solved in one batched least-squares pass
+            from fast_prophet import LinearProphet, fit_many
+            supply_model, demand_model = fit_many(
+                [LinearProphet(**PROPHET_PARAMS), LinearProphet(**PROPHET_PARAMS)], [df_supply, df_demand])
+            if store_fitted:
+                supply_model, demand_model = attach_fitted_values(supply_model), attach_fitted_values(demand_model)
+        else:
+            supply_model = fit_prophet_model(df_supply, store_fitted=store_fitted)
+            demand_model = fit_prophet_model(df_demand, store_fitted=store_fitted)
+    return supply_model, demand_model
+
+
+# Function to return the model with uncertainty_samples set, as a shallow copy when it
+# differs: models are shared between sessions, so the shared object is never mutated
+def _with_uncertainty_samples(model, n_samples):
+    if not hasattr(model, 'uncertainty_samples') or model.uncertainty_samples == n_samples:
+        return model
+    model = copy.copy(model)
+    model.uncertainty_samples = n_samples
+    return model
+
+
+# Function to add yhat_lower/yhat_upper from Prophet's noise and trend-change model in closed form.
+# Future changepoints arrive at the historical rate with Laplace-distributed deltas, so the trend's
+# variance h units past the history is 2 * b^2 * rate * h^3 / 3, on top of the observation noise.
+def analytic_intervals(model, forecast):
+    forecast = forecast.copy()
+    if 'yhat_lower' in forecast and not hasattr(model, 'params'):  # LinearProphet has its own intervals
+        return forecast
+    z = NormalDist().inv_cdf(0.5 + model.interval_width / 2)
+    sigma_obs = float(np.mean(model.params['sigma_obs'])) * model.y_scale
+    deltas = np.asarray(model.params['delta']).reshape(-1)
+    b = np.mean(np.abs(deltas)) + 1e-8
+    t = (forecast['ds'] - model.start) / model.t_scale
+    h = np.maximum(t.to_numpy(dtype=np.float64) - 1, 0)
+    trend_sd = model.y_scale * np.sqrt(2 * b * b * len(model.changepoints_t) * h ** 3 / 3)
+    if 'multiplicative_terms' in forecast:
+        trend_sd = trend_sd * np.abs(1 + forecast['multiplicative_terms'].to_numpy())
+    sd = np.sqrt(sigma_obs ** 2 + trend_sd ** 2)
+    forecast['yhat_lower'] = forecast['yhat'] - z * sd
+    forecast['yhat_upper'] = forecast['yhat'] + z * sd
+    return forecast
+
+
+# Function to compute a freshly fitted model's in-sample predictions (with analytic
+# intervals) and store them on it as fitted_values_. Fits asked to store_fitted call this,
+# and prophet_to_json keeps them, so 'fast' predictions never predict over the history.
+def attach_fitted_values(model):
+    fitted = _with_uncertainty_samples(model, 0).predict(pd.DataFrame({'ds': model.history_dates}))
+    model.fitted_values_ = analytic_intervals(model, fitted)
+    return model
+
+
+# Function to return a model's stored in-sample predictions, computing them for models
+# fitted or loaded without them
+def fitted_values(model):
+    if getattr(model, 'fitted_values_', None) is None:
+        attach_fitted_values(model)
+    return model.fitted_values_
+
+
+# Function to serialize a Prophet model with its fitted values, for the model cache and
+# for moving models out of worker processes
+def prophet_to_json(model):
+    from prophet.serialize import model_to_json
+    fitted = getattr(model, 'fitted_values_', None)
+    return json.dumps({
+        'model': model_to_json(model),
+        'fitted_values': None if fitted is None else fitted.to_json(orient='table', double_precision=15),
+    })
+
+
+# Function to load a model written by prophet_to_json (or plain model_to_json output)
+def prophet_from_json(text):
+    from prophet.serialize import model_from_json
+    payload = json.loads(text)
+    if 'model' not in payload:
+        return model_from_json(text)
+    model = model_from_json(payload['model'])
+    if payload['fitted_values'] is not None:
+        model.fitted_values_ = pd.read_json(io.StringIO(payload['fitted_values']), orient='table')
+    return model
+
+
+# Function to predict only the future dates. intervals is 'analytic' (closed form, no sampling),
+# 'sample' (Prophet's simulation with n_samples draws) or None (no interval columns).
+def predict_prophet_horizon(model, forecast_horizon, intervals='analytic', n_samples=50):
+    if intervals not in INTERVAL_METHODS:
+        raise ValueError(f"Unknown interval method {intervals!r}, expected one of {INTERVAL_METHODS}")
+    future = model.make_future_dataframe(periods=forecast_horizon, include_history=False)
+    forecast = _with_uncertainty_samples(model, n_samples if intervals == 'sample' else 0).predict(future)
+    if intervals == 'analytic':
+        return analytic_intervals(model, forecast)
+    if intervals is None:
+        return forecast.drop(columns=['yhat_lower', 'yhat_upper'], errors='ignore')
+    return forecast
+
+
+# Function to predict a single Prophet model over its history plus the horizon
+def predict_prophet_model(model, forecast_horizon, mode='full', intervals='analytic', n_samples=50):
+    if mode not in PREDICTION_MODES:
+        raise ValueError(f"Unknown prediction mode {mode!r}, expected one of {PREDICTION_MODES}")
+    if mode == 'fast':
+        horizon = predict_prophet_horizon(model, forecast_horizon, intervals, n_samples)
+        # Component interval columns only sampled for the horizon are NaN over the history
+        return pd.concat([fitted_values(model).reindex(columns=horizon.columns), horizon], ignore_index=True)
+    future = model.make_future_dataframe(periods=forecast_horizon)
+    return model.predict(future)
+
+
+# Function to make predictions
+def make_predictions(supply_model, demand_model, forecast_horizon, mode='full', intervals='analytic', n_samples=50):
+    with span('predict') as record:
+        supply_forecast = predict_prophet_model(supply_model, forecast_horizon, mode, intervals, n_samples)
+        demand_forecast = predict_prophet_model(demand_model, forecast_horizon, mode, intervals, n_samples)
+        record['rows'] = len(supply_forecast) + len(demand_forecast)
+    return supply_forecast, demand_forecast
+
+
+# Function to calculate metrics
+def calculate_metrics(merged_supply, merged_demand):
+    with span('metrics', rows=len(merged_supply) + len(merged_demand)):
+        # Both series are scored in one vectorized pass
+        merged = pd.concat([merged_supply[['y', 'yhat']], merged_demand[['y', 'yhat']]],
+                           keys=['supply', 'demand'], names=['series']).reset_index(level=0)
+        metrics = frame_metrics(merged, ['series'])
+        supply_mae, supply_rmse, supply_r2 = metrics.loc['supply', ['mae', 'rmse', 'r2']]
+        demand_mae, demand_rmse, demand_r2 = metrics.loc['demand', ['mae', 'rmse', 'r2']]
+    return supply_mae, supply_rmse, supply_r2, demand_mae, demand_rmse, demand_r2
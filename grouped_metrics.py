@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ['n', 'mae', 'rmse', 'r2', 'mape', 'bias']
+
+# Same floor sklearn's mean_absolute_percentage_error uses for zero actuals
+_EPSILON = np.finfo(np.float64).eps
+
+
+# Function to compute MAE, RMSE, R², MAPE and bias for many series in one pass.
+# groups labels each row with its series (array-like, or a DataFrame of key columns);
+# rows where either value is NaN (e.g. unmatched rows after a left merge) are skipped.
+# Returns one row per group, matching sklearn's per-series results.
+def grouped_metrics(y_true, y_pred, groups=None):
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    mask = ~(np.isnan(y_true) | np.isnan(y_pred))
+    y_true = y_true[mask]
+    y_pred = y_pred[mask]
+
+    if groups is None:
+        codes = np.zeros(len(y_true), dtype=np.intp)
+        index = pd.Index([0])
+    elif isinstance(groups, pd.DataFrame):
+        index = pd.MultiIndex.from_frame(groups[mask]) if groups.shape[1] > 1 else pd.Index(groups.iloc[:, 0][mask])
+        codes, index = pd.factorize(index, sort=True)
+    else:
+        codes, index = pd.factorize(np.asarray(groups)[mask], sort=True)
+        index = pd.Index(index)
+    n_groups = len(index)
+
+    n = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    error = y_pred - y_true
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae = np.bincount(codes, np.abs(error), n_groups) / n
+        mse = np.bincount(codes, error * error, n_groups) / n
+        bias = np.bincount(codes, error, n_groups) / n
+        mape = np.bincount(codes, np.abs(error) / np.maximum(np.abs(y_true), _EPSILON), n_groups) / n
+
+        mean_true = np.bincount(codes, y_true, n_groups) / n
+        deviation = y_true - mean_true[codes]
+        ss_res = mse * n
+        ss_tot = np.bincount(codes, deviation * deviation, n_groups)
+        r2 = 1 - ss_res / ss_tot
+    # sklearn's conventions for constant actuals and single-sample series
+    r2 = np.where(ss_tot == 0, np.where(ss_res == 0, 1.0, 0.0), r2)
+    r2 = np.where(n < 2, np.nan, r2)
+
+    return pd.DataFrame({
+        'n': n.astype(np.int64),
+        'mae': mae,
+        'rmse': np.sqrt(mse),
+        'r2': r2,
+        'mape': mape,
+        'bias': bias,
+    }, index=index)[METRIC_COLUMNS]
+
+
+# Function to score a long frame of actuals and predictions by its key columns
+def frame_metrics(frame, group_keys, y='y', yhat='yhat'):
+    return grouped_metrics(frame[y], frame[yhat], frame[list(group_keys)])
+
+
+# Function to score a single series, returned as a dict of metrics
+def series_metrics(y_true, y_pred):
+    return grouped_metrics(y_true, y_pred).iloc[0].to_dict()
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from model_cache import make_cache_key
+
+logger = logging.getLogger('IncrementalTraining')
+
+# action is one of 'cached', 'warm_start' or 'full_refit'; previous is the model to continue from
+Plan = namedtuple('Plan', ['action', 'key', 'model', 'previous', 'drift'])
+
+# Consecutive warm starts allowed before a full refit; each CatBoost warm start adds
+# update_iterations trees, so this also bounds the size of a continued model
+MAX_WARM_STARTS = 5
+
+
+# Function to hash the first n_rows of a frame so an upload can be matched against an earlier one
+def prefix_digest(frame, n_rows):
+    return hashlib.sha256(pd.util.hash_pandas_object(frame.iloc[:n_rows], index=True).values.tobytes()).hexdigest()
+
+
+def _rmse(y_true, y_pred):
+    error = np.asarray(y_pred, dtype=np.float64) - np.asarray(y_true, dtype=np.float64)
+    return float(np.sqrt(np.mean(error * error)))
+
+
+class IncrementalTrainer:
+    # Tracks which dataset each cached model was trained on. When a new upload
+    # is the old data with rows appended, the previous model is continued instead
+    # of refit, unless its error on the new rows has drifted past drift_threshold
+    # times its error on the rows it was trained on, or it has already been continued
+    # max_warm_starts times in a row. Lineage files live next to the cache directory,
+    # not in it, so evicting or clearing the cache never removes them.
+    def __init__(self, cache, drift_threshold=1.5, max_warm_starts=MAX_WARM_STARTS, lineage_dir=None):
+        self.cache = cache
+        self.drift_threshold = drift_threshold
+        self.max_warm_starts = max_warm_starts
+        self.lineage_dir = lineage_dir or f"{os.path.normpath(cache.cache_dir)}.lineage"
+        os.makedirs(self.lineage_dir, exist_ok=True)
+
+    def _lineage_path(self, kind, target, features, params):
+        lineage_id = hashlib.sha256(json.dumps([kind, target, list(features), params], sort_keys=True, default=str)
+                                    .encode()).hexdigest()
+        return os.path.join(self.lineage_dir, f"lineage-{lineage_id}.json")
+
+    def _load_lineage(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Function to decide whether to reuse, continue or refit. predict(model, frame)
+    # returns the model's predictions for the rows of frame.
+    def plan(self, kind, frame, target, features, params, predict):
+        columns = list(features) + [target]
+        key = make_cache_key(kind, frame, target, features, params)
+        model = self.cache.get(key, kind)
+        if model is not None:
+            return Plan('cached', key, model, None, None)
+
+        lineage = self._load_lineage(self._lineage_path(kind, target, features, params))
+        if lineage is None or len(frame) <= lineage['n_rows']:
+            return Plan('full_refit', key, None, None, None)
+        if prefix_digest(frame[columns], lineage['n_rows']) != lineage['digest']:
+            return Plan('full_refit', key, None, None, None)
+        if lineage.get('warm_starts', 0) >= self.max_warm_starts:
+            logger.info(f"{kind} {target} was warm-started {lineage['warm_starts']} times in a row, refitting")
+            return Plan('full_refit', key, None, None, None)
+
+        previous = self.cache.get(lineage['model_key'], kind)
+        if previous is None:
+            return Plan('full_refit', key, None, None, None)
+
+        new_rows = frame.iloc[lineage['n_rows']:]
+        drift = _rmse(new_rows[target], predict(previous, new_rows)) / max(lineage['train_rmse'], 1e-12)
+        action = 'warm_start' if drift <= self.drift_threshold else 'full_refit'
+        logger.info(f"{len(new_rows)} appended row(s) for {kind} {target}: drift {drift:.2f}, {action}")
+        return Plan(action, key, None, previous if action == 'warm_start' else None, drift)
+
+    # Function to store the trained model and remember the dataset it was trained on
+    def record(self, plan, kind, frame, target, features, params, model, predict):
+        if plan.action != 'cached':
+            self.cache.put(plan.key, kind, model)
+        columns = list(features) + [target]
+        path = self._lineage_path(kind, target, features, params)
+        warm_starts = 0
+        if plan.action == 'warm_start':
+            warm_starts = ((self._load_lineage(path) or {}).get('warm_starts', 0)) + 1
+        lineage = {
+            'n_rows': len(frame),
+            'digest': prefix_digest(frame[columns], len(frame)),
+            'model_key': plan.key,
+            'train_rmse': _rmse(frame[target], predict(model, frame)),
+            'warm_starts': warm_starts,
+        }
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(lineage, f)
+        os.replace(f"{path}.tmp", path)
+
+    # Function to plan, fit and record in one call. full_fit() trains from scratch
+    # and warm_fit(previous) continues from the previous model.
+    def fit(self, kind, frame, target, features, params, full_fit, warm_fit, predict):
+        plan = self.plan(kind, frame, target, features, params, predict)
+        if plan.action == 'cached':
+            return plan.model, plan.action
+        model = warm_fit(plan.previous) if plan.action == 'warm_start' else full_fit()
+        self.record(plan, kind, frame, target, features, params, model, predict)
+        return model, plan.action
+
+
+# Function to turn a fitted Prophet model's parameters into Stan initial values
+def prophet_warm_start_params(model):
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = model.params[name][0][0] if model.mcmc_samples == 0 else np.mean(model.params[name])
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0] if model.mcmc_samples == 0 else np.mean(model.params[name], axis=0)
+    return params
+
+
+def predict_prophet_rows(model, frame):
+    return model.predict(frame[['ds']])['yhat'].to_numpy()
+
+
+# Prophet places fewer changepoints on short histories, in which case the old deltas can't be reused
+def _n_changepoints(model, df_series):
+    hist_size = int(np.floor(len(df_series) * model.changepoint_range))
+    return max(1, min(model.n_changepoints, hist_size - 1))
+
+
+# Function to refit Prophet with Stan initialised from the previous fit's parameters
+def warm_start_prophet(df_series, previous, params=None, store_fitted=False):
+    from prophet import Prophet
+    from forecasting import PROPHET_PARAMS, attach_fitted_values
+    model = Prophet(**(PROPHET_PARAMS if params is None else params))
+    init = prophet_warm_start_params(previous)
+    if len(init['delta']) != _n_changepoints(model, df_series):
+        del init['delta']
+    model.fit(df_series, init=init)
+    return attach_fitted_values(model) if store_fitted else model
+
+
+# Function to continue boosting the previous CatBoost model on the new training rows
+def warm_start_catboost(X_train, y_train, X_test, y_test, params, previous, update_iterations=100):
+    from catboost import CatBoostRegressor
+    model = CatBoostRegressor(**{**params, 'iterations': update_iterations})
+    model.fit(X_train, y_train, eval_set=(X_test, y_test), use_best_model=True, init_model=previous)
+    return model
+
+
+# Function to fit a Prophet series, warm-starting Stan from the previous fit when rows were appended
+def fit_prophet_incremental(trainer, df_series, params=None):
+    from forecasting import PROPHET_PARAMS, fit_prophet_model
+    params = PROPHET_PARAMS if params is None else params
+    return trainer.fit('prophet', df_series, 'y', ['ds'], params, lambda: fit_prophet_model(df_series, params),
+                       lambda previous: warm_start_prophet(df_series, previous, params), predict_prophet_rows)
+
+
+# Function to fit a CatBoost target, continuing the previous model via init_model when rows were
+# appended. The last test_size share of rows is the eval set, as in the app.
+def fit_catboost_incremental(trainer, frame, target, features, params, test_size=0.2, update_iterations=100):
+    from joint_training import split_index
+    from parallel_training import fit_catboost_target
+    n_train = split_index(len(frame), test_size)
+    X, y = frame[features], frame[target]
+    split = (X[:n_train], y[:n_train], X[n_train:], y[n_train:])
+    return trainer.fit('catboost', frame, target, features, {**params, 'test_size': test_size},
+                       lambda: fit_catboost_target(*split, params),
+                       lambda previous: warm_start_catboost(*split, params, previous, update_iterations),
+                       lambda model, rows: model.predict(rows[features]))
+
+
+# Function to resolve a set of jobs (as for run_cached_parallel) through the incremental
+# trainer: cache hits are reused, appended data is warm-started in this process, and
+# only full refits go to the process pool. Jobs with a 'predict' and 'warm_fn' entry
+# take part in warm starts; others (e.g. CV results) are plain cache lookups. A job's
+# 'kwargs' may be a function returning them, called only if the job goes to the pool.
+# Returns (results, actions), both keyed by job name.
+def run_incremental_parallel(trainer, jobs, max_workers=None, total_threads=None):
+    from parallel_training import run_parallel
+    plans = {}
+    for name, job in jobs.items():
+        if 'predict' in job:
+            plans[name] = trainer.plan(job['kind'], job['frame'], job['target'], job['features'], job['params'],
+                                       job['predict'])
+        else:
+            key = make_cache_key(job['kind'], job['frame'], job['target'], job['features'], job['params'])
+            cached = trainer.cache.get(key, job['kind'])
+            plans[name] = Plan('cached' if cached is not None else 'full_refit', key, cached, None, None)
+
+    tasks = {name: (jobs[name]['fn'], jobs[name]['kwargs']() if callable(jobs[name]['kwargs']) else jobs[name]['kwargs'])
+             for name, plan in plans.items() if plan.action == 'full_refit'}
+    fitted = run_parallel(tasks, max_workers, total_threads)
+
+    results = {}
+    for name, plan in plans.items():
+        job = jobs[name]
+        if plan.action == 'cached':
+            results[name] = plan.model
+            continue
+        results[name] = job['warm_fn'](plan.previous) if plan.action == 'warm_start' else fitted[name]
+        if 'predict' in job:
+            trainer.record(plan, job['kind'], job['frame'], job['target'], job['features'], job['params'],
+                           results[name], job['predict'])
+        else:
+            trainer.cache.put(plan.key, job['kind'], results[name])
+    return results, {name: plan.action for name, plan in plans.items()}
@@ -0,0 +1,193 @@
+import hashlib
+import io
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger('IngestCache')
+
+DEFAULT_INGEST_DIR = os.environ.get('FORECAST_INGEST_CACHE', '.ingest_cache')
+# Bounds on the parsed uploads kept; least recently loaded files are removed past either
+MAX_INGEST_BYTES = 1024 * 1024 * 1024
+MAX_INGEST_FILES = 64
+
+# Largest error a measure may pick up when it is stored as float32, so values recorded
+# to three decimals (and cents) read back unchanged
+FLOAT32_ATOL = 5e-4
+
+# Columns each app actually uses, with explicit dtypes so the parser skips type inference
+PROPHET_SPEC = {
+    'format': 'excel',
+    'sheet_name': 'Sheet1',
+    'date_column': 'Date of Extraction Process',
+    'date_format': None,
+    'dtypes': {
+        'Cobalt Market Value (USD)': 'float64',
+        'Recycled Content (%)': 'float64',
+    },
+}
+
+CATBOOST_SPEC = {
+    'format': 'csv',
+    'date_column': 'Date',
+    'date_format': '%d-%m-%Y',
+    'dtypes': {
+        'Debit EUR': 'float64',
+        'Credit EUR': 'float64',
+        'Vendor Quality History': 'float64',
+        'Vendor Consistency': 'float64',
+        'Processing Efficiency (%)': 'float64',
+    },
+    # Kept for the preview as categoricals when the upload has them
+    'categories': ['Vendor', 'Material', 'Stockroom'],
+    'downcast': True,
+}
+
+
+# Function to hash the uploaded bytes together with the parse spec
+def ingest_key(data, spec):
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(spec, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+# Function to store float64 columns as float32 when every value survives the round trip
+def downcast_floats(frame, columns=None, atol=FLOAT32_ATOL):
+    columns = frame.select_dtypes('float64').columns if columns is None else columns
+    for column in columns:
+        values = frame[column].to_numpy()
+        narrow = values.astype(np.float32)
+        if np.allclose(narrow, values, rtol=0, atol=atol, equal_nan=True):
+            frame[column] = narrow
+    return frame
+
+
+def _read_raw(data, spec, usecols=None, dtype=None):
+    if spec['format'] == 'excel':
+        return pd.read_excel(io.BytesIO(data), sheet_name=spec.get('sheet_name', 0), usecols=usecols, dtype=dtype)
+    return pd.read_csv(io.BytesIO(data), usecols=usecols, dtype=dtype)
+
+
+# Function to parse only the needed columns from the raw upload; the other columns
+# are skipped by the parser, so they are never materialized
+def parse_upload(data, spec):
+    columns = [spec['date_column']] + list(spec['dtypes'])
+    categories = spec.get('categories', [])
+    wanted = set(columns + categories)
+    dtypes = {**spec['dtypes'], **{c: 'category' for c in categories}}
+    frame = _read_raw(data, spec, usecols=lambda c: c in wanted, dtype=dtypes)
+
+    missing = [c for c in columns if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Upload is missing required columns {missing}")
+    frame = frame.dropna(subset=[spec['date_column']])
+    frame[spec['date_column']] = pd.to_datetime(frame[spec['date_column']], format=spec['date_format'])
+    frame = frame[columns + [c for c in categories if c in frame.columns]].reset_index(drop=True)
+    for column in categories:
+        if column in frame.columns:
+            frame[column] = frame[column].cat.remove_unused_categories()
+    if spec.get('downcast'):
+        downcast_floats(frame, list(spec['dtypes']))
+    return frame
+
+
+# Function to build the feature matrix once, as a single contiguous float32 block that
+# the supply and demand models (and their train/test views) all share
+def feature_matrix(frame, feature_columns):
+    values = np.ascontiguousarray(frame[feature_columns].to_numpy(dtype=np.float32))
+    return pd.DataFrame(values, index=frame.index, columns=feature_columns, copy=False)
+
+
+# Function to compare each column's memory as a plain read of the whole upload against the
+# compact frame the spec loads. The last row holds the totals and the reduction factor.
+def memory_report(data, spec, compact=None):
+    raw = _read_raw(data, spec)
+    compact = parse_upload(data, spec) if compact is None else compact
+    raw_bytes = raw.memory_usage(index=False, deep=True)
+    compact_bytes = compact.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'column': raw.columns,
+        'raw_dtype': raw.dtypes.astype(str).values,
+        'raw_bytes': raw_bytes.values,
+        'compact_dtype': [str(compact[c].dtype) if c in compact.columns else 'dropped' for c in raw.columns],
+        'compact_bytes': [int(compact_bytes[c]) if c in compact.columns else 0 for c in raw.columns],
+    })
+    total = pd.DataFrame([{'column': 'total', 'raw_dtype': '', 'raw_bytes': int(raw_bytes.sum()),
+                           'compact_dtype': '', 'compact_bytes': int(compact_bytes.sum())}])
+    report = pd.concat([report, total], ignore_index=True)
+    report['reduction'] = report['raw_bytes'] / report['compact_bytes'].replace(0, np.nan)
+    logger.info(f"Upload uses {report['raw_bytes'].iloc[-1] / 1e6:.2f} MB as read, "
+                f"{report['compact_bytes'].iloc[-1] / 1e6:.2f} MB compact ({report['reduction'].iloc[-1]:.1f}x)")
+    return report
+
+
+def _write_arrow(frame, path):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    # Uncompressed IPC file so later loads can memory-map the buffers directly
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _read_arrow(path):
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+# Function to remove the least recently loaded uploads until at most max_files of them,
+# using at most max_bytes, are left. Only ingest entries are considered; the database
+# mirrors (source-*) kept in the same directory are left alone. keep is never removed.
+def evict_ingest_cache(cache_dir=DEFAULT_INGEST_DIR, max_bytes=MAX_INGEST_BYTES, max_files=MAX_INGEST_FILES,
+                       keep=None):
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith('.arrow') and not name.startswith('source-') and path != keep:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort(reverse=True)
+    total = os.path.getsize(keep) if keep is not None and os.path.exists(keep) else 0
+    count = 0 if keep is None else 1
+    for _, size, path in entries:
+        total += size
+        count += 1
+        if total <= max_bytes and count <= max_files:
+            continue
+        try:
+            os.remove(path)
+            logger.info(f"Evicted {path} from ingest cache")
+        except OSError:
+            pass
+
+
+# Function to load an upload through the columnar cache: parse once, then memory-map.
+# A hit refreshes the file's mtime, so eviction removes the least recently loaded uploads.
+def load_columnar(data, spec, cache_dir=DEFAULT_INGEST_DIR, max_bytes=MAX_INGEST_BYTES, max_files=MAX_INGEST_FILES):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{ingest_key(data, spec)}.arrow")
+
+    if os.path.exists(path):
+        try:
+            frame = _read_arrow(path)
+            os.utime(path)
+            logger.info(f"Ingest cache hit {path}")
+            return frame
+        except Exception as e:
+            logger.warning(f"Discarding unreadable ingest cache entry {path}: {e}")
+            os.remove(path)
+
+    frame = parse_upload(data, spec)
+    _write_arrow(frame, path)
+    logger.info(f"Ingested {len(frame)} rows into {path}")
+    evict_ingest_cache(cache_dir, max_bytes, max_files, keep=path)
+    return frame
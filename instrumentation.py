@@ -0,0 +1,236 @@
+import contextvars
+import io
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger('Instrumentation')
+
+SPAN_COLUMNS = ['run', 'stage', 'parent', 'status', 'start', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rows']
+PROFILERS = ['cprofile', 'pyinstrument']
+METRIC_PREFIX = 'forecast'
+
+
+# Function to read the process's peak resident set size in MB
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+# Function to count the rows of a stage's output when it is a frame, series or array
+def row_count(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)) or getattr(value, 'ndim', 0) >= 1:
+        return len(value)
+    return None
+
+
+class Recorder:
+    # Collects timing spans (wall time, process CPU time, peak RSS and row count per
+    # stage). The apps keep one per session; CLIs and tests use the default recorder.
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+        self.run = 0
+        self._lock = threading.Lock()
+        self._parents = contextvars.ContextVar(f'span_parents_{id(self)}', default=())
+
+    # Function to mark the start of a new run (a Streamlit rerun), so the panel can show only its spans
+    def start_run(self):
+        with self._lock:
+            self.run += 1
+        return self.run
+
+    # Context manager timing one stage. The yielded record can be updated inside the
+    # block, e.g. record['rows'] = len(result) once the row count is known. CPU time is
+    # the whole process's, so it includes threads (not processes) the stage starts.
+    @contextmanager
+    def span(self, stage, rows=None):
+        parents = self._parents.get()
+        record = {'run': self.run, 'stage': stage, 'parent': parents[-1] if parents else None, 'status': 'ok',
+                  'start': time.time(), 'rows': rows}
+        token = self._parents.set(parents + (stage,))
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        except BaseException:
+            record['status'] = 'error'
+            raise
+        finally:
+            self._parents.reset(token)
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            record['peak_rss_mb'] = peak_rss_mb()
+            with self._lock:
+                self.spans.append(record)
+            rows_text = '' if record['rows'] is None else f", {record['rows']} rows"
+            logger.info(f"{stage} {record['status']}: {record['wall_seconds']:.3f}s wall, "
+                        f"{record['cpu_seconds']:.3f}s CPU{rows_text}")
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def frame(self, run=None):
+        with self._lock:
+            spans = [s for s in self.spans if run is None or s['run'] == run]
+        return pd.DataFrame(spans, columns=SPAN_COLUMNS)
+
+    def to_jsonl(self, run=None):
+        with self._lock:
+            spans = [s for s in self.spans if run is None or s['run'] == run]
+        return ''.join(json.dumps({k: s.get(k) for k in SPAN_COLUMNS}) + '\n' for s in spans)
+
+    # Function to append the spans as JSON lines to a file
+    def write_jsonl(self, path, run=None):
+        with open(path, 'a') as f:
+            f.write(self.to_jsonl(run))
+
+    # Function to render per-stage totals in the Prometheus text exposition format
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        spans = self.frame()
+        lines = []
+
+        def metric(name, kind, help_text, values):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in values:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value:.6g}" if label_text else f"{prefix}_{name} {value:.6g}")
+
+        by_stage = spans.groupby('stage', sort=True)
+        metric('stage_runs_total', 'counter', 'Completed stage runs.',
+               [({'stage': stage, 'status': status}, len(rows)) for (stage, status), rows in spans.groupby(['stage', 'status'])])
+        metric('stage_wall_seconds_total', 'counter', 'Wall time spent in each stage.',
+               [({'stage': stage}, rows['wall_seconds'].sum()) for stage, rows in by_stage])
+        metric('stage_cpu_seconds_total', 'counter', 'Process CPU time spent in each stage.',
+               [({'stage': stage}, rows['cpu_seconds'].sum()) for stage, rows in by_stage])
+        metric('stage_rows_total', 'counter', 'Rows processed by each stage.',
+               [({'stage': stage}, rows['rows'].sum()) for stage, rows in by_stage if rows['rows'].notna().any()])
+        metric('stage_last_wall_seconds', 'gauge', 'Wall time of the latest run of each stage.',
+               [({'stage': stage}, rows['wall_seconds'].iloc[-1]) for stage, rows in by_stage])
+        rss = peak_rss_mb()
+        if rss is not None:
+            metric('peak_rss_bytes', 'gauge', 'Peak resident set size of the process.', [({}, rss * 1024 * 1024)])
+        return '\n'.join(lines) + '\n'
+
+
+DEFAULT_RECORDER = Recorder()
+_active = contextvars.ContextVar('active_recorder', default=None)
+
+
+def get_recorder():
+    return _active.get() or DEFAULT_RECORDER
+
+
+# Function to route spans from this thread (a Streamlit script run) to the given recorder
+def set_recorder(recorder):
+    _active.set(recorder)
+
+
+@contextmanager
+def use_recorder(recorder):
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+
+
+# Function to get the session's recorder from a store (st.session_state), start a new
+# run on it and make it the active recorder for this script run
+def session_recorder(store, key='instrumentation'):
+    if key not in store:
+        store[key] = Recorder()
+    recorder = store[key]
+    recorder.start_run()
+    set_recorder(recorder)
+    return recorder
+
+
+# Function to time a stage in the active recorder
+def span(stage, rows=None):
+    return get_recorder().span(stage, rows)
+
+
+class RunProfiler:
+    # Profiles everything between start() and stop() with cProfile or, when installed,
+    # pyinstrument; stop() returns the text report
+    def __init__(self, profiler='cprofile', top=30):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+        self.profiler = profiler
+        self.top = top
+        self._profile = None
+
+    def start(self):
+        if self.profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("pyinstrument is not installed; use the cprofile profiler or pip install pyinstrument")
+            self._profile = Profiler()
+            self._profile.start()
+        else:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self):
+        if self.profiler == 'pyinstrument':
+            self._profile.stop()
+            return self._profile.output_text()
+
+        import pstats
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+        return out.getvalue()
+
+
+@contextmanager
+def profile_run(profiler='cprofile', top=30):
+    run_profiler = RunProfiler(profiler, top).start()
+    result = {'profiler': profiler, 'report': None}
+    try:
+        yield result
+    finally:
+        result['report'] = run_profiler.stop()
+
+
+# Function to draw the collapsible instrumentation panel in a Streamlit sidebar
+def sidebar_panel(recorder, profile_report=None):
+    import streamlit as st
+
+    with st.sidebar.expander("Instrumentation"):
+        spans = recorder.frame(recorder.run)
+        if spans.empty:
+            st.caption("No stages ran in this run.")
+        else:
+            st.dataframe(spans[['stage', 'status', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rows']], hide_index=True)
+            st.caption(f"{spans.loc[spans['parent'].isna(), 'wall_seconds'].sum():.2f}s wall in top-level stages")
+        # The export payloads are only built while this is ticked, not on every rerun
+        if st.checkbox("Export spans and metrics"):
+            st.download_button("Download spans (JSON lines)", recorder.to_jsonl(), file_name="spans.jsonl",
+                               mime="application/jsonl")
+            st.download_button("Download metrics (Prometheus)", recorder.to_prometheus(), file_name="metrics.prom",
+                               mime="text/plain")
+        if profile_report:
+            st.text(profile_report)
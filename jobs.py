@@ -0,0 +1,195 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('JobScheduler')
+
+STATUSES = ['queued', 'running', 'done', 'failed', 'cancelled']
+FINISHED = {'done', 'failed', 'cancelled'}
+# How often the apps poll a running job's progress
+POLL_SECONDS = 0.5
+
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    # One unit of background work, shared by every session that submitted the same key
+    def __init__(self, key, name, cpu_heavy=False):
+        self.key = key
+        self.name = name
+        self.cpu_heavy = cpu_heavy
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.seconds = None
+        self.owners = set()
+        self.future = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.finished
+
+    def snapshot(self):
+        return {'key': self.key, 'name': self.name, 'status': self.status, 'progress': self.progress,
+                'message': self.message, 'owners': len(self.owners), 'seconds': self.seconds,
+                'error': None if self.error is None else repr(self.error)}
+
+
+# Function to return the job the calling worker thread is running, or None outside a job
+def current_job():
+    return getattr(_current, 'job', None)
+
+
+# Function for job code to report progress (0 to 1); a no-op when not running as a job
+def report_progress(fraction, message=''):
+    job = current_job()
+    if job is not None:
+        job.progress = float(min(max(fraction, 0.0), 1.0))
+        job.message = message
+
+
+# Function for job code to stop at a safe point once every owner has cancelled the job
+def check_cancelled():
+    job = current_job()
+    if job is not None and job.cancel_requested:
+        raise JobCancelled(f"Job {job.name} was cancelled")
+
+
+class JobScheduler:
+    # Shared in-process scheduler (one per server via st.cache_resource). Jobs run on a
+    # bounded thread pool; a job submitted while an identical one (same key, i.e. same
+    # data hash and parameters) is queued, running or recently finished is joined instead
+    # of run again. CPU-heavy jobs additionally take one of max_cpu_jobs slots, so a burst
+    # of uploads cannot start more fits than the machine can run at once.
+    def __init__(self, max_workers=4, max_cpu_jobs=None, keep_finished=64):
+        self.max_workers = max_workers
+        self.max_cpu_jobs = max_cpu_jobs or max(1, min(max_workers, (os.cpu_count() or 2) // 2))
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forecast-job')
+        self._cpu_slots = threading.BoundedSemaphore(self.max_cpu_jobs)
+        self._jobs = OrderedDict()
+        self._lock = threading.RLock()
+
+    def submit(self, key, fn, *args, name=None, cpu_heavy=False, owner=None, **kwargs):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status in ('failed', 'cancelled'):
+                job = None  # Retry rather than hand back a stale failure
+            if job is not None:
+                job.owners.add(owner)
+                self._jobs.move_to_end(key)
+                logger.info(f"Joined existing job {job.name} ({job.status})")
+                return job
+
+            job = Job(key, name or getattr(fn, '__name__', 'job'), cpu_heavy)
+            job.owners.add(owner)
+            self._jobs[key] = job
+            # Run in a copy of the submitter's context, so its spans reach the submitting session's recorder
+            job.future = self._executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+            self._prune()
+            return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    # Function to drop an owner's interest in a job; the job itself is cancelled only
+    # when no other session is still waiting for it
+    def cancel(self, key, owner=None):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.finished:
+                return False
+            job.owners.discard(owner)
+            if job.owners:
+                return False
+            job._cancel.set()
+            if job.status == 'queued' and job.future.cancel():
+                self._finish(job, 'cancelled')
+            return True
+
+    def jobs(self):
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for job in self._jobs.values():
+                job._cancel.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        start = time.perf_counter()
+        _current.job = job
+        try:
+            if job.cpu_heavy:
+                while not self._cpu_slots.acquire(timeout=0.1):
+                    check_cancelled()
+            try:
+                check_cancelled()
+                job.status = 'running'
+                result = fn(*args, **kwargs)
+            finally:
+                if job.cpu_heavy:
+                    self._cpu_slots.release()
+            job.result = result
+            job.progress = 1.0
+            self._finish(job, 'done', start)
+        except JobCancelled:
+            self._finish(job, 'cancelled', start)
+        except Exception as e:
+            job.error = e
+            logger.exception(f"Job {job.name} failed")
+            self._finish(job, 'failed', start)
+        finally:
+            _current.job = None
+
+    def _finish(self, job, status, start=None):
+        job.status = status
+        if start is not None:
+            job.seconds = time.perf_counter() - start
+        job._done.set()
+        logger.info(f"Job {job.name} {status}" + ('' if job.seconds is None else f" in {job.seconds:.3f}s"))
+
+    # Function to forget the oldest finished jobs beyond keep_finished
+    def _prune(self):
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[key]
+
+
+# Function to show a job's progress in a Streamlit fragment that polls the scheduler
+# and reruns the whole script once the job has finished
+def show_progress(scheduler, key, poll_seconds=POLL_SECONDS):
+    import streamlit as st
+
+    @st.fragment(run_every=poll_seconds)
+    def poll():
+        job = scheduler.get(key)
+        if job is None or job.finished:
+            st.rerun()
+        status = 'waiting for a free worker' if job.status == 'queued' else job.message or 'running'
+        st.progress(job.progress, text=f"{job.name}: {status}")
+
+    poll()
@@ -0,0 +1,115 @@
+import logging
+import math
+import time
+
+import pandas as pd
+
+from grouped_metrics import grouped_metrics
+from model_cache import make_cache_key
+from parallel_training import cv_catboost_target, fit_catboost_target, run_parallel
+
+logger = logging.getLogger('JointTraining')
+
+
+# Function to split off the last test_size share of rows, like train_test_split(shuffle=False)
+def split_index(n_rows, test_size=0.2):
+    return n_rows - math.ceil(n_rows * test_size)
+
+
+def _joint_params(params):
+    return {**params, 'loss_function': 'MultiRMSE'}
+
+
+# Function to train one MultiRMSE model on all targets. The feature Pool is
+# quantized once; CV and the final fit run on slices that reuse its borders.
+def train_joint(X, Y, params, fold_count, test_size=0.2):
+    from catboost import CatBoostRegressor, Pool, cv
+
+    start = time.perf_counter()
+    pool = Pool(data=X, label=Y.to_numpy())
+    pool.quantize()
+    n_train = split_index(len(X), test_size)
+    train_pool = pool.slice(list(range(n_train)))
+    test_pool = pool.slice(list(range(n_train, len(X))))
+
+    cv_results = cv(
+        params=_joint_params(params),
+        pool=train_pool,
+        fold_count=fold_count,
+        partition_random_seed=42,
+        shuffle=False,
+        stratified=False,
+        verbose=False,
+        plot=False
+    )
+    model = CatBoostRegressor(**_joint_params(params))
+    model.fit(train_pool, eval_set=test_pool, use_best_model=True)
+
+    seconds = time.perf_counter() - start
+    logger.info(f"Joint MultiRMSE training on {list(Y.columns)} took {seconds:.2f}s")
+    return model, cv_results, seconds
+
+
+# Function to train the joint model through the model cache
+def train_joint_cached(cache, frame, feature_columns, target_columns, params, fold_count, test_size=0.2):
+    target_columns = list(target_columns)
+    key_params = {**_joint_params(params), 'targets': target_columns, 'fold_count': fold_count, 'test_size': test_size}
+    key_args = (frame, target_columns[-1], list(feature_columns) + target_columns[:-1], key_params)
+    model_key = make_cache_key('catboost', *key_args)
+    cv_key = make_cache_key('cv_results', *key_args)
+
+    model = cache.get(model_key, 'catboost')
+    cv_results = cache.get(cv_key, 'cv_results')
+    if model is None or cv_results is None:
+        model, cv_results, _ = train_joint(frame[feature_columns], frame[target_columns], params, fold_count, test_size)
+        cache.put(model_key, 'catboost', model)
+        cache.put(cv_key, 'cv_results', cv_results)
+    return model, cv_results
+
+
+# Function to train per-target models the way the app's per-target mode does: every
+# target's CV in the process pool at once, then every final fit, each task with its share
+# of the threads. target_params optionally gives a target its own params.
+def train_per_target(X, Y, params, fold_count, test_size=0.2, target_params=None, early_stopping_rounds=None,
+                     max_workers=None, total_threads=None):
+    start = time.perf_counter()
+    n_train = split_index(len(X), test_size)
+    params_for = {target: (target_params or {}).get(target, params) for target in Y.columns}
+    X_train, X_test = X[:n_train], X[n_train:]
+    run_parallel({
+        target: (cv_catboost_target, {'X_train': X_train, 'y_train': Y[target][:n_train], 'params': params_for[target],
+                                      'fold_count': fold_count, 'early_stopping_rounds': early_stopping_rounds})
+        for target in Y.columns
+    }, max_workers, total_threads)
+    models = run_parallel({
+        target: (fit_catboost_target, {'X_train': X_train, 'y_train': Y[target][:n_train], 'X_test': X_test,
+                                       'y_test': Y[target][n_train:], 'params': params_for[target]})
+        for target in Y.columns
+    }, max_workers, total_threads)
+    return models, time.perf_counter() - start
+
+
+# Function to compare accuracy and training time of the joint and per-target modes.
+# The per-target options (target_params, early_stopping_rounds, max_workers,
+# total_threads) are passed on to train_per_target.
+def compare_modes(X, Y, params, fold_count, test_size=0.2, **per_target_options):
+    n_train = split_index(len(X), test_size)
+    X_test, Y_test = X[n_train:], Y[n_train:]
+
+    joint_model, _, joint_seconds = train_joint(X, Y, params, fold_count, test_size)
+    per_target_models, per_target_seconds = train_per_target(X, Y, params, fold_count, test_size, **per_target_options)
+
+    joint_predictions = joint_model.predict(X_test)
+    rows = []
+    for i, target in enumerate(Y.columns):
+        for mode, yhat in (('joint', joint_predictions[:, i]), ('per-target', per_target_models[target].predict(X_test))):
+            metrics = grouped_metrics(Y_test[target], yhat).iloc[0]
+            rows.append({'target': target, 'mode': mode, 'rmse': metrics['rmse'], 'mae': metrics['mae'], 'r2': metrics['r2']})
+
+    timings = {
+        'joint_seconds': joint_seconds,
+        'per_target_seconds': per_target_seconds,
+        'time_saved_seconds': per_target_seconds - joint_seconds,
+    }
+    logger.info(f"Joint mode saved {timings['time_saved_seconds']:.2f}s over per-target training")
+    return pd.DataFrame(rows), timings
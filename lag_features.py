@@ -0,0 +1,99 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger('LagFeatures')
+
+TARGET_COLUMNS = ['Debit EUR', 'Credit EUR']
+# Days back from the row's date; lag 0 is the row's own value, so a row describes
+# everything known at the end of its day and can be the origin of a forecast
+LAGS = (0, 1, 2, 6, 13, 27)
+ROLLING_WINDOWS = (7, 28)
+CALENDAR_FEATURES = ('dayofweek', 'day', 'month', 'dayofyear')
+
+# series is the daily frame the features were built from; recomputed is how many
+# trailing rows the last update had to compute
+FeatureSet = namedtuple('FeatureSet', ['series', 'features', 'recomputed'])
+
+
+# Function to total the targets per day, with days without rows as 0, so the lags
+# and windows below count calendar days rather than ledger rows
+def daily_series(frame, targets=TARGET_COLUMNS, date_column=None):
+    dates = frame.index if date_column is None else frame[date_column]
+    daily = frame[list(targets)].astype('float64').groupby(pd.DatetimeIndex(dates).normalize()).sum()
+    daily.index.name = 'Date'
+    return daily.asfreq('D', fill_value=0.0)
+
+
+# Function to return the calendar features of a DatetimeIndex as float32 columns
+def calendar_features(dates):
+    dates = pd.DatetimeIndex(dates)
+    return {name: getattr(dates, name).to_numpy(dtype=np.float32) for name in CALENDAR_FEATURES}
+
+
+# Rows of history a row's features reach back over
+def lookback(lags=LAGS, windows=ROLLING_WINDOWS):
+    return max(max(lags, default=0), max(windows, default=1) - 1)
+
+
+def _lag(values, k):
+    lagged = np.full(len(values), np.nan)
+    lagged[k:] = values[:len(values) - k]
+    return lagged
+
+
+# Function to return the mean and sample std of the window ending at each row (NaN
+# until a full window is available)
+def _rolling(values, window):
+    mean = np.full(len(values), np.nan)
+    std = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = sliding_window_view(values, window)
+        mean[window - 1:] = windows.mean(axis=1)
+        std[window - 1:] = windows.std(axis=1, ddof=1) if window > 1 else 0.0
+    return mean, std
+
+
+# Function to build lag, rolling-window and calendar features for every row of a
+# daily series, as whole-column NumPy operations
+def build_features(series, lags=LAGS, windows=ROLLING_WINDOWS):
+    columns = {}
+    for target in series.columns:
+        values = series[target].to_numpy(dtype=np.float64)
+        for k in lags:
+            columns[f"{target} lag{k}"] = _lag(values, k)
+        for window in windows:
+            columns[f"{target} mean{window}"], columns[f"{target} std{window}"] = _rolling(values, window)
+    columns.update(calendar_features(series.index))
+    return pd.DataFrame(columns, index=series.index).astype(np.float32)
+
+
+# Function to find the first row of series that differs from previous_series; rows
+# before it keep their features, since a row only depends on its own and earlier days.
+# Returns 0 when series does not extend previous_series at all.
+def first_changed_row(previous_series, series):
+    n = len(previous_series)
+    if (n > len(series) or list(previous_series.columns) != list(series.columns)
+            or not series.index[:n].equals(previous_series.index)):
+        return 0
+    same = (series.iloc[:n].to_numpy() == previous_series.to_numpy()).all(axis=1)
+    changed = np.flatnonzero(~same)
+    return int(changed[0]) if len(changed) else n
+
+
+# Function to bring a FeatureSet up to date with series. When series is the previous
+# series with days appended (or the last day's totals grown), only the changed rows are
+# computed, from a slice reaching back lookback() days; otherwise everything is rebuilt.
+def update_features(series, previous=None, lags=LAGS, windows=ROLLING_WINDOWS):
+    start = 0 if previous is None else first_changed_row(previous.series, series)
+    if start == 0:
+        return FeatureSet(series, build_features(series, lags, windows), len(series))
+
+    context = max(0, start - lookback(lags, windows))
+    tail = build_features(series.iloc[context:], lags, windows).iloc[start - context:]
+    features = pd.concat([previous.features.iloc[:start], tail])
+    logger.info(f"Updated features for {len(tail)} of {len(series)} days")
+    return FeatureSet(series, features, len(tail))
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger('ModelCache')
+
+DEFAULT_CACHE_DIR = os.environ.get('FORECAST_MODEL_CACHE', '.model_cache')
+
+
+# Serializers for each kind of cached object (file extension, save, load)
+def _save_catboost(model, path):
+    model.save_model(path, format='cbm')
+
+
+def _load_catboost(path):
+    from catboost import CatBoostRegressor
+    model = CatBoostRegressor()
+    model.load_model(path, format='cbm')
+    return model
+
+
+# Prophet models are stored with their in-sample fitted values (see forecasting.prophet_to_json)
+def _save_prophet(model, path):
+    from forecasting import prophet_to_json
+    with open(path, 'w') as fout:
+        fout.write(prophet_to_json(model))
+
+
+def _load_prophet(path):
+    from forecasting import prophet_from_json
+    with open(path, 'r') as fin:
+        return prophet_from_json(fin.read())
+
+
+def _save_frame(frame, path):
+    pd.to_pickle(frame, path)
+
+
+def _load_frame(path):
+    return pd.read_pickle(path)
+
+
+def _save_params(params, path):
+    with open(path, 'w') as fout:
+        json.dump(params, fout, default=str)
+
+
+def _load_params(path):
+    with open(path) as fin:
+        return json.load(fin)
+
+
+SERIALIZERS = {
+    'catboost': ('.cbm', _save_catboost, _load_catboost),
+    'prophet': ('.json', _save_prophet, _load_prophet),
+    'cv_results': ('.pkl', _save_frame, _load_frame),
+    'frame': ('.pkl', _save_frame, _load_frame),
+    'params': ('.json', _save_params, _load_params),
+}
+
+
+# Function to hash the contents of a data frame (values, index, column names and dtypes)
+def frame_fingerprint(frame):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    digest.update(json.dumps([[str(c), str(t)] for c, t in frame.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+
+# Function to build the cache key from the input frame, target/feature columns and params
+def make_cache_key(kind, frame, target, features, params):
+    columns = list(features) + [target]
+    digest = hashlib.sha256()
+    digest.update(kind.encode())
+    digest.update(frame_fingerprint(frame[columns]).encode())
+    digest.update(json.dumps({'target': target, 'features': list(features), 'params': params},
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ModelCache:
+    # In-memory LRU in front of an on-disk store with size-based eviction
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_items=16, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, kind):
+        extension = SERIALIZERS[kind][0]
+        return os.path.join(self.cache_dir, f"{kind}-{key}{extension}")
+
+    def _remember(self, key, model):
+        self._memory[key] = model
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key, kind):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            path = self._path(key, kind)
+            if not os.path.exists(path):
+                return None
+            try:
+                model = SERIALIZERS[kind][2](path)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+                os.remove(path)
+                return None
+            os.utime(path)  # Mark as recently used for disk eviction
+            self._remember(key, model)
+            return model
+
+    def put(self, key, kind, model):
+        with self._lock:
+            self._remember(key, model)
+            path = self._path(key, kind)
+            tmp_path = f"{path}.tmp"
+            SERIALIZERS[kind][1](model, tmp_path)
+            os.replace(tmp_path, path)
+            self.evict()
+
+    # Remove least recently used files until the store fits in max_disk_bytes
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if os.path.isfile(path) and not name.endswith('.tmp'):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_disk_bytes:
+                    break
+                os.remove(path)
+                total -= size
+                logger.info(f"Evicted {path} from model cache")
+
+    # Function to load the most recently used disk entries into memory (up to the LRU size),
+    # so the first requests after a restart skip deserialization. Returns the number loaded.
+    def warm(self, kinds=None, limit=None):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            kind, _, rest = name.partition('-')
+            key, extension = os.path.splitext(rest)
+            if kind in SERIALIZERS and SERIALIZERS[kind][0] == extension and (kinds is None or kind in kinds):
+                entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), key, kind))
+        loaded = 0
+        count = min(limit or self.max_memory_items, self.max_memory_items)
+        for _, key, kind in sorted(entries)[-count:]:  # Oldest first, so the newest end up most recently used
+            if self.get(key, kind) is not None:
+                loaded += 1
+        logger.info(f"Warmed {loaded} model cache entries")
+        return loaded
+
+    def disk_usage(self):
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in os.listdir(self.cache_dir))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    # Return the cached object for these inputs, calling fit_fn only on a miss
+    def get_or_fit(self, kind, frame, target, features, params, fit_fn):
+        key = make_cache_key(kind, frame, target, features, params)
+        model = self.get(key, kind)
+        if model is not None:
+            logger.info(f"Model cache hit for {kind} {target}")
+            return model
+
+        logger.info(f"Model cache miss for {kind} {target}, fitting")
+        model = fit_fn()
+        self.put(key, kind, model)
+        return model
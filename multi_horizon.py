@@ -0,0 +1,134 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from lag_features import TARGET_COLUMNS, calendar_features
+
+logger = logging.getLogger('MultiHorizon')
+
+MAX_HORIZON = 36
+# Inclusive day ranges; each gets its own model, with the horizon as a feature inside a bucket
+HORIZON_BUCKETS = ((1, 7), (8, 14), (15, 28), (29, 36))
+
+
+# Function to clip the buckets to max_horizon, dropping those that start past it
+def horizon_buckets(max_horizon=MAX_HORIZON, buckets=HORIZON_BUCKETS):
+    return [(lo, min(hi, max_horizon)) for lo, hi in buckets if lo <= max_horizon]
+
+
+# Function to describe each origin row for a given horizon: its features, the horizon,
+# and the calendar features of the date being predicted instead of the origin's
+def _horizon_rows(features, dates, horizon):
+    return features.assign(horizon=np.float32(horizon),
+                           **calendar_features(dates + pd.Timedelta(days=horizon))).astype(np.float32)
+
+
+# Function to stack the training rows of one bucket: origin row t with horizon h is
+# labelled with the target's value h days later. Built per horizon, not per row.
+def stack_horizons(features, series, target, horizons):
+    n = len(features)
+    values = series[target].to_numpy()
+    blocks, labels = [], []
+    for h in horizons:
+        if h >= n:
+            break
+        blocks.append(_horizon_rows(features.iloc[:n - h], features.index[:n - h], h))
+        labels.append(values[h:])
+    if not blocks:
+        return None, None
+    return pd.concat(blocks, ignore_index=True), np.concatenate(labels)
+
+
+# Function run in a worker: stack one target's rows for a bucket of horizons from the
+# daily features and targets, and fit its CatBoost model. Stacking here means each
+# worker is sent the daily frame (or a feature store handle to it), not the stacked rows.
+def fit_horizon_bucket(frame, feature_columns, target, horizons, params, threads=1):
+    from catboost import CatBoostRegressor
+    X, y = stack_horizons(frame[feature_columns], frame, target, horizons)
+    model = CatBoostRegressor(**params, thread_count=threads)
+    model.fit(X, y)
+    return model
+
+
+# Function to train one model per target and horizon bucket (direct strategy), all in
+# the process pool at once. With a ModelCache, buckets already trained on the same daily
+# features and parameters are reused; with a FeatureStore, the daily frame is written
+# once, only if some bucket is trained, and workers memory-map it. target_params
+# optionally gives a target its own params.
+# Returns {target: {(lo, hi): model}}.
+def train_direct(features, series, params, targets=TARGET_COLUMNS, max_horizon=MAX_HORIZON, buckets=HORIZON_BUCKETS,
+                 cache=None, max_workers=None, total_threads=None, feature_store=None, target_params=None):
+    from parallel_training import run_cached_parallel, run_parallel
+
+    frame = features.join(series[list(targets)])
+    stored = {}
+
+    def shipped():
+        if 'frame' not in stored:
+            stored['frame'] = frame if feature_store is None else feature_store.put(frame)
+        return stored['frame']
+
+    jobs = {}
+    for target in targets:
+        params_for = (target_params or {}).get(target, params)
+        for lo, hi in horizon_buckets(max_horizon, buckets):
+            if lo >= len(frame):
+                logger.warning(f"Not enough history to train {target} for horizons {lo}-{hi}")
+                continue
+            jobs[(target, lo, hi)] = {
+                'kind': 'catboost', 'frame': frame, 'target': target, 'features': list(features.columns),
+                'params': {**params_for, 'horizons': [lo, hi]}, 'fn': fit_horizon_bucket,
+                'kwargs': lambda target=target, lo=lo, hi=hi, params_for=params_for: {
+                    'frame': shipped(), 'feature_columns': list(features.columns), 'target': target,
+                    'horizons': list(range(lo, hi + 1)), 'params': params_for},
+            }
+    names = {key: f"{key[0]} h{key[1]}-{key[2]}" for key in jobs}
+    named_jobs = {names[key]: job for key, job in jobs.items()}
+    if cache is not None:
+        fitted = run_cached_parallel(cache, named_jobs, max_workers, total_threads)
+    else:
+        fitted = run_parallel({name: (job['fn'], job['kwargs']()) for name, job in named_jobs.items()},
+                              max_workers, total_threads)
+
+    models = {target: {} for target in targets}
+    for (target, lo, hi), name in names.items():
+        models[target][(lo, hi)] = fitted[name]
+    return models
+
+
+# Function to return the largest horizon every target has a model for (0 when a target
+# has none), i.e. how far ahead a full forecast can go
+def covered_horizon(models):
+    return min((max((hi for _, hi in by_bucket), default=0) for by_bucket in models.values()), default=0)
+
+
+# Function to build the rows the direct models predict the days after the last row of
+# features from: the origin row repeated once per horizon, indexed by forecast date
+def direct_rows(features, periods=MAX_HORIZON):
+    horizons = np.arange(1, periods + 1)
+    dates = features.index[-1] + pd.to_timedelta(horizons, unit='D')
+    origin = pd.DataFrame(np.repeat(features.iloc[[-1]].to_numpy(), periods, axis=0), columns=features.columns,
+                          index=dates)
+    return origin.assign(horizon=horizons.astype(np.float32), **calendar_features(dates)).astype(np.float32)
+
+
+# Function to predict rows from direct_rows with one target's bucket models: one predict
+# per bucket over the rows whose horizon it covers. Horizons without a model are NaN.
+def predict_direct(by_bucket, X):
+    horizons = X['horizon'].to_numpy()
+    values = np.full(len(X), np.nan)
+    for (lo, hi), model in by_bucket.items():
+        mask = (horizons >= lo) & (horizons <= hi)
+        if mask.any():
+            values[mask] = model.predict(X[mask])
+    return values
+
+
+# Function to forecast the days after the last row of features with every target's models
+def forecast_direct(models, features, periods=MAX_HORIZON):
+    X = direct_rows(features, periods)
+    forecast = {'Forecast Date': X.index}
+    for target, by_bucket in models.items():
+        forecast[target] = predict_direct(by_bucket, X)
+    return pd.DataFrame(forecast)
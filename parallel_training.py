@@ -0,0 +1,155 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from feature_store import resolve
+from jobs import check_cancelled, report_progress
+from model_cache import make_cache_key
+
+logger = logging.getLogger('ParallelTraining')
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+# Function to split the machine's cores between workers so fits don't oversubscribe
+def thread_budget(n_workers, total_threads=None):
+    total_threads = total_threads or os.cpu_count() or 1
+    return max(1, total_threads // max(1, n_workers))
+
+
+# Pin native thread pools (OpenMP/BLAS/Stan) in each worker to its budget
+def _init_worker(threads):
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'STAN_NUM_THREADS'):
+        os.environ[name] = str(threads)
+
+
+# Workers are spawned (not forked) since Streamlit runs scripts on threads,
+# and kept alive between reruns so the import cost is only paid once
+def get_executor(max_workers, threads):
+    with _executors_lock:
+        key = (max_workers, threads)
+        if key not in _executors:
+            _executors[key] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return _executors[key]
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True)
+        _executors.clear()
+
+
+# Function to run CatBoost cross-validation for one target; with early_stopping_rounds,
+# the folds stop once the mean test loss has not improved for that many iterations
+def cv_catboost_target(X_train, y_train, params, fold_count, threads=1, early_stopping_rounds=None):
+    from catboost import Pool, cv
+    return cv(
+        params={**params, 'thread_count': threads},
+        pool=Pool(data=X_train, label=y_train),
+        fold_count=fold_count,
+        partition_random_seed=42,
+        shuffle=False,
+        stratified=False,
+        early_stopping_rounds=early_stopping_rounds,
+        verbose=False,
+        plot=False
+    )
+
+
+# Function to fit the final CatBoost model for one target
+def fit_catboost_target(X_train, y_train, X_test, y_test, params, threads=1):
+    from catboost import CatBoostRegressor
+    model = CatBoostRegressor(**params, thread_count=threads)
+    model.fit(X_train, y_train, eval_set=(X_test, y_test), use_best_model=True)
+    return model
+
+
+# Function to fit a Prophet model for one series; returned as JSON (with its fitted
+# values) since that is Prophet's supported way of moving a fitted model between processes
+def fit_prophet_target(df_series, params, store_fitted=False, threads=1):
+    from forecasting import fit_prophet_model, prophet_to_json
+    return prophet_to_json(fit_prophet_model(df_series, params, store_fitted=store_fitted))
+
+
+def _decode_prophet(result):
+    from forecasting import prophet_from_json
+    return prophet_from_json(result)
+
+
+RESULT_DECODERS = {
+    fit_prophet_target: _decode_prophet,
+}
+
+
+# Function run in a worker: attach any FrameHandle arguments (memory-mapped from the
+# feature store rather than pickled) and call the task
+def _run_task(fn, kwargs, threads):
+    return fn(**{name: resolve(value) for name, value in kwargs.items()}, threads=threads)
+
+
+# Function to run independent training tasks at the same time in a process pool.
+# tasks maps a name to (fn, kwargs); each fn receives its thread budget as `threads`.
+# Frame arguments may be passed as feature store handles, which workers attach themselves.
+# progress_range is the part of the job's progress bar these tasks fill, for callers that
+# call run_parallel several times in one job.
+def run_parallel(tasks, max_workers=None, total_threads=None, progress_range=(0.0, 1.0)):
+    if not tasks:
+        return {}
+
+    max_workers = min(max_workers or len(tasks), len(tasks), os.cpu_count() or 1)
+    threads = thread_budget(max_workers, total_threads)
+    logger.info(f"Training {len(tasks)} task(s) on {max_workers} worker(s) with {threads} thread(s) each")
+
+    # Inside a background job, progress is reported per finished task and a cancelled job
+    # stops waiting (tasks already running in the pool finish, their results are dropped)
+    results = {}
+    low, high = progress_range
+    if max_workers == 1:
+        for name, (fn, kwargs) in tasks.items():
+            check_cancelled()
+            results[name] = _run_task(fn, kwargs, threads)
+            report_progress(low + (high - low) * len(results) / len(tasks), f"Trained {name}")
+    else:
+        executor = get_executor(max_workers, threads)
+        futures = {executor.submit(_run_task, fn, kwargs, threads): name for name, (fn, kwargs) in tasks.items()}
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                report_progress(low + (high - low) * len(results) / len(tasks), f"Trained {futures[future]}")
+                check_cancelled()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    return {name: RESULT_DECODERS.get(fn, lambda r: r)(results[name]) for name, (fn, _) in tasks.items()}
+
+
+# Function to resolve jobs from the model cache and train only the misses in parallel.
+# jobs maps a name to a dict with kind, frame, target, features, params, fn and kwargs;
+# kwargs may be a function returning them, called only for jobs that are trained.
+def run_cached_parallel(cache, jobs, max_workers=None, total_threads=None):
+    results = {}
+    keys = {}
+    tasks = {}
+    for name, job in jobs.items():
+        key = make_cache_key(job['kind'], job['frame'], job['target'], job['features'], job['params'])
+        cached = cache.get(key, job['kind'])
+        if cached is not None:
+            results[name] = cached
+        else:
+            keys[name] = key
+            tasks[name] = (job['fn'], job['kwargs']() if callable(job['kwargs']) else job['kwargs'])
+
+    for name, result in run_parallel(tasks, max_workers, total_threads).items():
+        cache.put(keys[name], jobs[name]['kind'], result)
+        results[name] = result
+    return results
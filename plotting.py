@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from stage_graph import param_token
+
+logger = logging.getLogger('Plotting')
+
+# Traces with more points than this are drawn with WebGL (Scattergl)
+WEBGL_THRESHOLD = 5000
+# Points kept per trace after LTTB decimation of the full history
+MAX_POINTS = 2000
+# Points kept per trace inside a zoomed range; usually all of them
+ZOOM_MAX_POINTS = 50000
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return np.nan_to_num(values.astype(np.float64))
+
+
+# Function to pick n_out indices with Largest-Triangle-Three-Buckets: the first and last
+# points are kept, and each bucket in between keeps the point forming the largest triangle
+# with the previously kept point and the next bucket's mean, so peaks and dips survive
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), _as_float(y)
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # Next-bucket means from cumulative sums, so each step is O(bucket size)
+    cx, cy = np.concatenate([[0], np.cumsum(x)]), np.concatenate([[0], np.cumsum(y)])
+    avg_end = np.append(edges[2:], n)
+    avg_start = edges[1:]
+    counts = avg_end - avg_start
+    avg_x = (cx[avg_end] - cx[avg_start]) / counts
+    avg_y = (cy[avg_end] - cy[avg_start]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+# Function to cut a series to x_range (if given) and decimate it to at most max_points
+def decimate(x, y, max_points=MAX_POINTS, x_range=None):
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if x_range is not None:
+        lo, hi = x_range
+        inside = ((x >= lo) & (x <= hi)).to_numpy()
+        x, y = x[inside].reset_index(drop=True), y[inside].reset_index(drop=True)
+    index = lttb_indices(x.to_numpy(), y.to_numpy(), max_points)
+    return x.iloc[index], y.iloc[index]
+
+
+# Function to build a line/area trace that stays light in the browser: the full history is
+# LTTB-decimated, a zoomed x_range keeps full resolution, and long traces switch to WebGL
+def scatter(x, y, x_range=None, max_points=None, threshold=WEBGL_THRESHOLD, **trace_kwargs):
+    max_points = max_points or (ZOOM_MAX_POINTS if x_range is not None else MAX_POINTS)
+    x, y = decimate(x, y, max_points, x_range)
+    trace = go.Scattergl if len(x) > threshold else go.Scatter
+    return trace(x=x, y=y, **trace_kwargs)
+
+
+# Function to build a bar trace over the same decimated points
+def bar(x, y, x_range=None, max_points=None, **trace_kwargs):
+    max_points = max_points or (ZOOM_MAX_POINTS if x_range is not None else MAX_POINTS)
+    x, y = decimate(x, y, max_points, x_range)
+    return go.Bar(x=x, y=y, **trace_kwargs)
+
+
+# Function to key a figure on the data it plots and the options it was drawn with
+def figure_key(name, *data, **params):
+    tokens = [param_token(d) for d in data] + [param_token(params)]
+    return hashlib.sha256(json.dumps([name] + tokens).encode()).hexdigest()
+
+
+class FigureCache:
+    # LRU of built figures as plotly JSON, keyed by figure_key(), shared between
+    # sessions so a dataset is only traced and serialized once
+    def __init__(self, max_items=32):
+        self.max_items = max_items
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            figure_json = self._figures.get(key)
+            if figure_json is not None:
+                self._figures.move_to_end(key)
+        if figure_json is None:
+            figure_json = build().to_json()
+            with self._lock:
+                self._figures[key] = figure_json
+                self._figures.move_to_end(key)
+                while len(self._figures) > self.max_items:
+                    self._figures.popitem(last=False)
+        return pio.from_json(figure_json)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
@@ -0,0 +1,410 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from model_cache import SERIALIZERS
+
+logger = logging.getLogger('ForecastServing')
+
+# Same feature columns as Suppy_Demand_Forecasting.py
+FEATURE_COLUMNS = ['Vendor Quality History', 'Vendor Consistency', 'Processing Efficiency (%)']
+# forecast_df columns returned for each model kind, as in the apps
+FORECAST_COLUMNS = {
+    'catboost': ['Forecast Date', 'Supply Forecast', 'Demand Forecast'],
+    'prophet': ['Forecast Date', 'Supply Forecast (USD)', 'Demand Forecast (%)'],
+}
+TARGETS = ['supply', 'demand']
+MANIFEST = 'manifest.json'
+
+# One published forecast: a supply and a demand model plus, for CatBoost, the feature rows
+# (indexed by forecast date) the models predict from. Published CatBoost models are the
+# direct multi-horizon ones, {(lo, hi): model} per target, and their rows carry the horizon.
+ForecastBundle = namedtuple('ForecastBundle', ['series', 'kind', 'version', 'models', 'features'])
+
+
+def _check_kind(kind):
+    if kind not in FORECAST_COLUMNS:
+        raise ValueError(f"Unknown model kind {kind!r}, expected one of {list(FORECAST_COLUMNS)}")
+
+
+# Function to derive a version from the models' training input, so republishing the same data is a no-op
+def data_version(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+class DirectoryModelStore:
+    # Saved bundles on disk, laid out as <root>/<series>/<version>/ with a manifest,
+    # one file per model (written with the model cache serializers) and the feature rows
+    def __init__(self, root):
+        self.root = root
+
+    def save(self, series, kind, version, models, features=None):
+        _check_kind(kind)
+        directory = os.path.join(self.root, series, version)
+        os.makedirs(directory, exist_ok=True)
+        extension, save, _ = SERIALIZERS[kind]
+        buckets = None
+        if isinstance(models[TARGETS[0]], dict):
+            buckets = {target: sorted(models[target]) for target in TARGETS}
+            for target in TARGETS:
+                for lo, hi in buckets[target]:
+                    save(models[target][lo, hi], os.path.join(directory, f"{target}-h{lo}-{hi}{extension}"))
+        else:
+            for target in TARGETS:
+                save(models[target], os.path.join(directory, f"{target}{extension}"))
+        if features is not None:
+            SERIALIZERS['frame'][1](features, os.path.join(directory, f"features{SERIALIZERS['frame'][0]}"))
+        manifest = {'series': series, 'kind': kind, 'version': version, 'created': time.time(),
+                    'has_features': features is not None, 'buckets': buckets}
+        tmp_path = os.path.join(directory, f"{MANIFEST}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST))  # Written last, so partial bundles are never listed
+
+    def _manifests(self):
+        if not os.path.isdir(self.root):
+            return
+        for series in os.listdir(self.root):
+            series_dir = os.path.join(self.root, series)
+            for version in os.listdir(series_dir) if os.path.isdir(series_dir) else []:
+                path = os.path.join(series_dir, version, MANIFEST)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        yield json.load(f)
+
+    # Function to return {series: latest version}
+    def latest(self):
+        latest = {}
+        for manifest in sorted(self._manifests(), key=lambda m: m['created']):
+            latest[manifest['series']] = manifest['version']
+        return latest
+
+    def load(self, series, version):
+        directory = os.path.join(self.root, series, version)
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        extension, _, load = SERIALIZERS[manifest['kind']]
+        if manifest.get('buckets'):
+            models = {target: {(lo, hi): load(os.path.join(directory, f"{target}-h{lo}-{hi}{extension}"))
+                               for lo, hi in manifest['buckets'][target]} for target in TARGETS}
+        else:
+            models = {target: load(os.path.join(directory, f"{target}{extension}")) for target in TARGETS}
+        features = None
+        if manifest['has_features']:
+            features = SERIALIZERS['frame'][2](os.path.join(directory, f"features{SERIALIZERS['frame'][0]}"))
+        return ForecastBundle(series, manifest['kind'], version, models, features)
+
+
+class InMemoryModelStore:
+    # Stand-in store holding bundles in a dict, for tests and local experiments
+    def __init__(self):
+        self.bundles = {}
+        self.versions = {}
+
+    def save(self, series, kind, version, models, features=None):
+        _check_kind(kind)
+        self.bundles[series, version] = ForecastBundle(series, kind, version, dict(models), features)
+        self.versions[series] = version
+
+    def latest(self):
+        return dict(self.versions)
+
+    def load(self, series, version):
+        return self.bundles[series, version]
+
+
+class ModelRegistry:
+    # Loads the latest bundle of every series from a store once, at startup
+    def __init__(self, store):
+        self.store = store
+        self.bundles = {}
+        self.reload()
+
+    def reload(self):
+        start = time.perf_counter()
+        self.bundles = {series: self.store.load(series, version) for series, version in self.store.latest().items()}
+        logger.info(f"Loaded {len(self.bundles)} model bundles in {time.perf_counter() - start:.3f}s")
+
+    def get(self, series):
+        if series not in self.bundles:
+            raise KeyError(f"Unknown series {series!r}")
+        return self.bundles[series]
+
+    def describe(self):
+        return [{'series': b.series, 'kind': b.kind, 'version': b.version,
+                 'max_horizon': None if b.features is None else len(b.features)}
+                for b in self.bundles.values()]
+
+
+# Function to predict several CatBoost requests with one predict call on their stacked rows
+# (one per horizon bucket for direct models)
+def _predict_catboost(model, payloads):
+    from multi_horizon import predict_direct
+
+    X = pd.concat(payloads)
+    predictions = predict_direct(model, X) if isinstance(model, dict) else model.predict(X)
+    bounds = np.cumsum([0] + [len(p) for p in payloads])
+    return [predictions[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# Function to predict several Prophet horizons with one predict call over the longest one
+def _predict_prophet(model, payloads):
+    from forecasting import predict_prophet_horizon
+
+    forecast = predict_prophet_horizon(model, max(payloads), intervals=None)
+    return [forecast['yhat'].to_numpy()[:horizon] for horizon in payloads]
+
+
+BATCH_PREDICTORS = {
+    'catboost': _predict_catboost,
+    'prophet': _predict_prophet,
+}
+
+
+class MicroBatcher:
+    # Collects the prediction requests that arrive within max_delay seconds (or until
+    # max_rows rows are waiting) and serves each model's share with a single predict
+    # call, run off the event loop so requests keep queueing meanwhile
+    def __init__(self, max_delay=0.005, max_rows=50000, executor=None):
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        self.executor = executor
+        self.predict_calls = 0
+        self._pending = []
+        self._rows = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, key, kind, model, payload):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, kind, model, payload, future))
+        self._rows += len(payload) if kind == 'catboost' else payload
+        if self._rows >= self.max_rows:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._rows = self._pending, [], 0
+        groups = defaultdict(list)
+        for key, kind, model, payload, future in pending:
+            groups[key].append((kind, model, payload, future))
+        for group in groups.values():
+            task = asyncio.ensure_future(self._run(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group):
+        kind, model = group[0][0], group[0][1]
+        payloads = [payload for _, _, payload, _ in group]
+        self.predict_calls += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, BATCH_PREDICTORS[kind], model, payloads)
+        except Exception as e:
+            for _, _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, _, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class ResponseCache:
+    # LRU of encoded responses keyed on (series, model version, horizon)
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+class ForecastService:
+    # Answers forecast requests from the registry's models, through the response cache and micro-batcher
+    def __init__(self, registry, batcher=None, cache=None):
+        self.registry = registry
+        self.batcher = MicroBatcher() if batcher is None else batcher
+        self.cache = ResponseCache() if cache is None else cache
+
+    def _forecast_dates(self, bundle, horizon):
+        if bundle.kind == 'catboost':
+            return bundle.features.index[:horizon]
+        model = bundle.models['supply']
+        last = pd.Timestamp(model.history_dates.max())
+        return pd.date_range(last + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+    async def forecast(self, series, horizon):
+        bundle = self.registry.get(series)
+        if horizon < 1:
+            raise ValueError("horizon must be at least 1")
+        if bundle.kind == 'catboost' and horizon > len(bundle.features):
+            raise ValueError(f"horizon {horizon} exceeds the {len(bundle.features)} forecast rows of {series!r}")
+
+        key = (series, bundle.version, horizon)
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+
+        payload = horizon
+        if bundle.kind == 'catboost':
+            rows = bundle.features.iloc[:horizon]
+            payload = rows if isinstance(bundle.models['supply'], dict) else rows[FEATURE_COLUMNS]
+        supply, demand = await asyncio.gather(*[
+            self.batcher.submit((series, bundle.version, target), bundle.kind, bundle.models[target], payload)
+            for target in TARGETS])
+
+        forecast_df = pd.DataFrame(dict(zip(FORECAST_COLUMNS[bundle.kind],
+                                            [self._forecast_dates(bundle, horizon), supply, demand])))
+        body = json.dumps({
+            'series': series,
+            'version': bundle.version,
+            'horizon': horizon,
+            'forecast': json.loads(forecast_df.to_json(orient='records', date_format='iso')),
+        }).encode()
+        self.cache.put(key, body)
+        return body
+
+
+# Function to fit and publish the Suppy_Demand_Forecasting.py direct multi-horizon models
+# for one CSV file's bytes. The published horizon is what the bucket list covers, and the
+# rows are dated from the day after the last observation.
+def publish_catboost(store, series, data, params=None, threads=1, version=None):
+    from forecast_cli import CATBOOST_PARAMS
+    from ingest_cache import CATBOOST_SPEC, parse_upload
+    from lag_features import daily_series, update_features
+    from multi_horizon import covered_horizon, direct_rows, train_direct
+
+    params = CATBOOST_PARAMS if params is None else params
+    data_cleaned = parse_upload(data, CATBOOST_SPEC).set_index('Date')
+    feature_set = update_features(daily_series(data_cleaned))
+    direct = train_direct(feature_set.features, feature_set.series, params, max_workers=1, total_threads=threads)
+    horizon = covered_horizon(direct)
+    if horizon < 1:
+        raise ValueError("Not enough data for forecasting")
+    models = {'supply': direct['Debit EUR'], 'demand': direct['Credit EUR']}
+    version = version or data_version(data)
+    store.save(series, 'catboost', version, models, direct_rows(feature_set.features, horizon))
+    return version
+
+
+# Function to fit and publish the Demo1.py models for one Excel file's bytes
+def publish_prophet(store, series, data, version=None):
+    from forecasting import fit_prophet_models
+    from ingest_cache import PROPHET_SPEC, parse_upload
+
+    df = parse_upload(data, PROPHET_SPEC)
+    df_supply = df[['Date of Extraction Process', 'Cobalt Market Value (USD)']].rename(columns={'Date of Extraction Process': 'ds', 'Cobalt Market Value (USD)': 'y'})
+    df_demand = df[['Date of Extraction Process', 'Recycled Content (%)']].rename(columns={'Date of Extraction Process': 'ds', 'Recycled Content (%)': 'y'})
+    supply_model, demand_model = fit_prophet_models(df_supply, df_demand)
+    version = version or data_version(data)
+    store.save(series, 'prophet', version, {'supply': supply_model, 'demand': demand_model})
+    return version
+
+
+# Function to build the Tornado application serving /forecast, /models and /health
+def make_app(service):
+    import tornado.web
+
+    class ForecastHandler(tornado.web.RequestHandler):
+        async def get(self):
+            series = self.get_argument('series')
+            try:
+                horizon = int(self.get_argument('horizon', '12'))
+                body = await service.forecast(series, horizon)
+            except KeyError as e:
+                raise tornado.web.HTTPError(404, reason=str(e).strip("'\""))
+            except ValueError as e:
+                raise tornado.web.HTTPError(400, reason=str(e))
+            self.set_header('Content-Type', 'application/json')
+            self.write(body)
+
+    class ModelsHandler(tornado.web.RequestHandler):
+        def get(self):
+            self.write({'models': service.registry.describe()})
+
+    class HealthHandler(tornado.web.RequestHandler):
+        def get(self):
+            self.write({'status': 'ok', 'models': len(service.registry.bundles),
+                        'cache_hits': service.cache.hits, 'cache_misses': service.cache.misses,
+                        'predict_calls': service.batcher.predict_calls})
+
+    return tornado.web.Application([
+        (r'/forecast', ForecastHandler),
+        (r'/models', ModelsHandler),
+        (r'/health', HealthHandler),
+    ])
+
+
+async def serve(model_dir, port=8000, max_delay=0.005, cache_size=1024):
+    registry = ModelRegistry(DirectoryModelStore(model_dir))
+    service = ForecastService(registry, MicroBatcher(max_delay=max_delay), ResponseCache(cache_size))
+    make_app(service).listen(port)
+    logger.info(f"Serving {len(registry.bundles)} series on port {port}")
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve or publish supply and demand forecasts.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve the latest model of every series in --model-dir")
+    serve_parser.add_argument('--model-dir', required=True)
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--max-delay-ms', type=float, default=5.0, help="How long to collect requests into one batch")
+    serve_parser.add_argument('--cache-size', type=int, default=1024, help="Number of responses kept")
+
+    publish_parser = subparsers.add_parser('publish', help="Fit models for one input file and save them to --model-dir")
+    publish_parser.add_argument('input', help="Excel extraction log (Prophet) or CSV ledger (CatBoost)")
+    publish_parser.add_argument('--series', required=True)
+    publish_parser.add_argument('--model-dir', required=True)
+    publish_parser.add_argument('--version', default=None, help="Defaults to a hash of the input file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'serve':
+        asyncio.run(serve(args.model_dir, args.port, args.max_delay_ms / 1000, args.cache_size))
+        return 0
+
+    from forecast_cli import pipeline_for
+
+    with open(args.input, 'rb') as f:
+        data = f.read()
+    store = DirectoryModelStore(args.model_dir)
+    if pipeline_for(args.input) == 'prophet':
+        version = publish_prophet(store, args.series, data, args.version)
+    else:
+        version = publish_catboost(store, args.series, data, version=args.version)
+    print(f"Published {args.series} version {version}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from db_writer import ConnectionPool
+from ingest_cache import DEFAULT_INGEST_DIR, _read_arrow
+from instrumentation import span
+
+logger = logging.getLogger('SQLSource')
+
+AGGREGATES = ['SUM', 'AVG', 'MIN', 'MAX', 'COUNT']
+# The apps fetch new rows at most this often (seconds); the refresh button fetches at once
+REFRESH_SECONDS = int(os.environ.get('FORECAST_SOURCE_REFRESH', '300'))
+
+# Tables the apps can pull their history from, with each measure's daily aggregate; the
+# frames come out with the same columns as the Excel/CSV uploads
+PROPHET_SOURCE = {
+    'table': 'ExtractionLog',
+    'date_column': 'Date of Extraction Process',
+    'measures': {'Cobalt Market Value (USD)': 'AVG', 'Recycled Content (%)': 'AVG'},
+    'aggregate': 'day',
+}
+
+CATBOOST_SOURCE = {
+    'table': 'SupplyDemandLedger',
+    'date_column': 'Date',
+    'measures': {
+        'Debit EUR': 'SUM',
+        'Credit EUR': 'SUM',
+        'Vendor Quality History': 'AVG',
+        'Vendor Consistency': 'AVG',
+        'Processing Efficiency (%)': 'AVG',
+    },
+    'aggregate': 'day',
+}
+
+
+# Function to check a source spec, raising ValueError for unknown aggregates
+def check_source(spec):
+    for column, aggregate in spec['measures'].items():
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {aggregate!r} for {column!r}, expected one of {AGGREGATES}")
+    if spec.get('aggregate') not in (None, 'day'):
+        raise ValueError(f"Unknown aggregate grain {spec['aggregate']!r}, expected one of [None, 'day']")
+
+
+# Function to add a frame's row hashes to a digest; the result does not depend on how
+# the rows were split into batches
+def _update_digest(digest, frame):
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+
+
+class SQLSource:
+    # Mirrors a table's history into a local Arrow file. Dates are filtered and (with
+    # aggregate='day') grouped on the server, so only the result rows cross the network.
+    # The high-water mark is the latest date mirrored; a refresh fetches that whole day
+    # again (its totals may still be growing) and everything after it, replacing those
+    # rows. Result rows are streamed in chunk_size batches straight into the new Arrow file.
+    # The mirror's version only changes when a refresh fetched rows that differ from the
+    # ones they replace, so downstream stages keyed on it don't rerun for an idle refresh.
+    def __init__(self, backend, spec, cache_dir=DEFAULT_INGEST_DIR, pool_size=2, chunk_size=10000):
+        check_source(spec)
+        self.backend = backend
+        self.spec = spec
+        self.chunk_size = chunk_size
+        self.pool = ConnectionPool(backend.connect, max_size=pool_size)
+        self._lock = threading.Lock()
+        identity = json.dumps([type(backend).__name__, getattr(backend, 'path', None),
+                               getattr(backend, 'connection_string', None), spec], sort_keys=True)
+        source_id = hashlib.sha256(identity.encode()).hexdigest()[:32]
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"source-{source_id}.arrow")
+        self.state_path = os.path.join(cache_dir, f"source-{source_id}.json")
+
+    @property
+    def state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def columns(self):
+        return [self.spec['date_column']] + list(self.spec['measures'])
+
+    @property
+    def schema(self):
+        return pa.schema([pa.field(self.spec['date_column'], pa.timestamp('ns'))]
+                         + [pa.field(c, pa.float64()) for c in self.spec['measures']])
+
+    # Function to build the SELECT for rows on or after the watermark (all rows when None)
+    def query(self, watermark=None):
+        q = self.backend.quote
+        date = q(self.spec['date_column'])
+        if self.spec.get('aggregate') == 'day':
+            day = self.backend.day_sql(date)
+            select = [f"{day} AS {date}"] + [f"{aggregate}({q(c)}) AS {q(c)}" for c, aggregate in self.spec['measures'].items()]
+            group = f" GROUP BY {day}"
+            order = day
+        else:
+            select = [date] + [q(c) for c in self.spec['measures']]
+            group = ''
+            order = date
+        where, params = '', []
+        if watermark is not None:
+            where = f" WHERE {date} >= ?"
+            watermark = pd.Timestamp(watermark)
+            params = [watermark.strftime('%Y-%m-%d') if self.backend.dates_as_text else watermark.date()]
+        return f"SELECT {', '.join(select)} FROM {q(self.spec['table'])}{where}{group} ORDER BY {order}", params
+
+    def _frame(self, rows):
+        frame = pd.DataFrame.from_records(rows, columns=self.columns)
+        frame[self.spec['date_column']] = pd.to_datetime(frame[self.spec['date_column']]).astype('datetime64[ns]')
+        frame[list(self.spec['measures'])] = frame[list(self.spec['measures'])].astype('float64')
+        return frame
+
+    # Function to fetch rows since the high-water mark into the local mirror. With max_age,
+    # a mirror refreshed less than max_age seconds ago is left as it is. full=True
+    # drops the mirror and fetches the whole history again.
+    def refresh(self, max_age=None, full=False):
+        with self._lock:
+            state = None if full else self.state
+            if state is not None and not os.path.exists(self.path):
+                state = None
+            if state is not None and max_age is not None and time.time() - state['refreshed'] < max_age:
+                return {**state, 'skipped': True}
+
+            start = time.perf_counter()
+            watermark = None if state is None else pd.Timestamp(state['watermark'])
+            sql, params = self.query(watermark)
+            date_column = self.spec['date_column']
+            stats = {'fetched_rows': 0, 'fetched_bytes': 0, 'kept_rows': 0}
+            replaced, fetched = hashlib.sha256(), hashlib.sha256()
+            tmp_path = f"{self.path}.tmp"
+            with span('db_read') as record, self.pool.connection() as conn:
+                cursor = self.backend.cursor(conn)
+                try:
+                    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, self.schema) as writer:
+                        if watermark is not None:
+                            # The server sends the whole watermark day again, so rows before that day are
+                            # kept, read back from the memory-mapped mirror; the rest are replaced
+                            with pa.memory_map(self.path, 'r') as source:
+                                reader = pa.ipc.open_file(source)
+                                cutoff = pa.scalar(watermark.normalize().to_pydatetime(), type=pa.timestamp('ns'))
+                                for i in range(reader.num_record_batches):
+                                    batch = reader.get_batch(i)
+                                    keep = pc.less(batch.column(date_column), cutoff)
+                                    _update_digest(replaced, batch.filter(pc.invert(keep)).to_pandas())
+                                    batch = batch.filter(keep)
+                                    if batch.num_rows:
+                                        writer.write_batch(batch)
+                                        stats['kept_rows'] += batch.num_rows
+                        cursor.execute(sql, params)
+                        latest = watermark
+                        while True:
+                            rows = cursor.fetchmany(self.chunk_size)
+                            if not rows:
+                                break
+                            frame = self._frame(rows)
+                            _update_digest(fetched, frame)
+                            batch = pa.RecordBatch.from_pandas(frame, schema=self.schema, preserve_index=False)
+                            writer.write_batch(batch)
+                            stats['fetched_rows'] += batch.num_rows
+                            stats['fetched_bytes'] += batch.nbytes
+                            latest = pd.Timestamp(pc.max(batch.column(date_column)).as_py())
+                finally:
+                    cursor.close()
+                record['rows'] = stats['fetched_rows']
+            os.replace(tmp_path, self.path)
+
+            # Chained from the previous version and the fetched rows; unchanged when the fetched
+            # rows are exactly the ones they replaced
+            version = None if state is None else state['version']
+            if version is None or fetched.digest() != replaced.digest():
+                version = hashlib.sha256(f"{version}{fetched.hexdigest()}".encode()).hexdigest()[:16]
+            state = {
+                'watermark': None if latest is None else latest.isoformat(),
+                'rows': stats['kept_rows'] + stats['fetched_rows'],
+                'refreshed': time.time(),
+                'version': version,
+            }
+            with open(self.state_path, 'w') as f:
+                json.dump(state, f)
+            stats = {**state, **stats, 'seconds': time.perf_counter() - start, 'skipped': False}
+            logger.info(f"Fetched {stats['fetched_rows']} rows ({stats['fetched_bytes'] / 1e3:.1f} kB) since "
+                        f"{watermark}; mirror has {state['rows']} rows, watermark {state['watermark']}")
+            return stats
+
+    # Function to return the mirrored history as a frame, memory-mapped from the Arrow file
+    def load(self):
+        if not os.path.exists(self.path):
+            self.refresh()
+        return _read_arrow(self.path)
+
+    def close(self):
+        self.pool.close()
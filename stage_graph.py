@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import row_count, span
+from model_cache import frame_fingerprint
+
+logger = logging.getLogger('StageGraph')
+
+
+# Function to reduce a stage parameter to a string that changes whenever the value does
+def param_token(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(value).hexdigest()
+    if isinstance(value, pd.DataFrame):
+        return frame_fingerprint(value)
+    if isinstance(value, pd.Series):
+        return frame_fingerprint(value.to_frame())
+    if isinstance(value, np.ndarray):
+        return hashlib.sha256(f"{value.dtype}{value.shape}".encode() + np.ascontiguousarray(value).tobytes()).hexdigest()
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class FinishedStage:
+    # Stand-in for a finished job, returned by StageGraph.submit when the stage is already stored
+    status = 'done'
+    progress = 1.0
+    message = ''
+    error = None
+    finished = True
+
+    def __init__(self, key, name, result, seconds):
+        self.key = key
+        self.name = name
+        self.result = result
+        self.seconds = seconds
+
+
+class StageGraph:
+    # Memoizes pipeline stages in a per-session store (st.session_state in the apps).
+    # Each stage names the stages it reads and the parameters (widget values) it
+    # depends on; its key combines those parameters with its inputs' keys, so a
+    # changed widget re-runs that stage and the stages downstream of it only.
+    def __init__(self, store, namespace='pipeline_stages'):
+        if namespace not in store:
+            store[namespace] = {}
+        self.entries = store[namespace]
+        self.timings = []
+
+    def key(self, name, inputs=(), **params):
+        tokens = {k: param_token(v) for k, v in sorted(params.items())}
+        upstream = [self.entries[i]['key'] for i in inputs]
+        return hashlib.sha256(json.dumps([name, tokens, upstream]).encode()).hexdigest()
+
+    # Function to return the stage's value, calling fn(*input_values, **params) only
+    # when the stage has not run with these parameters and inputs in this session
+    def run(self, name, fn, inputs=(), **params):
+        missing = [i for i in inputs if i not in self.entries]
+        if missing:
+            raise KeyError(f"Stage {name!r} reads {missing}, which have not run yet")
+        key = self.key(name, inputs, **params)
+        entry = self.entries.get(name)
+        if entry is not None and entry['key'] == key:
+            self.timings.append({'stage': name, 'status': 'cached', 'seconds': 0.0, 'last_run_seconds': entry['seconds']})
+            return entry['value']
+
+        start = time.perf_counter()
+        with span(name) as record:
+            value = fn(*[self.entries[i]['value'] for i in inputs], **params)
+            record['rows'] = row_count(value)
+        seconds = time.perf_counter() - start
+        self.entries[name] = {'key': key, 'value': value, 'seconds': seconds}
+        self.timings.append({'stage': name, 'status': 'ran', 'seconds': seconds, 'last_run_seconds': seconds})
+        logger.info(f"Stage {name} ran in {seconds:.3f}s")
+        return value
+
+    # Function to run a stage as a background job on a shared JobScheduler instead of in
+    # the script thread. The job key is the stage key, so sessions asking for the same
+    # stage on the same data and parameters share one job. Returns the job; once it is
+    # done its value is stored like run()'s and later runs read it from the session.
+    def submit(self, name, scheduler, fn, inputs=(), cpu_heavy=False, owner=None, **params):
+        missing = [i for i in inputs if i not in self.entries]
+        if missing:
+            raise KeyError(f"Stage {name!r} reads {missing}, which have not run yet")
+        key = self.key(name, inputs, **params)
+        entry = self.entries.get(name)
+        if entry is not None and entry['key'] == key:
+            self.timings.append({'stage': name, 'status': 'cached', 'seconds': 0.0, 'last_run_seconds': entry['seconds']})
+            return FinishedStage(key, name, entry['value'], entry['seconds'])
+
+        def run_stage(*values, **params):
+            with span(name) as record:
+                value = fn(*values, **params)
+                record['rows'] = row_count(value)
+            return value
+
+        job = scheduler.submit(key, run_stage, *[self.entries[i]['value'] for i in inputs], name=name,
+                               cpu_heavy=cpu_heavy, owner=owner, **params)
+        if job.status == 'done':
+            self.entries[name] = {'key': key, 'value': job.result, 'seconds': job.seconds}
+            self.timings.append({'stage': name, 'status': 'ran', 'seconds': job.seconds, 'last_run_seconds': job.seconds})
+        return job
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(name, None)
+
+    # Function to list this script run's stages in order, for the sidebar
+    def timings_frame(self):
+        return pd.DataFrame(self.timings, columns=['stage', 'status', 'seconds', 'last_run_seconds'])
@@ -0,0 +1,68 @@
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger('Startup')
+
+# Libraries each app loads lazily, in the order the pre-warm hook imports them
+APP_MODULES = {
+    'prophet': ['plotly.graph_objects', 'prophet'],
+    'catboost': ['plotly.graph_objects', 'catboost'],
+}
+
+
+# Function to tell whether the pre-warm hook is switched on (FORECAST_PREWARM=1)
+def prewarm_enabled():
+    return os.environ.get('FORECAST_PREWARM', '0').lower() in ('1', 'true', 'yes')
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+# Function to import modules, returning the seconds each one took
+def import_modules(modules):
+    timings = {}
+    for module in modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        timings[module] = time.perf_counter() - start
+    return timings
+
+
+# Function to build and serialize an empty figure, which loads plotly's trace validators
+def _warm_plotly():
+    import plotly.graph_objects as go
+    go.Figure([go.Scatter(x=[0], y=[0]), go.Bar(x=[0], y=[0])]).to_json()
+
+
+# Function to do the work a cold worker would otherwise do on the first request: import
+# the app's libraries, load plotly's validators and read recent models into the cache
+def prewarm(modules, model_cache=None):
+    from jobs import check_cancelled, report_progress
+
+    start = time.perf_counter()
+    timings = {}
+    for i, module in enumerate(modules):
+        check_cancelled()
+        report_progress(i / (len(modules) + 2), f"Importing {module}")
+        timings.update(import_modules([module]))
+    report_progress(len(modules) / (len(modules) + 2), "Loading plot validators")
+    timings['plotly_validators'] = _timed(_warm_plotly)
+    if model_cache is not None:
+        report_progress((len(modules) + 1) / (len(modules) + 2), "Loading cached models")
+        timings['model_cache'] = _timed(model_cache.warm)
+    logger.info(f"Pre-warmed in {time.perf_counter() - start:.2f}s: "
+                + ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
+
+
+# Function to run prewarm() once per server in the background on the shared scheduler,
+# after the first page has rendered; returns the job, or None when pre-warming is off
+def schedule_prewarm(scheduler, app, model_cache=None, enabled=None):
+    if not (prewarm_enabled() if enabled is None else enabled):
+        return None
+    return scheduler.submit(f"prewarm-{app}", prewarm, APP_MODULES[app], model_cache, name=f"Pre-warming {app}")
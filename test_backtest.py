@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import make_cutoffs, run_backtest, summarize_backtest
+from feature_store import FeatureStore
+from parallel_training import shutdown_executors
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency']
+PARAMS = {'iterations': 20, 'depth': 2, 'random_seed': 0, 'verbose': 0, 'update_iterations': 5}
+
+
+# Function to create one daily series per material
+def create_long_data(days=120):
+    rng = np.random.default_rng(0)
+    frames = []
+    for material in ('Cobalt', 'Nickel'):
+        quality = rng.uniform(0.5, 1.0, days)
+        frames.append(pd.DataFrame({
+            'Material': material,
+            'Date': pd.date_range('2024-01-01', periods=days, freq='D'),
+            'Vendor Quality History': quality,
+            'Vendor Consistency': rng.uniform(0.5, 1.0, days),
+            'Debit EUR': 100 * quality + np.arange(days) / 10 + rng.normal(0, 1, days),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# Test case for checking expanding and sliding windows leave a full horizon after each cutoff
+def test_make_cutoffs():
+    dates = pd.date_range('2024-01-01', periods=100, freq='D')
+    expanding = make_cutoffs(dates, initial=50, horizon=10, period=20)
+    sliding = make_cutoffs(dates, initial=50, horizon=10, period=20, window='sliding')
+
+    assert [cutoff for _, cutoff in expanding] == list(pd.to_datetime(['2024-02-20', '2024-03-11']))
+    assert {start for start, _ in expanding} == {dates[0]}
+    assert all(cutoff - start == pd.Timedelta(days=50) for start, cutoff in sliding)
+    with pytest.raises(ValueError):
+        make_cutoffs(dates, 50, 10, 20, window='fixed')
+    assert make_cutoffs(dates, np.int64(50), np.int64(10), np.int64(20)) == expanding
+
+
+# Test case for checking per-cutoff metrics, warm starts between neighbours and the JSONL stream
+def test_run_backtest_catboost(tmp_path):
+    output = tmp_path / 'backtest.jsonl'
+    progress = []
+    results = run_backtest(create_long_data(), 'Date', 'Debit EUR', horizon=10, initial=60, period=10,
+                           group_keys=['Material'], engine='catboost', feature_columns=FEATURES, params=PARAMS,
+                           max_workers=1, cutoffs_per_task=3, output=str(output), progress=progress.append)
+
+    assert results.groupby('Material').size().to_dict() == {'Cobalt': 5, 'Nickel': 5}
+    assert results['warm_start'].tolist()[:5] == [False, True, True, False, True]
+    assert (results['test_rows'] == 10).all()
+    assert results['rmse'].notna().all()
+    assert progress == list(range(1, 11))
+    assert len(output.read_text().splitlines()) == 10
+    assert json.loads(output.read_text().splitlines()[0])['Material'] == 'Cobalt'
+
+    summary = summarize_backtest(results, ['Material'])
+    assert summary['cutoffs'].to_dict() == {'Cobalt': 5, 'Nickel': 5}
+
+
+# Test case for checking each series can be backtested with its own params
+def test_run_backtest_group_params():
+    data = create_long_data()
+    kwargs = {'group_keys': ['Material'], 'engine': 'catboost', 'feature_columns': FEATURES, 'max_workers': 1}
+    base = run_backtest(data, 'Date', 'Debit EUR', 10, 60, 20, params=PARAMS, **kwargs)
+    tuned = run_backtest(data, 'Date', 'Debit EUR', 10, 60, 20, params=PARAMS,
+                         group_params={'Nickel': {**PARAMS, 'depth': 4, 'learning_rate': 0.5}}, **kwargs)
+
+    cobalt, nickel = (base['Material'] == 'Cobalt'), (base['Material'] == 'Nickel')
+    np.testing.assert_allclose(tuned.loc[cobalt, 'rmse'], base.loc[cobalt, 'rmse'])
+    assert not np.allclose(tuned.loc[nickel, 'rmse'], base.loc[nickel, 'rmse'])
+
+
+# Test case for checking that the process pool, with or without the feature store, gives
+# the same metrics as inline runs
+def test_run_backtest_parallel_matches_inline(tmp_path):
+    data = create_long_data()
+    args = ('Date', 'Debit EUR', 14, 60, 14)
+    kwargs = {'group_keys': ['Material'], 'engine': 'numpy', 'window': 'sliding', 'cutoffs_per_task': 2}
+    inline = run_backtest(data, *args, max_workers=1, **kwargs)
+    try:
+        parallel = run_backtest(data, *args, max_workers=2, **kwargs)
+        stored = run_backtest(data, *args, max_workers=2, feature_store=FeatureStore(str(tmp_path)), **kwargs)
+    finally:
+        shutdown_executors()
+    columns = ['Material', 'cutoff', 'train_rows', 'mae', 'rmse']
+    pd.testing.assert_frame_equal(inline[columns], parallel[columns])
+    pd.testing.assert_frame_equal(inline[columns], stored[columns])
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from batch_forecast import batch_forecast
+from parallel_training import shutdown_executors
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency']
+PARAMS = {'iterations': 20, 'depth': 2, 'random_seed': 0}
+
+
+# Function to create a long-format frame with one series per vendor/material
+def create_long_data():
+    rng = np.random.default_rng(0)
+    frames = []
+    for vendor, material, rows in [('V1', 'Cobalt', 30), ('V1', 'Nickel', 30), ('V2', 'Cobalt', 30), ('V3', 'Cobalt', 1)]:
+        frames.append(pd.DataFrame({
+            'Vendor': vendor,
+            'Material': material,
+            'Date': pd.date_range('2024-01-01', periods=rows, freq='D'),
+            'Vendor Quality History': rng.uniform(0.5, 1.0, rows),
+            'Vendor Consistency': rng.uniform(0.5, 1.0, rows),
+            'Debit EUR': rng.normal(100, 10, rows),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# Test case for checking per-series forecasts, failure isolation and progress
+def test_batch_forecast_catboost():
+    progress = []
+    forecasts, failures = batch_forecast(
+        create_long_data(), ['Vendor', 'Material'], 'Date', 'Debit EUR', horizon=4, engine='catboost',
+        feature_columns=FEATURES, params=PARAMS, max_workers=1, chunk_size=2, min_points=5,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+
+    assert list(forecasts.columns[:3]) == ['Vendor', 'Material', 'ds']
+    assert forecasts.groupby(['Vendor', 'Material']).size().to_dict() == {
+        ('V1', 'Cobalt'): 4, ('V1', 'Nickel'): 4, ('V2', 'Cobalt'): 4,
+    }
+    assert failures[['Vendor', 'Material']].values.tolist() == [['V3', 'Cobalt']]
+    assert progress == [(2, 4), (4, 4)]
+
+
+# Test case for checking that the process pool gives the same result as inline runs
+def test_batch_forecast_parallel_matches_inline():
+    data = create_long_data()
+    args = (['Vendor'], 'Date', 'Debit EUR', 3)
+    kwargs = {'engine': 'catboost', 'feature_columns': FEATURES, 'params': PARAMS, 'chunk_size': 1, 'min_points': 5}
+    inline, _ = batch_forecast(data, *args, max_workers=1, **kwargs)
+    try:
+        parallel, _ = batch_forecast(data, *args, max_workers=2, **kwargs)
+    finally:
+        shutdown_executors()
+    pd.testing.assert_frame_equal(inline, parallel)
+
+
+# Test case for checking the Prophet engine returns history plus horizon
+def test_batch_forecast_prophet():
+    data = create_long_data()
+    data = data[data['Vendor'] == 'V2']
+    forecasts, failures = batch_forecast(data, ['Vendor'], 'Date', 'Debit EUR', horizon=5, max_workers=1)
+
+    assert len(failures) == 0
+    assert len(forecasts) == 35
+    assert forecasts['ds'].max() == pd.Timestamp('2024-02-04')
+
+
+# Test case for checking the numpy engine fits each chunk in one batched solve,
+# with the same forecasts as fitting every series on its own
+def test_batch_forecast_numpy_one_solve_per_chunk(monkeypatch):
+    import fast_prophet
+    from forecasting import fit_prophet_model, predict_prophet_model
+
+    calls = []
+    fit_many = fast_prophet.fit_many
+
+    def counting_fit_many(models, frames, **kwargs):
+        calls.append(len(models))
+        return fit_many(models, frames, **kwargs)
+
+    monkeypatch.setattr(fast_prophet, 'fit_many', counting_fit_many)
+    data = create_long_data()
+    forecasts, failures = batch_forecast(data, ['Vendor', 'Material'], 'Date', 'Debit EUR', horizon=5, engine='numpy',
+                                         max_workers=1, chunk_size=2, min_points=5)
+
+    assert calls == [2, 1]
+    assert failures[['Vendor', 'Material']].values.tolist() == [['V3', 'Cobalt']]
+    series = data[(data['Vendor'] == 'V1') & (data['Material'] == 'Nickel')][['Date', 'Debit EUR']]
+    single = predict_prophet_model(fit_prophet_model(series.rename(columns={'Date': 'ds', 'Debit EUR': 'y'}), engine='numpy'),
+                                   5, mode='fast')
+    batched = forecasts[(forecasts['Vendor'] == 'V1') & (forecasts['Material'] == 'Nickel')]
+    np.testing.assert_allclose(batched['yhat'].to_numpy(), single['yhat'].to_numpy(), rtol=1e-6)
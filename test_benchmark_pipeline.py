@@ -0,0 +1,59 @@
+import json
+
+import pandas as pd
+
+from benchmark_pipeline import (app_imports, compare_to_baseline, generate_extraction_log, generate_ledger, main,
+                                measure_imports, run_benchmarks)
+
+
+# Test case for checking the synthetic data matches the sample dataset's shape
+def test_generate_extraction_log_matches_sample():
+    sample = pd.read_excel('ascend_elements_sample_dataset.xlsx', sheet_name='Sheet1')
+    generated = generate_extraction_log(500)
+
+    assert list(generated.columns) == list(sample.columns)
+    assert len(generated) == 500
+    assert pd.to_datetime(generated['Date of Extraction Process']).is_monotonic_increasing
+
+
+# Test case for checking the ledger parses with the CatBoost app's date format
+def test_generate_ledger():
+    ledger = generate_ledger(200)
+    assert pd.to_datetime(ledger['Date'], format='%d-%m-%Y').notna().all()
+
+
+# Test case for checking a small run records every requested stage
+def test_run_benchmarks_records_stages():
+    stages = ['csv_parse', 'datetime_conversion', 'catboost_fit', 'metrics', 'to_csv', 'db_insert']
+    report = run_benchmarks(sizes=[300], stages=stages, iterations=5)
+
+    assert [r['stage'] for r in report['results']] == stages
+    assert all(r['seconds'] >= 0 for r in report['results'])
+    assert report['meta']['catboost_iterations'] == 5
+
+
+# Test case for checking regressions are flagged against a stored baseline
+def test_compare_to_baseline(tmp_path):
+    baseline = {'results': [{'rows': 1000, 'stage': 'catboost_fit', 'seconds': 1.0},
+                            {'rows': 1000, 'stage': 'to_csv', 'seconds': 0.001}]}
+    current = {'results': [{'rows': 1000, 'stage': 'catboost_fit', 'seconds': 1.5},
+                           {'rows': 1000, 'stage': 'to_csv', 'seconds': 0.002}]}
+    regressions = compare_to_baseline(current, baseline, tolerance=0.2)
+
+    assert [r['stage'] for r in regressions] == ['catboost_fit']
+
+    baseline_path = tmp_path / 'baseline.json'
+    baseline_path.write_text(json.dumps({'results': [{'rows': 300, 'stage': 'csv_parse', 'seconds': 0.0}]}))
+    exit_code = main(['--sizes', '300', '--stages', 'csv_parse', '--output', str(tmp_path / 'out.json'),
+                      '--baseline', str(baseline_path)])
+    assert exit_code == 0
+
+
+# Test case for checking the apps no longer import the model libraries on startup
+def test_measure_imports():
+    assert 'forecasting' in app_imports('Demo1.py')
+    assert not {'prophet', 'catboost', 'sklearn'} & set(app_imports('Demo1.py') + app_imports('Suppy_Demand_Forecasting.py'))
+
+    results = measure_imports(modules=['json', 'no_such_module'], apps=[])
+    assert [r['stage'] for r in results] == ['import:json']
+    assert results[0]['rows'] == 0 and results[0]['seconds'] >= 0
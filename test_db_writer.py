@@ -0,0 +1,76 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from db_writer import ConnectionPool, ForecastWriter, SQLiteBackend
+
+
+# Function to create a forecast frame shaped like the one built in Demo1.py
+def create_forecast(start='2024-12-01', periods=10, supply=80000.0):
+    return pd.DataFrame({
+        'Forecast Date': pd.date_range(start, periods=periods, freq='D'),
+        'Supply Forecast (USD)': [supply + i for i in range(periods)],
+        'Demand Forecast (%)': [90.0 + i / 10 for i in range(periods)],
+    })
+
+
+def read_table(path):
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql('SELECT * FROM ForecastResults ORDER BY ForecastDate', conn)
+
+
+# Test case for checking batched inserts across several chunks
+def test_write_in_chunks(tmp_path):
+    path = str(tmp_path / 'forecast.db')
+    writer = ForecastWriter(SQLiteBackend(path), chunk_size=3)
+    stats = writer.write(create_forecast())
+    writer.close()
+
+    table = read_table(path)
+    assert stats['rows'] == 10
+    assert stats['rows_per_second'] > 0
+    assert len(table) == 10
+    assert table['ForecastDate'].iloc[0] == '2024-12-01'
+    assert table['SupplyForecast'].iloc[-1] == pytest.approx(80009.0)
+
+
+# Test case for checking that repeated writes upsert instead of duplicating rows
+def test_repeated_write_upserts(tmp_path):
+    path = str(tmp_path / 'forecast.db')
+    writer = ForecastWriter(SQLiteBackend(path), chunk_size=4)
+    writer.write(create_forecast())
+    writer.write(create_forecast())
+    writer.write(create_forecast(start='2024-12-06', periods=10, supply=1.0))
+    writer.close()
+
+    table = read_table(path)
+    assert len(table) == 15
+    assert table['SupplyForecast'].iloc[4] == pytest.approx(80004.0)
+    assert table['SupplyForecast'].iloc[5] == pytest.approx(1.0)
+
+
+# Test case for checking that the pool reuses connections
+def test_connection_pool_reuses_connections():
+    created = []
+
+    def connect():
+        conn = sqlite3.connect(':memory:')
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError('broken connection')
+    with pool.connection():
+        pass
+    assert len(created) == 2
+    pool.close()
@@ -0,0 +1,81 @@
+import gzip
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from export import EXPORT_FORMATS, ExportCache, export_file_name, write_export
+
+
+# Function to create a forecast frame shaped like the ones the apps offer for download
+def create_forecast(periods=250):
+    return pd.DataFrame({
+        'Forecast Date': pd.date_range('2024-12-01', periods=periods, freq='D'),
+        'Supply Forecast': [1000.5 + i for i in range(periods)],
+        'Demand Forecast': [90.0 + i / 10 for i in range(periods)],
+    })
+
+
+# Function to read an export back into a frame
+def read_export(path, export_format):
+    if export_format == 'parquet':
+        return pd.read_parquet(path)
+    if export_format == 'arrow':
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_pandas()
+    with pa.input_stream(path, compression='detect') as stream:
+        return pd.read_csv(io.BytesIO(stream.read()), parse_dates=['Forecast Date'])
+
+
+# Test case for checking every format round-trips when written in several chunks
+@pytest.mark.parametrize('export_format', list(EXPORT_FORMATS))
+def test_write_export_round_trip(tmp_path, export_format):
+    forecast = create_forecast()
+    path = str(tmp_path / export_file_name('forecast', export_format))
+    write_export(forecast, path, export_format, chunk_rows=64)
+
+    pd.testing.assert_frame_equal(read_export(path, export_format), forecast, check_dtype=False)
+
+
+# Test case for checking chunked CSV output is byte-for-byte what to_csv produced
+def test_csv_matches_to_csv(tmp_path):
+    forecast = create_forecast()
+    write_export(forecast, str(tmp_path / 'plain.csv'), 'csv', chunk_rows=7)
+    write_export(forecast, str(tmp_path / 'packed.csv.gz'), 'csv.gz', chunk_rows=7)
+
+    expected = forecast.to_csv(index=False).encode()
+    assert (tmp_path / 'plain.csv').read_bytes() == expected
+    assert gzip.decompress((tmp_path / 'packed.csv.gz').read_bytes()) == expected
+    assert os.path.getsize(tmp_path / 'packed.csv.gz') < len(expected)
+
+
+# Test case for checking a forecast version is encoded once per format
+def test_export_cache_reuses_encoded_file(tmp_path):
+    cache = ExportCache(str(tmp_path / 'exports'))
+    forecast = create_forecast()
+    assert not cache.contains(forecast, 'parquet')
+
+    path = cache.get_or_write(forecast, 'parquet')
+    assert cache.get_or_write(forecast, 'parquet') == path
+    assert cache.contains(forecast, 'parquet')
+    assert cache.get_or_write(forecast.assign(**{'Supply Forecast': 0.0}), 'parquet') != path
+    assert cache.get_or_write(forecast, 'csv.zst') != path
+
+
+# Test case for checking only the newest max_files exports are kept
+def test_export_cache_eviction(tmp_path):
+    cache = ExportCache(str(tmp_path / 'exports'), max_files=2)
+    for periods in (10, 20, 30):
+        path = cache.get_or_write(create_forecast(periods), 'csv')
+        os.utime(path, (periods, periods))
+
+    assert len(os.listdir(tmp_path / 'exports')) == 2
+    assert not cache.contains(create_forecast(10), 'csv')
+
+
+# Test case for checking unknown formats are rejected
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match='Unknown export format'):
+        write_export(create_forecast(), str(tmp_path / 'forecast.xlsx'), 'xlsx')
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fast_prophet import LinearProphet, fit_many
+from forecasting import PROPHET_PARAMS, calculate_metrics, fit_prophet_models, make_predictions
+
+
+# Function to create a daily series with a linear trend and multiplicative yearly/weekly seasonality
+def create_series(days=730, seed=0, slope=0.2):
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    season = 1 + 0.1 * np.sin(2 * np.pi * t / 365.25) + 0.05 * np.sin(2 * np.pi * t / 7)
+    y = 70000 * (1 + slope * t / days) * season * (1 + rng.normal(0, 0.01, days))
+    return pd.DataFrame({'ds': pd.date_range('2022-01-01', periods=days, freq='D'), 'y': y})
+
+
+# Test case for checking the fit extrapolates a known trend and seasonality
+def test_linear_prophet_forecasts_holdout():
+    series = create_series(790)
+    model = LinearProphet(**PROPHET_PARAMS).fit(series.iloc[:730])
+    forecast = model.predict(series.iloc[730:][['ds']])
+
+    mape = np.mean(np.abs(forecast['yhat'].to_numpy() - series['y'].iloc[730:].to_numpy()) / series['y'].iloc[730:])
+    assert mape < 0.03
+    assert (forecast['yhat_lower'] < forecast['yhat']).all() and (forecast['yhat'] < forecast['yhat_upper']).all()
+
+
+# Test case for checking a batched solve matches fitting each series on its own
+def test_fit_many_matches_single_fits():
+    frames = [create_series(400, seed=1), create_series(200, seed=2, slope=-0.1).iloc[::2]]
+    batched = fit_many([LinearProphet(**PROPHET_PARAMS) for _ in frames], frames)
+
+    for model, frame in zip(batched, frames):
+        single = LinearProphet(**PROPHET_PARAMS).fit(frame)
+        np.testing.assert_allclose(model.predict()['yhat'], single.predict()['yhat'], rtol=1e-6)
+
+
+# Test case for checking the future frame follows Prophet's make_future_dataframe
+def test_make_future_dataframe():
+    series = create_series(100)
+    model = LinearProphet(**PROPHET_PARAMS).fit(series)
+
+    future = model.make_future_dataframe(periods=10)
+    assert len(future) == 110
+    assert future['ds'].iloc[-1] == series['ds'].iloc[-1] + pd.Timedelta(days=10)
+    assert len(model.make_future_dataframe(periods=10, include_history=False)) == 10
+
+
+# Test case for checking the numpy engine is a drop-in for fit_prophet_models
+def test_fit_prophet_models_numpy_engine():
+    series = create_series(120)
+    df_supply, df_demand = series, series.assign(y=series['y'] / 1000)
+    supply_model, demand_model = fit_prophet_models(df_supply, df_demand, engine='numpy')
+    supply_forecast, demand_forecast = make_predictions(supply_model, demand_model, 30)
+
+    assert len(supply_forecast) == len(demand_forecast) == 150
+    merged_supply = pd.merge(df_supply, supply_forecast, on='ds')
+    merged_demand = pd.merge(df_demand, demand_forecast, on='ds')
+    supply_mae, supply_rmse, supply_r2, demand_mae, demand_rmse, demand_r2 = calculate_metrics(merged_supply, merged_demand)
+    assert supply_r2 > 0.5 and demand_r2 > 0.5
+
+    with pytest.raises(ValueError):
+        fit_prophet_models(df_supply, df_demand, engine='stan')
@@ -0,0 +1,83 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore, attach
+from parallel_training import run_parallel
+
+
+# Function to create a frame with the dtypes the apps store
+def create_frame(rows=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Vendor Quality History': rng.uniform(0.5, 1.0, rows).astype(np.float32),
+        'Debit EUR': rng.normal(1000, 50, rows),
+        'Vendor': pd.Categorical(rng.choice(['A', 'B', 'C'], rows)),
+        'Material': rng.choice(['Cobalt', 'Nickel'], rows),
+    }, index=pd.date_range('2024-01-01', periods=rows, freq='D', name='Date'))
+
+
+# Function to total a column, run in a worker
+def column_total(frame, column, threads=1):
+    return float(frame[column].sum()), len(frame)
+
+
+# Test case for checking handles attach to the same rows and columns as the frame
+def test_put_and_attach(tmp_path):
+    frame = create_frame()
+    store = FeatureStore(str(tmp_path))
+    handle = store.put(frame)
+
+    pd.testing.assert_frame_equal(attach(handle), frame.assign(Material=frame['Material'].astype('category')), check_freq=False)
+    part = handle.take(100, 300).take(50)
+    assert part.n_rows == 150
+    pd.testing.assert_series_equal(attach(part.select('Debit EUR')), frame['Debit EUR'].iloc[150:300], check_freq=False)
+    renamed = attach(part.select(['Vendor Quality History', 'Debit EUR'], names=['x', 'y']))
+    assert list(renamed.columns) == ['x', 'y']
+
+    # Numeric columns are read-only views of the mapped file, not copies
+    values = attach(handle.select('Debit EUR')).to_numpy()
+    assert not values.flags.writeable and not values.flags.owndata
+
+
+# Test case for checking a frame is written once and its handles stay small
+def test_written_once(tmp_path):
+    frame = create_frame(50000)
+    store = FeatureStore(str(tmp_path))
+    handle = store.put(frame)
+    written = os.path.getmtime(os.path.join(handle.path, '0.npy'))
+    assert store.put(frame.copy()) == handle
+    assert os.path.getmtime(os.path.join(handle.path, '0.npy')) == written
+    assert len(os.listdir(str(tmp_path))) == 1 and store.disk_usage() > 0
+
+    assert len(pickle.dumps(handle.take(0, 25000))) < 1000 < len(pickle.dumps(frame.iloc[:25000]))
+
+
+# Test case for checking the least recently put frames are evicted past max_disk_bytes,
+# never the one just written
+def test_eviction(tmp_path):
+    store = FeatureStore(str(tmp_path), max_disk_bytes=1)
+    first = store.put(create_frame(100))
+    os.utime(os.path.join(first.path, 'manifest.json'), (0, 0))
+    second = store.put(create_frame(200))
+
+    assert not os.path.exists(first.path)
+    assert os.path.exists(second.path)
+
+    store.max_disk_bytes = 10 ** 9
+    third = store.put(create_frame(300))
+    assert os.path.exists(second.path) and os.path.exists(third.path)
+
+
+# Test case for checking pool workers attach handles passed as task arguments
+def test_run_parallel_with_handles(tmp_path):
+    frame = create_frame()
+    handle = FeatureStore(str(tmp_path)).put(frame)
+    tasks = {i: (column_total, {'frame': handle.take(i * 250, (i + 1) * 250), 'column': 'Debit EUR'}) for i in range(4)}
+    results = run_parallel(tasks, max_workers=2, total_threads=2)
+
+    for i in range(4):
+        assert results[i][1] == 250
+        assert np.isclose(results[i][0], frame['Debit EUR'].iloc[i * 250:(i + 1) * 250].sum())
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pandas as pd
+
+from benchmark_pipeline import generate_extraction_log, generate_ledger
+from forecast_cli import discover_inputs, main, run_batch, run_catboost_pipeline, summarize
+
+CATBOOST_OPTIONS = {'params': {'iterations': 20, 'depth': 2, 'verbose': 0}, 'cv_folds': 0, 'engine': 'numpy'}
+
+
+# Function to write a small Excel log, a CSV ledger and an unusable CSV to a directory
+def create_inputs(directory):
+    generate_extraction_log(120).to_excel(directory / 'vendor.xlsx', sheet_name='Sheet1', index=False)
+    generate_ledger(200).to_csv(directory / 'ledger.csv', index=False)
+    (directory / 'broken.csv').write_text('Date,x\n1,2\n')
+    (directory / 'notes.txt').write_text('not an input')
+
+
+# Test case for checking directories and globs expand to supported input files only
+def test_discover_inputs(tmp_path):
+    create_inputs(tmp_path)
+    assert [p.rsplit('/', 1)[-1] for p in discover_inputs([str(tmp_path)])] == ['broken.csv', 'ledger.csv', 'vendor.xlsx']
+    assert [p.rsplit('/', 1)[-1] for p in discover_inputs([str(tmp_path / '*.xlsx')])] == ['vendor.xlsx']
+
+
+# Test case for checking both pipelines write outputs and database rows, isolating failures
+def test_run_batch(tmp_path):
+    inputs = tmp_path / 'in'
+    inputs.mkdir()
+    create_inputs(inputs)
+    db_path = tmp_path / 'forecasts.db'
+
+    results = run_batch(discover_inputs([str(inputs)]), str(tmp_path / 'out'), 'csv', db_url=f"sqlite:///{db_path}",
+                        max_workers=1, options=CATBOOST_OPTIONS)
+    results = results.set_index(results['file'].str.rsplit('/', n=1).str[-1])
+
+    assert results.loc['broken.csv', 'error'].startswith('ValueError')
+    assert results.loc['ledger.csv', 'forecast_rows'] == 12
+    assert results.loc['vendor.xlsx', 'pipeline'] == 'prophet'
+    vendor = pd.read_csv(results.loc['vendor.xlsx', 'output'])
+    assert list(vendor.columns) == ['Forecast Date', 'Supply Forecast (USD)', 'Demand Forecast (%)']
+
+    # ForecastResults holds one row per date, so dates shared between files are upserted
+    ledger = pd.read_csv(results.loc['ledger.csv', 'output'])
+    with sqlite3.connect(db_path) as conn:
+        db_rows = conn.execute('SELECT COUNT(*) FROM ForecastResults').fetchone()[0]
+    assert db_rows == len(set(vendor['Forecast Date']) | set(ledger['Forecast Date']))
+
+    summary = summarize(results, seconds=2.0)
+    assert (summary['files'], summary['succeeded'], summary['failed']) == (3, 2, 1)
+
+
+# Test case for checking the CatBoost pipeline forecasts the days after the data with the
+# direct models, however few rows the held-out split has
+def test_catboost_forecasts_after_data():
+    ledger = generate_ledger(40)
+    forecast_df, metrics, input_rows = run_catboost_pipeline(ledger.to_csv(index=False).encode(), forecast_periods=12,
+                                                             cv_folds=0, params=CATBOOST_OPTIONS['params'], tuning='off')
+
+    last = pd.to_datetime(ledger['Date'], format='%d-%m-%Y').max()
+    assert input_rows == 40
+    assert len(forecast_df) == 12
+    assert forecast_df['Forecast Date'].tolist() == list(pd.date_range(last + pd.Timedelta(days=1), periods=12))
+    assert forecast_df[['Supply Forecast', 'Demand Forecast']].notna().all().all()
+    assert 'supply_rmse' in metrics
+
+
+# Test case for checking the CLI end to end on a single file
+def test_main(tmp_path):
+    generate_extraction_log(120).to_excel(tmp_path / 'vendor.xlsx', sheet_name='Sheet1', index=False)
+    out = tmp_path / 'out'
+    assert main([str(tmp_path / 'vendor.xlsx'), '--output-dir', str(out), '--engine', 'numpy', '--workers', '1']) == 0
+    assert (out / 'vendor.prophet.forecast.parquet').exists()
+    assert pd.read_csv(out / 'batch_summary.csv')['forecast_rows'].iloc[0] > 0
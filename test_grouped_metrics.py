@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score, root_mean_squared_error
+
+from grouped_metrics import frame_metrics, grouped_metrics, series_metrics
+
+
+# Function to create many series of actuals and predictions
+def create_series(n_series=50, rows=40):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'Vendor': np.repeat([f"V{i % 10}" for i in range(n_series)], rows),
+        'Material': np.repeat([f"M{i // 10}" for i in range(n_series)], rows),
+        'y': rng.normal(80000, 5000, n_series * rows),
+    })
+    frame['yhat'] = frame['y'] + rng.normal(0, 2000, len(frame))
+    return frame
+
+
+# Test case for checking every group matches sklearn to within 1e-9
+def test_grouped_metrics_match_sklearn():
+    frame = create_series()
+    metrics = frame_metrics(frame, ['Vendor', 'Material'])
+
+    assert len(metrics) == 50
+    for (vendor, material), series in frame.groupby(['Vendor', 'Material']):
+        row = metrics.loc[(vendor, material)]
+        assert row['mae'] == pytest.approx(mean_absolute_error(series['y'], series['yhat']), rel=1e-9)
+        assert row['rmse'] == pytest.approx(root_mean_squared_error(series['y'], series['yhat']), rel=1e-9)
+        assert row['r2'] == pytest.approx(r2_score(series['y'], series['yhat']), rel=1e-9)
+        assert row['mape'] == pytest.approx(mean_absolute_percentage_error(series['y'], series['yhat']), rel=1e-9)
+        assert row['bias'] == pytest.approx((series['yhat'] - series['y']).mean(), rel=1e-9)
+
+
+# Test case for checking NaN rows from a left merge are skipped
+def test_grouped_metrics_skip_nan():
+    y = [1.0, 2.0, 3.0, 4.0]
+    yhat = [1.5, np.nan, 2.5, 4.5]
+    metrics = series_metrics(y, yhat)
+
+    assert metrics['n'] == 3
+    assert metrics['mae'] == pytest.approx(0.5)
+    assert metrics['r2'] == pytest.approx(r2_score([1.0, 3.0, 4.0], [1.5, 2.5, 4.5]))
+
+
+# Test case for checking sklearn's conventions for degenerate series
+def test_grouped_metrics_edge_cases():
+    metrics = grouped_metrics([5.0, 5.0, 5.0, 5.0, 7.0], [5.0, 5.0, 5.0, 6.0, 7.0], ['a', 'a', 'b', 'b', 'c'])
+
+    assert metrics.loc['a', 'r2'] == 1.0
+    assert metrics.loc['b', 'r2'] == 0.0
+    assert np.isnan(metrics.loc['c', 'r2'])
@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from incremental import IncrementalTrainer, fit_catboost_incremental, fit_prophet_incremental, prefix_digest
+from model_cache import ModelCache
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency']
+PARAMS = {'iterations': 50, 'depth': 3, 'learning_rate': 0.1, 'loss_function': 'RMSE', 'verbose': 0, 'random_seed': 0}
+
+
+# Function to create supply data with a stable relationship to the features
+def create_data(rows, shift=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.uniform(0, 1, (rows, 2)), columns=FEATURES,
+                         index=pd.date_range('2024-01-01', periods=rows, freq='D', name='Date'))
+    frame['Debit EUR'] = 100 * frame['Vendor Quality History'] + rng.normal(0, 1, rows) + shift
+    return frame
+
+
+# Test case for checking the prefix digest only depends on the first rows
+def test_prefix_digest():
+    data = create_data(50)
+    assert prefix_digest(data, 40) == prefix_digest(data.iloc[:40], 40)
+    assert prefix_digest(data, 40) != prefix_digest(data, 41)
+
+
+# Test case for checking reuse, warm start and drift-triggered refit for CatBoost
+def test_catboost_incremental_actions(tmp_path):
+    trainer = IncrementalTrainer(ModelCache(cache_dir=str(tmp_path)), drift_threshold=3.0)
+    data = create_data(120)
+
+    first, action = fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS, update_iterations=10)
+    assert action == 'full_refit'
+    _, action = fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS)
+    assert action == 'cached'
+
+    updated, action = fit_catboost_incremental(trainer, data, 'Debit EUR', FEATURES, PARAMS, update_iterations=10)
+    assert action == 'warm_start'
+    assert updated.tree_count_ > first.tree_count_
+
+    drifted = pd.concat([data, create_data(20, shift=500.0, seed=1).set_axis(
+        pd.date_range('2024-05-01', periods=20, freq='D', name='Date'))])
+    _, action = fit_catboost_incremental(trainer, drifted, 'Debit EUR', FEATURES, PARAMS)
+    assert action == 'full_refit'
+
+
+# Test case for checking that a changed history is never warm-started
+def test_changed_history_refits(tmp_path):
+    trainer = IncrementalTrainer(ModelCache(cache_dir=str(tmp_path)), drift_threshold=100.0)
+    data = create_data(120)
+    fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS)
+
+    edited = data.copy()
+    edited.iloc[0, 2] += 1
+    _, action = fit_catboost_incremental(trainer, edited, 'Debit EUR', FEATURES, PARAMS)
+    assert action == 'full_refit'
+
+
+# Test case for checking clearing the model cache keeps the lineage, so a cleared
+# model is refitted once and then warm-started again
+def test_lineage_survives_cache_clear(tmp_path):
+    cache = ModelCache(cache_dir=str(tmp_path / 'models'))
+    trainer = IncrementalTrainer(cache, drift_threshold=100.0)
+    data = create_data(120)
+    fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS)
+    cache.clear()
+
+    assert len(os.listdir(trainer.lineage_dir)) == 1
+    _, action = fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS)
+    assert action == 'full_refit'
+    _, action = fit_catboost_incremental(trainer, data, 'Debit EUR', FEATURES, PARAMS, update_iterations=10)
+    assert action == 'warm_start'
+
+
+# Test case for checking a model is refitted after max_warm_starts warm starts in a row,
+# so the tree count stops growing
+def test_warm_starts_capped(tmp_path):
+    trainer = IncrementalTrainer(ModelCache(cache_dir=str(tmp_path)), drift_threshold=100.0, max_warm_starts=2)
+    data = create_data(130)
+    first, _ = fit_catboost_incremental(trainer, data.iloc[:100], 'Debit EUR', FEATURES, PARAMS)
+
+    actions = []
+    for rows in (110, 120, 130):
+        model, action = fit_catboost_incremental(trainer, data.iloc[:rows], 'Debit EUR', FEATURES, PARAMS,
+                                                 update_iterations=10)
+        actions.append(action)
+    assert actions == ['warm_start', 'warm_start', 'full_refit']
+    assert model.tree_count_ <= first.tree_count_
+
+
+# Test case for checking Prophet warm-starts from the previous Stan parameters
+def test_prophet_incremental_warm_start(tmp_path):
+    trainer = IncrementalTrainer(ModelCache(cache_dir=str(tmp_path)), drift_threshold=100.0)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=70, freq='D'),
+                       'y': 100 + np.arange(70) + rng.normal(0, 1, 70)})
+
+    _, action = fit_prophet_incremental(trainer, df.iloc[:60])
+    assert action == 'full_refit'
+    model, action = fit_prophet_incremental(trainer, df)
+    assert action == 'warm_start'
+    assert len(model.history) == 70
+
+
+# Test case for checking a job's kwargs function is only called when the job is fitted
+def test_lazy_kwargs_only_built_on_fit(tmp_path):
+    from incremental import run_incremental_parallel
+    from parallel_training import cv_catboost_target
+
+    data = create_data(60)
+    trainer = IncrementalTrainer(ModelCache(cache_dir=str(tmp_path)))
+    calls = []
+
+    def kwargs():
+        calls.append(1)
+        return {'X_train': data[FEATURES], 'y_train': data['Debit EUR'], 'params': PARAMS, 'fold_count': 3}
+
+    jobs = {'cv': {'kind': 'cv_results', 'frame': data, 'target': 'Debit EUR', 'features': FEATURES,
+                   'params': PARAMS, 'fn': cv_catboost_target, 'kwargs': kwargs}}
+    first, actions = run_incremental_parallel(trainer, jobs, max_workers=1)
+    again, cached_actions = run_incremental_parallel(trainer, jobs, max_workers=1)
+
+    assert actions == {'cv': 'full_refit'} and cached_actions == {'cv': 'cached'}
+    assert calls == [1]
+    pd.testing.assert_frame_equal(first['cv'], again['cv'])
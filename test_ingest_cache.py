@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import ingest_cache
+from benchmark_pipeline import generate_ledger
+from ingest_cache import CATBOOST_SPEC, PROPHET_SPEC, feature_matrix, load_columnar, memory_report
+
+
+# Function to create CSV bytes shaped like the CatBoost app's upload
+def create_csv():
+    frame = pd.DataFrame({
+        'Date': ['01-12-2024', '02-12-2024', None, '04-12-2024'],
+        'Vendor': ['A', 'B', 'C', 'D'],
+        'Debit EUR': [100.0, 120.0, 90.0, 130.0],
+        'Credit EUR': [50.0, 52.0, 47.0, 58.0],
+        'Vendor Quality History': [0.9, 0.8, 0.7, 0.95],
+        'Vendor Consistency': [0.5, 0.6, 0.7, 0.8],
+        'Processing Efficiency (%)': [88.0, 91.0, 85.0, 90.0],
+        'Unnamed: 11': [None, None, None, None],
+    })
+    return frame.to_csv(index=False).encode()
+
+
+# Test case for checking the Excel path matches the previous read_excel + to_datetime
+def test_load_excel_matches_read_excel(tmp_path):
+    with open('ascend_elements_sample_dataset.xlsx', 'rb') as f:
+        data = f.read()
+    frame = load_columnar(data, PROPHET_SPEC, cache_dir=str(tmp_path))
+
+    expected = pd.read_excel('ascend_elements_sample_dataset.xlsx', sheet_name='Sheet1')
+    expected['Date of Extraction Process'] = pd.to_datetime(expected['Date of Extraction Process'])
+    expected = expected[list(frame.columns)]
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+# Test case for checking that only the needed columns are kept and dates are parsed
+def test_load_csv_selects_columns(tmp_path):
+    frame = load_columnar(create_csv(), CATBOOST_SPEC, cache_dir=str(tmp_path))
+
+    assert list(frame.columns) == ['Date'] + list(CATBOOST_SPEC['dtypes']) + ['Vendor']
+    assert len(frame) == 3
+    assert frame['Debit EUR'].dtype == np.float32
+    assert list(frame['Vendor'].cat.categories) == ['A', 'B', 'D']
+    assert frame['Date'].iloc[2] == pd.Timestamp('2024-12-04')
+
+
+# Test case for checking that a repeated upload is served from the Arrow file
+def test_second_load_skips_parsing(tmp_path, monkeypatch):
+    first = load_columnar(create_csv(), CATBOOST_SPEC, cache_dir=str(tmp_path))
+    assert len(os.listdir(str(tmp_path))) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError('upload was parsed again')
+
+    monkeypatch.setattr(ingest_cache, 'parse_upload', fail)
+    second = load_columnar(create_csv(), CATBOOST_SPEC, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(first, second)
+
+
+# Test case for checking only the most recently loaded uploads are kept, and that the
+# database mirrors sharing the directory are never evicted
+def test_ingest_cache_eviction(tmp_path):
+    (tmp_path / 'source-mirror.arrow').write_bytes(b'mirror')
+    uploads = [generate_ledger(20, seed).to_csv(index=False).encode() for seed in range(3)]
+    paths = []
+    for i, data in enumerate(uploads[:2]):
+        load_columnar(data, CATBOOST_SPEC, cache_dir=str(tmp_path), max_files=2)
+        paths.append(os.path.join(str(tmp_path), f"{ingest_cache.ingest_key(data, CATBOOST_SPEC)}.arrow"))
+        os.utime(paths[-1], (i, i))
+    load_columnar(uploads[0], CATBOOST_SPEC, cache_dir=str(tmp_path), max_files=2)  # A hit makes it the newest
+    load_columnar(uploads[2], CATBOOST_SPEC, cache_dir=str(tmp_path), max_files=2)
+
+    assert os.path.exists(paths[0])
+    assert not os.path.exists(paths[1])
+    assert 'source-mirror.arrow' in os.listdir(str(tmp_path))
+    assert len(os.listdir(str(tmp_path))) == 3
+
+    load_columnar(uploads[1], CATBOOST_SPEC, cache_dir=str(tmp_path), max_bytes=1)
+    assert set(os.listdir(str(tmp_path))) == {os.path.basename(paths[1]), 'source-mirror.arrow'}
+
+
+# Test case for checking the compact frame is at least 4x smaller than a plain read
+def test_memory_report():
+    ledger = generate_ledger(5000).assign(**{'Unnamed: 11': None})
+    ledger.loc[0, 'Debit EUR'] = 1234567.891  # Needs float64 precision
+    report = memory_report(ledger.to_csv(index=False).encode(), CATBOOST_SPEC).set_index('column')
+
+    assert report.loc['Unnamed: 11', 'compact_dtype'] == 'dropped'
+    assert report.loc['Vendor', 'compact_dtype'] == 'category'
+    assert report.loc['Debit EUR', 'compact_dtype'] == 'float64'
+    assert report.loc['Credit EUR', 'compact_dtype'] == 'float32'
+    assert report.loc['total', 'reduction'] >= 4
+
+
+# Test case for checking train/test slices of the feature matrix share its memory
+def test_feature_matrix_is_shared():
+    frame = ingest_cache.parse_upload(generate_ledger(100).to_csv(index=False).encode(), CATBOOST_SPEC)
+    columns = list(CATBOOST_SPEC['dtypes'])[2:]
+    X = feature_matrix(frame, columns)
+
+    assert X.to_numpy().dtype == np.float32
+    assert np.shares_memory(X.iloc[:80].to_numpy(), X.to_numpy())
+    assert np.shares_memory(X.iloc[80:].to_numpy(), X.to_numpy())
@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import pytest
+
+from db_writer import ForecastWriter, SQLiteBackend
+from instrumentation import Recorder, profile_run, span, use_recorder
+from stage_graph import StageGraph
+
+
+# Test case for checking spans record timings, nesting, row counts and errors
+def test_spans():
+    recorder = Recorder()
+    recorder.start_run()
+    with use_recorder(recorder):
+        with span('fit', rows=10):
+            with span('cv') as record:
+                record['rows'] = 8
+        with pytest.raises(ValueError):
+            with span('predict'):
+                raise ValueError('boom')
+
+    spans = recorder.frame(run=1).set_index('stage')
+    assert list(spans.index) == ['cv', 'fit', 'predict']
+    assert spans.loc['cv', 'parent'] == 'fit' and spans.loc['cv', 'rows'] == 8
+    assert spans.loc['predict', 'status'] == 'error'
+    assert (spans['wall_seconds'] >= 0).all() and spans['cpu_seconds'].notna().all()
+
+    lines = [json.loads(line) for line in recorder.to_jsonl().splitlines()]
+    assert [line['stage'] for line in lines] == ['cv', 'fit', 'predict']
+    assert lines[2]['rows'] is None
+
+    text = recorder.to_prometheus()
+    assert 'forecast_stage_runs_total{stage="predict",status="error"} 1' in text
+    assert 'forecast_stage_rows_total{stage="fit"} 10' in text
+    assert '# TYPE forecast_stage_wall_seconds_total counter' in text
+
+
+# Test case for checking stage graph runs and database writes are instrumented
+def test_stage_and_db_spans():
+    recorder = Recorder()
+    with use_recorder(recorder):
+        graph = StageGraph({})
+        graph.run('load', lambda: pd.DataFrame({'x': range(5)}))
+        graph.run('load', lambda: pd.DataFrame({'x': range(5)}))  # Cached, so no span
+        writer = ForecastWriter(SQLiteBackend(), pool_size=1)
+        writer.write(pd.DataFrame({'Forecast Date': pd.date_range('2024-01-01', periods=3),
+                                   'Supply Forecast (USD)': [1.0, 2.0, 3.0], 'Demand Forecast (%)': [4.0, 5.0, 6.0]}))
+        writer.close()
+
+    spans = recorder.frame()
+    assert spans['stage'].tolist() == ['load', 'db_write']
+    assert spans['rows'].tolist() == [5, 3]
+
+
+# Test case for checking a single run can be profiled with cProfile
+def test_profile_run():
+    with profile_run('cprofile', top=5) as result:
+        sum(i * i for i in range(10000))
+    assert 'function calls' in result['report']
+
+    with pytest.raises(ValueError):
+        profile_run('perf').__enter__()
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pandas as pd
+
+from jobs import JobScheduler, check_cancelled, report_progress
+from stage_graph import StageGraph
+
+
+# Function to block until the event is set, reporting progress and honouring cancellation
+def wait_for(event, calls):
+    calls.append(1)
+    report_progress(0.5, 'halfway')
+    while not event.wait(0.01):
+        check_cancelled()
+    return len(calls)
+
+
+# Test case for checking identical jobs are run once and shared by their submitters
+def test_deduplicates_jobs():
+    scheduler = JobScheduler(max_workers=2)
+    release = threading.Event()
+    calls = []
+    first = scheduler.submit('key', wait_for, release, calls, owner='a')
+    second = scheduler.submit('key', wait_for, release, calls, owner='b')
+    assert first is second and first.owners == {'a', 'b'}
+
+    time.sleep(0.05)
+    assert (first.status, first.progress, first.message) == ('running', 0.5, 'halfway')
+    release.set()
+    assert first.wait(5) and first.status == 'done' and first.result == 1
+    assert scheduler.submit('key', wait_for, release, calls).result == 1 and len(calls) == 1
+    scheduler.shutdown()
+
+
+# Test case for checking no more than max_cpu_jobs CPU-heavy jobs run at once
+def test_caps_cpu_heavy_jobs():
+    scheduler = JobScheduler(max_workers=4, max_cpu_jobs=1)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def fit(i):
+        with lock:
+            running.append(i)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(i)
+        return i
+
+    jobs = [scheduler.submit(f"fit-{i}", fit, i, cpu_heavy=True) for i in range(3)]
+    io_job = scheduler.submit('write', lambda: 'written')
+    assert all(job.wait(5) for job in jobs + [io_job])
+    assert max(peak) == 1
+    assert [job.result for job in jobs] == [0, 1, 2] and io_job.result == 'written'
+    scheduler.shutdown()
+
+
+# Test case for checking a job is cancelled only once every owner has cancelled it
+def test_cancellation():
+    scheduler = JobScheduler(max_workers=1)
+    release = threading.Event()
+    running = scheduler.submit('running', wait_for, release, [], owner='a')
+    scheduler.submit('running', wait_for, release, [], owner='b')
+    queued = scheduler.submit('queued', wait_for, release, [], owner='a')
+    time.sleep(0.05)
+
+    assert scheduler.cancel('queued', owner='a')
+    assert queued.status == 'cancelled'
+    assert not scheduler.cancel('running', owner='a')  # Session b still waits for it
+    assert scheduler.cancel('running', owner='b')
+    assert running.wait(5) and running.status == 'cancelled'
+
+    # A cancelled or failed job is retried on the next submit
+    release.set()
+    assert scheduler.submit('queued', wait_for, release, []).wait(5)
+    assert scheduler.get('queued').status == 'done'
+    scheduler.shutdown()
+
+
+# Test case for checking two sessions' stage graphs share one background job
+def test_stage_graph_submit():
+    scheduler = JobScheduler(max_workers=2)
+    calls = []
+
+    def fit(data, depth):
+        calls.append(depth)
+        return data['x'].sum() * depth
+
+    graphs = [StageGraph({}) for _ in range(2)]
+    for graph in graphs:
+        graph.run('load', lambda: pd.DataFrame({'x': [1, 2, 3]}))
+    jobs = [graph.submit('fit', scheduler, fit, ['load'], cpu_heavy=True, owner=i, depth=2) for i, graph in enumerate(graphs)]
+    assert jobs[0] is jobs[1] and jobs[0].wait(5)
+
+    assert graphs[0].submit('fit', scheduler, fit, ['load'], depth=2).result == 12
+    assert graphs[0].entries['fit']['value'] == 12
+    assert graphs[0].submit('fit', scheduler, fit, ['load'], depth=2).__class__.__name__ == 'FinishedStage'
+    assert calls == [2]
+    scheduler.shutdown()
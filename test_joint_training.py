@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from joint_training import compare_modes, split_index, train_joint, train_joint_cached, train_per_target
+from model_cache import ModelCache
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency', 'Processing Efficiency (%)']
+TARGETS = ['Debit EUR', 'Credit EUR']
+PARAMS = {'iterations': 30, 'depth': 3, 'learning_rate': 0.1, 'loss_function': 'RMSE', 'verbose': 0, 'random_seed': 0}
+
+
+# Function to create supply/demand data driven by the shared features
+def create_data(rows=60):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.uniform(0, 1, (rows, 3)), columns=FEATURES)
+    frame['Debit EUR'] = 100 * frame['Vendor Quality History'] + rng.normal(0, 1, rows)
+    frame['Credit EUR'] = 50 * frame['Vendor Consistency'] + rng.normal(0, 1, rows)
+    return frame
+
+
+# Test case for checking the split matches train_test_split(test_size=0.2, shuffle=False)
+def test_split_index():
+    from sklearn.model_selection import train_test_split
+    for rows in (5, 10, 13, 99):
+        train, _ = train_test_split(list(range(rows)), test_size=0.2, shuffle=False)
+        assert split_index(rows) == len(train)
+
+
+# Test case for checking one model predicts both targets
+def test_train_joint_predicts_both_targets():
+    frame = create_data()
+    model, cv_results, seconds = train_joint(frame[FEATURES], frame[TARGETS], PARAMS, fold_count=3)
+
+    assert model.predict(frame[FEATURES]).shape == (60, 2)
+    assert 'test-MultiRMSE-mean' in cv_results.columns
+    assert seconds > 0
+
+
+# Test case for checking the joint model and CV results are served from the cache
+def test_train_joint_cached(tmp_path, monkeypatch):
+    frame = create_data()
+    cache = ModelCache(cache_dir=str(tmp_path))
+    model, cv_results = train_joint_cached(cache, frame, FEATURES, TARGETS, PARAMS, fold_count=3)
+
+    import joint_training
+    monkeypatch.setattr(joint_training, 'train_joint', None)  # Would fail if called
+    cached_model, cached_cv = train_joint_cached(cache, frame, FEATURES, TARGETS, PARAMS, fold_count=3)
+    assert cached_model is model
+    assert cached_cv is cv_results
+
+
+# Test case for checking the accuracy comparison covers both modes and targets
+def test_compare_modes():
+    frame = create_data()
+    comparison, timings = compare_modes(frame[FEATURES], frame[TARGETS], PARAMS, fold_count=3)
+
+    assert sorted(zip(comparison['target'], comparison['mode'])) == sorted(
+        (target, mode) for target in TARGETS for mode in ('joint', 'per-target'))
+    assert timings['time_saved_seconds'] == timings['per_target_seconds'] - timings['joint_seconds']
+
+
+# Test case for checking per-target training gives each target its own params
+def test_train_per_target_params():
+    frame = create_data()
+    models, seconds = train_per_target(frame[FEATURES], frame[TARGETS], PARAMS, fold_count=3,
+                                       target_params={TARGETS[1]: {**PARAMS, 'depth': 2}}, early_stopping_rounds=10)
+
+    assert models[TARGETS[0]].get_params()['depth'] == PARAMS['depth']
+    assert models[TARGETS[1]].get_params()['depth'] == 2
+    assert seconds > 0
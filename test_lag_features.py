@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from lag_features import build_features, daily_series, update_features
+
+
+# Function to create a daily series with a weekly pattern
+def create_series(days=120):
+    dates = pd.date_range('2024-01-01', periods=days, freq='D')
+    t = np.arange(days)
+    return pd.DataFrame({'Debit EUR': 100 + 20 * np.sin(2 * np.pi * t / 7) + t,
+                         'Credit EUR': 80 + 10 * np.cos(2 * np.pi * t / 7)}, index=dates)
+
+
+# Test case for checking ledger rows are totalled per day with empty days as 0
+def test_daily_series():
+    ledger = pd.DataFrame({'Debit EUR': [1.0, 2.0, 4.0], 'Credit EUR': [1.0, 1.0, 1.0]},
+                          index=pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-03']))
+    series = daily_series(ledger)
+    assert series['Debit EUR'].tolist() == [3.0, 0.0, 4.0]
+    assert series['Credit EUR'].tolist() == [2.0, 0.0, 1.0]
+
+
+# Test case for checking the vectorized features match pandas shift and rolling
+def test_build_features_matches_pandas():
+    series = create_series()
+    features = build_features(series, lags=(0, 7), windows=(7,))
+    debit = series['Debit EUR']
+
+    np.testing.assert_allclose(features['Debit EUR lag0'], debit, rtol=1e-6)
+    np.testing.assert_allclose(features['Debit EUR lag7'], debit.shift(7), rtol=1e-6)
+    np.testing.assert_allclose(features['Debit EUR mean7'], debit.rolling(7).mean(), rtol=1e-6)
+    np.testing.assert_allclose(features['Credit EUR std7'], series['Credit EUR'].rolling(7).std(), rtol=1e-5)
+    assert features['dayofweek'].tolist() == list(series.index.dayofweek)
+
+
+# Test case for checking appended days only compute the new rows and match a full build
+def test_update_features_incremental():
+    series = create_series()
+    first = update_features(series.iloc[:100])
+    assert first.recomputed == 100
+
+    appended = update_features(series, first)
+    assert appended.recomputed == 20
+    pd.testing.assert_frame_equal(appended.features, build_features(series))
+
+    # Later rows for the last day change its totals, so that day is recomputed too
+    grown = series.copy()
+    grown.iloc[99, 0] += 5
+    assert update_features(grown.iloc[:100], first).recomputed == 1
+    assert update_features(series.iloc[10:], first).recomputed == 110
@@ -0,0 +1,103 @@
+import os
+
+import pandas as pd
+import pytest
+from catboost import CatBoostRegressor
+
+from model_cache import ModelCache, make_cache_key
+
+
+# Function to create a small training frame
+def create_frame():
+    return pd.DataFrame({
+        'Vendor Quality History': [0.9, 0.8, 0.7, 0.95, 0.85, 0.75, 0.65, 0.9],
+        'Vendor Consistency': [0.5, 0.6, 0.7, 0.8, 0.55, 0.65, 0.75, 0.85],
+        'Debit EUR': [100.0, 120.0, 90.0, 130.0, 110.0, 105.0, 95.0, 125.0],
+    })
+
+
+def fit_model(frame, calls):
+    calls.append(1)
+    model = CatBoostRegressor(iterations=10, depth=2, verbose=0)
+    model.fit(frame[['Vendor Quality History', 'Vendor Consistency']], frame['Debit EUR'])
+    return model
+
+
+# Test case for checking that the key depends on data, columns and params
+def test_cache_key_changes_with_inputs():
+    frame = create_frame()
+    features = ['Vendor Quality History', 'Vendor Consistency']
+    key = make_cache_key('catboost', frame, 'Debit EUR', features, {'depth': 2})
+
+    assert key == make_cache_key('catboost', frame.copy(), 'Debit EUR', features, {'depth': 2})
+    assert key != make_cache_key('catboost', frame, 'Debit EUR', features, {'depth': 3})
+    assert key != make_cache_key('catboost', frame, 'Debit EUR', features[:1], {'depth': 2})
+
+    changed = frame.copy()
+    changed.loc[0, 'Debit EUR'] = 101.0
+    assert key != make_cache_key('catboost', changed, 'Debit EUR', features, {'depth': 2})
+
+
+# Test case for checking that a hit skips fitting and survives a restart
+def test_get_or_fit_uses_memory_and_disk(tmp_path):
+    frame = create_frame()
+    features = ['Vendor Quality History', 'Vendor Consistency']
+    calls = []
+
+    cache = ModelCache(cache_dir=str(tmp_path))
+    first = cache.get_or_fit('catboost', frame, 'Debit EUR', features, {'depth': 2}, lambda: fit_model(frame, calls))
+    second = cache.get_or_fit('catboost', frame, 'Debit EUR', features, {'depth': 2}, lambda: fit_model(frame, calls))
+    assert first is second
+    assert len(calls) == 1
+
+    restarted = ModelCache(cache_dir=str(tmp_path))
+    reloaded = restarted.get_or_fit('catboost', frame, 'Debit EUR', features, {'depth': 2}, lambda: fit_model(frame, calls))
+    assert len(calls) == 1
+    X = frame[features]
+    assert list(reloaded.predict(X)) == pytest.approx(list(first.predict(X)))
+
+
+# Test case for checking LRU and size-based disk eviction
+def test_eviction(tmp_path):
+    cache = ModelCache(cache_dir=str(tmp_path), max_memory_items=2, max_disk_bytes=0)
+    cache.put('a', 'cv_results', pd.DataFrame({'x': [1]}))
+    cache.put('b', 'cv_results', pd.DataFrame({'x': [2]}))
+    cache.put('c', 'cv_results', pd.DataFrame({'x': [3]}))
+
+    assert list(cache._memory) == ['b', 'c']
+    assert os.listdir(str(tmp_path)) == []
+
+
+# Test case for checking warm() loads the newest disk entries into memory
+def test_warm(tmp_path):
+    frame = create_frame()
+    features = ['Vendor Quality History', 'Vendor Consistency']
+    calls = []
+    writer = ModelCache(str(tmp_path), max_memory_items=2)
+    for depth in (2, 3, 4):
+        writer.get_or_fit('catboost', frame, 'Debit EUR', features, {'depth': depth}, lambda: fit_model(frame, calls))
+
+    cache = ModelCache(str(tmp_path), max_memory_items=2)
+    assert cache.warm() == 2
+    assert len(cache._memory) == 2
+
+
+# Test case for checking Prophet models keep their fitted values through the disk cache,
+# and that fast predictions leave the shared model object unchanged
+def test_prophet_fitted_values_survive_disk(tmp_path):
+    from forecasting import fit_prophet_model, predict_prophet_model
+
+    series = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=40, freq='D'),
+                           'y': [100.0 + (i % 7) * 3 + i for i in range(40)]})
+    assert getattr(fit_prophet_model(series, engine='numpy'), 'fitted_values_', None) is None
+    model = fit_prophet_model(series, store_fitted=True)
+    assert model.fitted_values_ is not None
+
+    ModelCache(str(tmp_path)).put('key', 'prophet', model)
+    loaded = ModelCache(str(tmp_path)).get('key', 'prophet')
+    pd.testing.assert_frame_equal(loaded.fitted_values_, model.fitted_values_, check_freq=False)
+
+    samples = loaded.uncertainty_samples
+    forecast = predict_prophet_model(loaded, 5, mode='fast', intervals='sample', n_samples=10)
+    assert loaded.uncertainty_samples == samples
+    assert len(forecast) == 45
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore
+from lag_features import build_features
+from model_cache import ModelCache
+from multi_horizon import covered_horizon, forecast_direct, horizon_buckets, stack_horizons, train_direct
+
+PARAMS = {'iterations': 30, 'depth': 3, 'verbose': 0}
+
+
+# Function to create a daily series with a weekly pattern
+def create_series(days=150):
+    dates = pd.date_range('2024-01-01', periods=days, freq='D')
+    weekly = np.tile([10.0, 12.0, 14.0, 16.0, 18.0, 5.0, 3.0], days // 7 + 1)[:days]
+    return pd.DataFrame({'Debit EUR': 10 * weekly, 'Credit EUR': 5 * weekly}, index=dates)
+
+
+# Test case for checking each horizon's rows are labelled with the value h days later
+def test_stack_horizons():
+    series = create_series(30)
+    features = build_features(series)
+    X, y = stack_horizons(features, series, 'Debit EUR', [1, 3])
+
+    assert len(X) == len(y) == 29 + 27
+    assert X['horizon'].tolist() == [1] * 29 + [3] * 27
+    np.testing.assert_allclose(y[:29], series['Debit EUR'].iloc[1:])
+    assert X['dayofweek'].iloc[0] == series.index[1].dayofweek
+    assert horizon_buckets(10) == [(1, 7), (8, 10)]
+
+
+# Test case for checking the direct models forecast every period after the data
+def test_train_and_forecast_direct(tmp_path):
+    series = create_series()
+    features = build_features(series)
+    cache = ModelCache(str(tmp_path))
+    models = train_direct(features, series, PARAMS, max_horizon=14, cache=cache, max_workers=1)
+    assert {target: sorted(buckets) for target, buckets in models.items()} == {
+        'Debit EUR': [(1, 7), (8, 14)], 'Credit EUR': [(1, 7), (8, 14)]}
+    assert covered_horizon(models) == 14
+
+    forecast = forecast_direct(models, features, periods=14)
+    assert forecast['Forecast Date'].iloc[0] == series.index[-1] + pd.Timedelta(days=1)
+    assert forecast[['Debit EUR', 'Credit EUR']].notna().all().all()
+    # The weekly pattern carries into the forecast
+    expected = 10 * np.tile([10.0, 12.0, 14.0, 16.0, 18.0, 5.0, 3.0], 3)[150 % 7:150 % 7 + 14]
+    assert np.abs(forecast['Debit EUR'].to_numpy() - expected).mean() < 25
+
+    # A second run reads every bucket from the model cache
+    again = train_direct(features, series, PARAMS, max_horizon=14, cache=cache, max_workers=1)
+    assert all(again[target][bucket] is model for target in models for bucket, model in models[target].items())
+
+
+# Test case for checking each target's horizon models are trained with its own params
+def test_train_direct_target_params():
+    series = create_series()
+    features = build_features(series)
+    models = train_direct(features, series, PARAMS, max_horizon=7, max_workers=1,
+                          target_params={'Credit EUR': {**PARAMS, 'depth': 4}})
+
+    assert models['Debit EUR'][(1, 7)].get_params()['depth'] == 3
+    assert models['Credit EUR'][(1, 7)].get_params()['depth'] == 4
+
+
+# Test case for checking the daily frame is only written to the feature store when some
+# bucket is actually trained
+def test_train_direct_stores_only_on_fit(tmp_path):
+    series = create_series(60)
+    features = build_features(series)
+    cache = ModelCache(str(tmp_path / 'models'))
+    store = FeatureStore(str(tmp_path / 'features'))
+    puts = []
+    put = store.put
+    store.put = lambda frame: puts.append(len(frame)) or put(frame)
+
+    train_direct(features, series, PARAMS, max_horizon=7, cache=cache, max_workers=1, feature_store=store)
+    train_direct(features, series, PARAMS, max_horizon=7, cache=cache, max_workers=1, feature_store=store)
+    assert puts == [60]
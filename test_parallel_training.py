@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from model_cache import ModelCache
+from parallel_training import (cv_catboost_target, fit_catboost_target, run_cached_parallel, run_parallel,
+                               shutdown_executors, thread_budget)
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency']
+PARAMS = {'iterations': 20, 'depth': 2, 'learning_rate': 0.1, 'loss_function': 'RMSE', 'verbose': 0, 'random_seed': 0}
+
+
+# Function to create a small supply/demand frame
+def create_frame():
+    return pd.DataFrame({
+        'Vendor Quality History': [0.9, 0.8, 0.7, 0.95, 0.85, 0.75, 0.65, 0.9, 0.6, 0.7],
+        'Vendor Consistency': [0.5, 0.6, 0.7, 0.8, 0.55, 0.65, 0.75, 0.85, 0.9, 0.4],
+        'Debit EUR': [100.0, 120.0, 90.0, 130.0, 110.0, 105.0, 95.0, 125.0, 85.0, 98.0],
+        'Credit EUR': [50.0, 52.0, 47.0, 58.0, 51.0, 49.0, 46.0, 57.0, 44.0, 48.0],
+    })
+
+
+def fit_kwargs(frame, target):
+    return {
+        'X_train': frame[FEATURES][:8], 'y_train': frame[target][:8],
+        'X_test': frame[FEATURES][8:], 'y_test': frame[target][8:], 'params': PARAMS,
+    }
+
+
+# Test case for checking the per-worker thread budget
+def test_thread_budget():
+    assert thread_budget(2, 16) == 8
+    assert thread_budget(3, 16) == 5
+    assert thread_budget(32, 16) == 1
+
+
+# Test case for checking that parallel results match sequential training
+def test_run_parallel_matches_sequential():
+    frame = create_frame()
+    tasks = {target: (fit_catboost_target, fit_kwargs(frame, target)) for target in ('Debit EUR', 'Credit EUR')}
+    try:
+        parallel = run_parallel(tasks, max_workers=2, total_threads=2)
+    finally:
+        shutdown_executors()
+    sequential = run_parallel(tasks, max_workers=1, total_threads=1)
+
+    X = frame[FEATURES]
+    for target in tasks:
+        assert list(parallel[target].predict(X)) == pytest.approx(list(sequential[target].predict(X)))
+
+
+# Test case for checking that cached jobs are not retrained
+def test_run_cached_parallel_skips_hits(tmp_path):
+    frame = create_frame()
+    cache = ModelCache(cache_dir=str(tmp_path))
+    jobs = {
+        'cv': {
+            'kind': 'cv_results', 'frame': frame, 'target': 'Debit EUR', 'features': FEATURES,
+            'params': {**PARAMS, 'fold_count': 2}, 'fn': cv_catboost_target,
+            'kwargs': {'X_train': frame[FEATURES], 'y_train': frame['Debit EUR'], 'params': PARAMS, 'fold_count': 2},
+        },
+    }
+    first = run_cached_parallel(cache, jobs, max_workers=1)
+
+    jobs['cv']['fn'] = None  # Would fail if called
+    second = run_cached_parallel(cache, jobs, max_workers=1)
+    assert second['cv'] is first['cv']
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from plotting import FigureCache, decimate, figure_key, lttb_indices, scatter
+
+
+# Function to create a long random walk with one spike
+def create_series(rows=20000):
+    rng = np.random.default_rng(0)
+    x = pd.date_range('2020-01-01', periods=rows, freq='h')
+    y = rng.normal(size=rows).cumsum()
+    y[rows // 2] = y.max() + 100
+    return x, y
+
+
+# Test case for checking LTTB keeps the endpoints and peaks
+def test_lttb_keeps_endpoints_and_peaks():
+    x, y = create_series()
+    index = lttb_indices(x, y, 500)
+
+    assert len(index) == 500
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert np.all(np.diff(index) > 0)
+    assert len(x) // 2 in index
+    assert len(lttb_indices(x[:100], y[:100], 500)) == 100
+
+
+# Test case for checking long traces are decimated and zoomed traces keep full resolution
+def test_scatter_decimates_and_zooms():
+    x, y = create_series()
+    full = scatter(x, y, mode='lines')
+    assert isinstance(full, go.Scatter)
+    assert len(full.x) == 2000
+
+    zoom = (x[1000], x[8999])
+    zoomed = scatter(x, y, x_range=zoom, mode='lines')
+    assert isinstance(zoomed, go.Scattergl)
+    assert len(zoomed.x) == 8000
+
+    zoomed_x, zoomed_y = decimate(x, y, max_points=100, x_range=zoom)
+    assert zoomed_x.iloc[0] == x[1000] and zoomed_x.iloc[-1] == x[8999]
+
+
+# Test case for checking figures are built once per dataset and options
+def test_figure_cache():
+    x, y = create_series(100)
+    cache = FigureCache(max_items=1)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return go.Figure(scatter(x, y))
+
+    key = figure_key('supply', pd.Series(y), x_range=None)
+    first = cache.get_or_build(key, build)
+    second = cache.get_or_build(key, build)
+    assert len(builds) == 1
+    assert list(second.data[0].y) == list(first.data[0].y)
+
+    assert figure_key('supply', pd.Series(y), x_range=(x[0], x[10])) != key
+    cache.get_or_build(figure_key('supply', pd.Series(y + 1)), build)
+    cache.get_or_build(key, build)
+    assert len(builds) == 3
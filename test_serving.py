@@ -0,0 +1,127 @@
+import asyncio
+import json
+import socket
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostRegressor
+
+from benchmark_pipeline import generate_ledger
+from fast_prophet import LinearProphet
+from multi_horizon import MAX_HORIZON, predict_direct
+from serving import (FEATURE_COLUMNS, DirectoryModelStore, ForecastService, InMemoryModelStore, MicroBatcher,
+                     ModelRegistry, make_app, publish_catboost)
+
+CATBOOST_PARAMS = {'iterations': 20, 'depth': 2, 'verbose': 0}
+
+
+# Stand-in CatBoost model that counts its predict calls
+class CountingRegressor(CatBoostRegressor):
+    calls = 0
+
+    def predict(self, X, *args, **kwargs):
+        CountingRegressor.calls += 1
+        return super().predict(X, *args, **kwargs)
+
+
+# Function to fit a counting model on a generated ledger
+def create_catboost_model(target):
+    ledger = generate_ledger(200)
+    model = CountingRegressor(**CATBOOST_PARAMS)
+    model.fit(ledger[FEATURE_COLUMNS], ledger[target])
+    return model
+
+
+# Function to build an in-memory store with one CatBoost and one Prophet series
+def create_store():
+    store = InMemoryModelStore()
+    CountingRegressor.calls = 0
+    supply = create_catboost_model('Debit EUR')
+    demand = create_catboost_model('Credit EUR')
+    features = generate_ledger(30)[FEATURE_COLUMNS]
+    features.index = pd.date_range('2025-01-01', periods=30, freq='D')
+    store.save('ledger', 'catboost', 'v1', {'supply': supply, 'demand': demand}, features)
+
+    history = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=200, freq='D')})
+    history['y'] = 100 + np.sin(np.arange(200) / 7.0)
+    models = {target: LinearProphet().fit(history) for target in ('supply', 'demand')}
+    store.save('vendor', 'prophet', 'v1', models)
+    return store
+
+
+# Test case for checking concurrent requests share predict calls and repeats come from the cache
+def test_micro_batching_and_cache():
+    store = create_store()
+    service = ForecastService(ModelRegistry(store), MicroBatcher(max_delay=0.01))
+
+    async def run():
+        return await asyncio.gather(*[service.forecast('ledger', h) for h in range(1, 21)])
+
+    bodies = asyncio.run(run())
+    assert CountingRegressor.calls == 2  # One call each for the supply and demand models
+    first = json.loads(bodies[4])
+    assert first['horizon'] == 5 and first['version'] == 'v1'
+    assert list(first['forecast'][0]) == ['Forecast Date', 'Supply Forecast', 'Demand Forecast']
+
+    # Batched predictions match predicting each request alone
+    bundle = store.load('ledger', 'v1')
+    expected = bundle.models['supply'].predict(bundle.features.iloc[:5][FEATURE_COLUMNS])
+    assert np.allclose([row['Supply Forecast'] for row in first['forecast']], expected)
+
+    asyncio.run(run())
+    assert CountingRegressor.calls == 3 and service.cache.hits == 20
+
+    prophet = json.loads(asyncio.run(service.forecast('vendor', 7)))
+    assert list(prophet['forecast'][0]) == ['Forecast Date', 'Supply Forecast (USD)', 'Demand Forecast (%)']
+    assert prophet['forecast'][0]['Forecast Date'].startswith('2024-07-19')
+
+
+# Test case for checking published direct models reload from disk with their rows, dated
+# from the day after the data
+def test_directory_store(tmp_path):
+    store = DirectoryModelStore(str(tmp_path))
+    ledger = generate_ledger(200)
+    data = ledger.to_csv(index=False).encode()
+    version = publish_catboost(store, 'ledger', data, params=CATBOOST_PARAMS)
+
+    registry = ModelRegistry(DirectoryModelStore(str(tmp_path)))
+    bundle = registry.get('ledger')
+    assert (bundle.kind, bundle.version) == ('catboost', version)
+    assert sorted(bundle.models['supply']) == [(1, 7), (8, 14), (15, 28), (29, 36)]
+    assert len(bundle.features) == MAX_HORIZON
+    assert registry.describe()[0]['max_horizon'] == MAX_HORIZON
+    last = pd.to_datetime(ledger['Date'], format='%d-%m-%Y').max()
+    assert bundle.features.index[0] == last + pd.Timedelta(days=1)
+
+    service = ForecastService(registry)
+    forecast = json.loads(asyncio.run(service.forecast('ledger', 10)))['forecast']
+    expected = predict_direct(bundle.models['demand'], bundle.features.iloc[:10])
+    assert np.allclose([row['Demand Forecast'] for row in forecast], expected)
+
+
+# Test case for checking the HTTP endpoint's responses and errors
+def test_forecast_endpoint():
+    from tornado.httpclient import AsyncHTTPClient
+
+    store = create_store()
+    app = make_app(ForecastService(ModelRegistry(store)))
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    async def run():
+        server = app.listen(port, address='127.0.0.1')
+        client = AsyncHTTPClient()
+        try:
+            responses = await asyncio.gather(*[
+                client.fetch(f"http://127.0.0.1:{port}/forecast?series={series}&horizon={horizon}", raise_error=False)
+                for series, horizon in [('ledger', 12), ('vendor', 3), ('missing', 3), ('ledger', 100)]])
+            health = await client.fetch(f"http://127.0.0.1:{port}/health")
+        finally:
+            server.stop()
+        return responses, json.loads(health.body)
+
+    responses, health = asyncio.run(run())
+    assert [r.code for r in responses] == [200, 200, 404, 400]
+    assert len(json.loads(responses[0].body)['forecast']) == 12
+    assert health['models'] == 2
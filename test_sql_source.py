@@ -0,0 +1,145 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from db_writer import SQLiteBackend
+from sql_source import PROPHET_SOURCE, SQLSource, check_source
+
+LEDGER_SOURCE = {
+    'table': 'Ledger',
+    'date_column': 'Date',
+    'measures': {'Debit EUR': 'SUM', 'Credit EUR': 'SUM'},
+    'aggregate': 'day',
+}
+
+
+# Function to append ledger rows, two per day at different times, to a SQLite table
+def add_rows(path, start, days, debit=10.0):
+    rows = []
+    for date in pd.date_range(start, periods=days, freq='D'):
+        for hour in (9, 15):
+            rows.append((f"{date:%Y-%m-%d} {hour:02d}:00:00", debit, 1.0))
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS Ledger ("Date" TEXT, "Debit EUR" REAL, "Credit EUR" REAL)')
+        conn.executemany('INSERT INTO Ledger VALUES (?, ?, ?)', rows)
+
+
+# Test case for checking the first refresh pulls the whole history, aggregated per day
+def test_initial_refresh(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    add_rows(path, '2024-01-01', 30)
+    source = SQLSource(SQLiteBackend(path), LEDGER_SOURCE, cache_dir=str(tmp_path / 'cache'), chunk_size=7)
+    stats = source.refresh()
+    frame = source.load()
+    source.close()
+
+    assert stats['fetched_rows'] == 30
+    assert stats['kept_rows'] == 0
+    assert stats['watermark'] == '2024-01-30T00:00:00'
+    assert list(frame.columns) == ['Date', 'Debit EUR', 'Credit EUR']
+    assert len(frame) == 30
+    assert frame['Debit EUR'].iloc[0] == pytest.approx(20.0)
+    assert frame['Date'].iloc[-1] == pd.Timestamp('2024-01-30')
+
+
+# Test case for checking a refresh only fetches the watermark day and the days after it,
+# and replaces the watermark day's totals instead of duplicating them
+def test_incremental_refresh(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    add_rows(path, '2024-01-01', 60)
+    source = SQLSource(SQLiteBackend(path), LEDGER_SOURCE, cache_dir=str(tmp_path / 'cache'))
+    full = source.refresh()
+
+    add_rows(path, '2024-02-29', 1, debit=5.0)  # More rows for the watermark day
+    add_rows(path, '2024-03-01', 3)
+    stats = source.refresh()
+    frame = source.load()
+    source.close()
+
+    assert stats['fetched_rows'] == 4
+    assert stats['kept_rows'] == 59
+    assert stats['fetched_bytes'] < full['fetched_bytes']
+    assert len(frame) == 63
+    assert frame['Date'].is_unique
+    assert frame.set_index('Date').loc['2024-02-29', 'Debit EUR'] == pytest.approx(30.0)
+    assert stats['watermark'] == '2024-03-03T00:00:00'
+
+
+# Test case for checking raw rows (no daily aggregate) with times of day are not
+# duplicated when a refresh fetches the watermark day again
+def test_incremental_refresh_intraday_rows(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE Ledger ("Date" TEXT, "Debit EUR" REAL, "Credit EUR" REAL)')
+        conn.executemany('INSERT INTO Ledger VALUES (?, ?, ?)',
+                         [('2024-01-01 08:00:00', 1.0, 1.0), ('2024-01-01 12:00:00', 2.0, 1.0)])
+    source = SQLSource(SQLiteBackend(path), {**LEDGER_SOURCE, 'aggregate': None}, cache_dir=str(tmp_path / 'cache'))
+    source.refresh()
+    with sqlite3.connect(path) as conn:
+        conn.execute('INSERT INTO Ledger VALUES (?, ?, ?)', ('2024-01-02 09:00:00', 3.0, 1.0))
+    stats = source.refresh()
+    frame = source.load()
+    source.close()
+
+    assert stats['fetched_rows'] == 3
+    assert len(frame) == 3
+    assert frame['Date'].is_unique
+    assert frame['Debit EUR'].tolist() == [1.0, 2.0, 3.0]
+
+
+# Test case for checking the version only changes when a refresh fetched different rows
+def test_version_follows_content(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    add_rows(path, '2024-01-01', 10)
+    source = SQLSource(SQLiteBackend(path), LEDGER_SOURCE, cache_dir=str(tmp_path / 'cache'))
+    first = source.refresh()
+    idle = source.refresh()
+    add_rows(path, '2024-01-11', 1)
+    grown = source.refresh()
+    source.close()
+
+    assert idle['fetched_rows'] == 1
+    assert idle['version'] == first['version']
+    assert grown['version'] != first['version']
+
+
+# Test case for checking max_age skips refreshes of a recently refreshed mirror
+def test_refresh_max_age(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    add_rows(path, '2024-01-01', 5)
+    source = SQLSource(SQLiteBackend(path), LEDGER_SOURCE, cache_dir=str(tmp_path / 'cache'))
+    first = source.refresh()
+    add_rows(path, '2024-01-06', 1)
+    skipped = source.refresh(max_age=3600)
+    forced = source.refresh(full=True)
+    source.close()
+
+    assert not first['skipped']
+    assert skipped['skipped']
+    assert skipped['rows'] == 5
+    assert forced['fetched_rows'] == 6
+
+
+# Test case for checking a different spec gets its own mirror, fetched from scratch
+def test_spec_change_refetches(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    add_rows(path, '2024-01-01', 10)
+    cache_dir = str(tmp_path / 'cache')
+    first = SQLSource(SQLiteBackend(path), LEDGER_SOURCE, cache_dir=cache_dir)
+    first.refresh()
+    averaged = SQLSource(SQLiteBackend(path), {**LEDGER_SOURCE, 'measures': {'Debit EUR': 'AVG'}}, cache_dir=cache_dir)
+    stats = averaged.refresh()
+    frame = averaged.load()
+    first.close()
+    averaged.close()
+
+    assert averaged.path != first.path
+    assert stats['fetched_rows'] == 10
+    assert frame['Debit EUR'].iloc[0] == pytest.approx(10.0)
+
+
+# Test case for checking unknown aggregates are rejected
+def test_unknown_aggregate():
+    with pytest.raises(ValueError, match='Unknown aggregate'):
+        check_source({**PROPHET_SOURCE, 'measures': {'Cobalt Market Value (USD)': 'MEDIAN'}})
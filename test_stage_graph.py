@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from stage_graph import StageGraph
+
+
+# Function to build a three-stage pipeline that counts how often each stage runs
+def run_pipeline(graph, calls, source, folds, periods):
+    def stage(name, fn):
+        def wrapped(*args, **kwargs):
+            calls.append(name)
+            return fn(*args, **kwargs)
+        return wrapped
+
+    data = graph.run('load', stage('load', lambda source: pd.DataFrame({'y': list(source)})), source=source)
+    cv = graph.run('cv', stage('cv', lambda data, folds: len(data) * folds), inputs=['load'], folds=folds)
+    plot = graph.run('plot', stage('plot', lambda data, cv, periods: (cv, periods)), inputs=['load', 'cv'], periods=periods)
+    return data, cv, plot
+
+
+# Test case for checking a widget change only re-runs the stages downstream of it
+def test_only_invalidated_stages_rerun():
+    session = {}
+    calls = []
+    run_pipeline(StageGraph(session), calls, b'abc', 3, 12)
+    assert calls == ['load', 'cv', 'plot']
+
+    calls.clear()
+    graph = StageGraph(session)
+    assert run_pipeline(graph, calls, b'abc', 3, 20)[2] == (9, 20)
+    assert calls == ['plot']
+    assert graph.timings_frame()['status'].tolist() == ['cached', 'cached', 'ran']
+
+    calls.clear()
+    run_pipeline(StageGraph(session), calls, b'abc', 5, 20)
+    assert calls == ['cv', 'plot']
+
+    calls.clear()
+    run_pipeline(StageGraph(session), calls, b'abcd', 5, 20)
+    assert calls == ['load', 'cv', 'plot']
+
+
+# Test case for checking stages must run after the stages they read
+def test_missing_input_raises():
+    graph = StageGraph({})
+    with pytest.raises(KeyError):
+        graph.run('cv', lambda data: data, inputs=['load'])
+
+    graph.run('load', lambda: 1)
+    graph.invalidate('load')
+    with pytest.raises(KeyError):
+        graph.run('cv', lambda data: data, inputs=['load'])
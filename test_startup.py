@@ -0,0 +1,33 @@
+from jobs import JobScheduler
+from startup import APP_MODULES, prewarm, schedule_prewarm
+
+
+class FakeCache:
+    def __init__(self):
+        self.warmed = 0
+
+    def warm(self):
+        self.warmed += 1
+        return 0
+
+
+# Test case for checking prewarm imports the modules and warms the model cache
+def test_prewarm():
+    cache = FakeCache()
+    timings = prewarm(['json'], cache)
+    assert set(timings) == {'json', 'plotly_validators', 'model_cache'}
+    assert cache.warmed == 1
+
+
+# Test case for checking the hook runs once per app and only when switched on
+def test_schedule_prewarm(monkeypatch):
+    scheduler = JobScheduler(max_workers=1)
+    monkeypatch.delenv('FORECAST_PREWARM', raising=False)
+    assert schedule_prewarm(scheduler, 'catboost') is None
+
+    monkeypatch.setitem(APP_MODULES, 'catboost', ['json'])
+    monkeypatch.setenv('FORECAST_PREWARM', '1')
+    job = schedule_prewarm(scheduler, 'catboost')
+    assert schedule_prewarm(scheduler, 'catboost') is job
+    assert job.wait(30) and job.status == 'done' and job.progress == 1.0
+    scheduler.shutdown()
@@ -1,17 +1,11 @@
 import pytest
 import pandas as pd
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error, r2_score
-from sklearn.metrics import root_mean_squared_error  # Updated import
 import logging
+from forecasting import fit_prophet_models, make_predictions, calculate_metrics, predict_prophet_horizon
 
-# Configure logging
+# Stage timings come from instrumentation.span in forecasting.py; these messages only go
+# to pytest's log capture
 logger = logging.getLogger('ProphetLogger')
-logger.setLevel(logging.INFO)
-file_handler = logging.FileHandler('prophet_log.log')
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
 
 # Function to create data
@@ -35,47 +29,6 @@ def create_data():
     return df_supply, df_demand
 
 
-# Function to fit the Prophet models
-def fit_prophet_models(df_supply, df_demand):
-    logger.info("Fitting Prophet models")
-    supply_model = Prophet(yearly_seasonality=True, weekly_seasonality=True, seasonality_mode='multiplicative')
-    supply_model.fit(df_supply)
-
-    demand_model = Prophet(yearly_seasonality=True, weekly_seasonality=True, seasonality_mode='multiplicative')
-    demand_model.fit(df_demand)
-
-    logger.info("Prophet models fitting complete")
-    return supply_model, demand_model
-
-
-# Function to make predictions
-def make_predictions(supply_model, demand_model, forecast_horizon):
-    logger.info(f"Making predictions for forecast horizon: {forecast_horizon}")
-    future_supply = supply_model.make_future_dataframe(periods=forecast_horizon)
-    supply_forecast = supply_model.predict(future_supply)
-
-    future_demand = demand_model.make_future_dataframe(periods=forecast_horizon)
-    demand_forecast = demand_model.predict(future_demand)
-
-    logger.info("Predictions complete")
-    return supply_forecast, demand_forecast
-
-
-# Function to calculate metrics
-def calculate_metrics(merged_supply, merged_demand):
-    logger.info("Calculating metrics")
-    supply_mae = mean_absolute_error(merged_supply['y'], merged_supply['yhat'])
-    supply_rmse = root_mean_squared_error(merged_supply['y'], merged_supply['yhat'])  # Updated RMSE calculation
-    supply_r2 = r2_score(merged_supply['y'], merged_supply['yhat'])
-
-    demand_mae = mean_absolute_error(merged_demand['y'], merged_demand['yhat'])
-    demand_rmse = root_mean_squared_error(merged_demand['y'], merged_demand['yhat'])  # Updated RMSE calculation
-    demand_r2 = r2_score(merged_demand['y'], merged_demand['yhat'])
-
-    logger.info("Metrics calculation complete")
-    return supply_mae, supply_rmse, supply_r2, demand_mae, demand_rmse, demand_r2
-
-
 # Test case for checking the creation of data
 def test_create_data():
     logger.info("Testing data creation")
@@ -119,6 +72,39 @@ def test_make_predictions_and_metrics():
     logger.info("Forecasting and metrics calculation test passed")
 
 
+# Test case for checking fast mode gives the same point forecasts as full mode
+def test_fast_predictions_match_full():
+    logger.info("Testing fast prediction mode")
+    df_supply, df_demand = create_data()
+    supply_model, demand_model = fit_prophet_models(df_supply, df_demand, store_fitted=True)
+
+    full_supply, full_demand = make_predictions(supply_model, demand_model, 5)
+    fast_supply, fast_demand = make_predictions(supply_model, demand_model, 5, mode='fast')
+
+    assert list(fast_supply['ds']) == list(full_supply['ds']), "Fast mode dates differ from full mode"
+    assert ((fast_supply['yhat'] - full_supply['yhat']).abs() < 1e-6).all(), "Fast supply forecast differs"
+    assert ((fast_demand['yhat'] - full_demand['yhat']).abs() < 1e-6).all(), "Fast demand forecast differs"
+    assert (fast_supply['yhat_lower'] <= fast_supply['yhat_upper']).all(), "Fast intervals are inverted"
+    assert supply_model.fitted_values_ is not None, "In-sample fitted values were not cached"
+    logger.info("Fast prediction mode test passed")
+
+
+# Test case for checking horizon-only prediction returns just the future dates
+def test_predict_prophet_horizon():
+    logger.info("Testing horizon-only prediction")
+    df_supply, df_demand = create_data()
+    supply_model, _ = fit_prophet_models(df_supply, df_demand)
+
+    horizon = predict_prophet_horizon(supply_model, 3, intervals=None)
+    assert len(horizon) == 3, "Horizon length mismatch"
+    assert (horizon['ds'] > df_supply['ds'].max()).all(), "Horizon includes history dates"
+    assert 'yhat_lower' not in horizon, "Intervals returned when disabled"
+
+    sampled = predict_prophet_horizon(supply_model, 3, intervals='sample', n_samples=20)
+    assert (sampled['yhat_lower'] <= sampled['yhat_upper']).all(), "Sampled intervals are inverted"
+    logger.info("Horizon-only prediction test passed")
+
+
 # Run tests with pytest
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+import parallel_training
+import tuning
+from model_cache import ModelCache
+from parallel_training import cv_catboost_target
+from tuning import SEARCH_SPACE, load_tuned, rung_schedule, sample_trials, successive_halving, tune_cached
+
+FEATURES = ['Vendor Quality History', 'Vendor Consistency']
+BASE_PARAMS = {'iterations': 40, 'depth': 4, 'learning_rate': 0.1, 'loss_function': 'RMSE', 'verbose': 0}
+SPACE = {'depth': [2, 4], 'learning_rate': [0.05, 0.3], 'l2_leaf_reg': [3]}
+
+
+# Function to create a small noisy training frame
+def create_frame(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    quality = rng.uniform(0.5, 1.0, rows)
+    consistency = rng.uniform(0.5, 1.0, rows)
+    return pd.DataFrame({'Vendor Quality History': quality, 'Vendor Consistency': consistency,
+                         'Debit EUR': 1000 * quality + rng.normal(0, 50, rows)})
+
+
+# Test case for checking the trials cover the grid or a reproducible sample of it
+def test_sample_trials():
+    grid = sample_trials()
+    assert len(grid) == np.prod([len(values) for values in SEARCH_SPACE.values()])
+    assert sample_trials(n_trials=5, seed=1) == sample_trials(n_trials=5, seed=1)
+    assert len(sample_trials(n_trials=5)) == 5
+
+
+# Test case for checking CV stops once the test loss stops improving
+def test_cv_early_stopping():
+    frame = create_frame()
+    params = {**BASE_PARAMS, 'iterations': 500, 'learning_rate': 0.5}
+    results = cv_catboost_target(frame[FEATURES], frame['Debit EUR'], params, 3, early_stopping_rounds=10)
+    assert len(results) < 500
+
+
+# Test case for checking each rung keeps the best 1/eta of the trials with eta times the iterations
+def test_successive_halving():
+    frame = create_frame()
+    params, trials = successive_halving(frame[FEATURES], frame['Debit EUR'], BASE_PARAMS, fold_count=3, space=SPACE,
+                                        min_iterations=10, max_iterations=40, eta=2, early_stopping_rounds=5,
+                                        max_workers=1)
+    assert rung_schedule(4, 10, 40, 2) == [(4, 10), (2, 20), (1, 40)]
+    first = trials[trials['rung'] == 0]
+    assert len(first) == 4
+    for rung, size in ((1, 2), (2, 1)):
+        ran = trials[trials['rung'] == rung]
+        assert len(ran) <= size
+        assert (ran['iterations'] == 10 * 2 ** rung).all()
+        # Trials that stopped early are not run (or recorded) again
+        earlier = trials[trials['rung'] < rung]
+        assert not set(ran['trial']) & set(earlier[earlier['stopped_early']]['trial'])
+    survivors = trials[trials['rung'] == 1]['trial'].tolist()
+    assert set(survivors) <= set(first.nsmallest(2, 'score')['trial'])
+    best = trials.drop_duplicates('trial', keep='last').nsmallest(1, 'score').iloc[0]
+    assert {k: params[k] for k in SPACE} == {k: best[k] for k in SPACE}
+    assert params['iterations'] == best['best_iteration'] + 1 <= best['iterations']
+
+
+# Test case for checking a trial that stopped early is carried to the next rung without
+# being run or recorded there again
+def test_successive_halving_carries_stopped_trials():
+    frame = create_frame()
+    params, trials = successive_halving(frame[FEATURES], frame['Debit EUR'], BASE_PARAMS, fold_count=3, space=SPACE,
+                                        min_iterations=10, max_iterations=40, eta=2, early_stopping_rounds=1,
+                                        max_workers=1)
+    stopped = trials[trials['stopped_early']]
+    assert len(stopped) == 1 and stopped['rung'].iloc[0] == 1
+    assert trials.groupby('rung')['trial'].count().tolist() == [4, 2]
+    assert params['iterations'] == stopped['best_iteration'].iloc[0] + 1
+
+
+# Test case for checking the search reports progress that only moves forward, rung by rung
+def test_successive_halving_progress(monkeypatch):
+    reported = []
+    recorder = lambda fraction, message='': reported.append(fraction)
+    monkeypatch.setattr(tuning, 'report_progress', recorder)
+    monkeypatch.setattr(parallel_training, 'report_progress', recorder)
+    frame = create_frame()
+    successive_halving(frame[FEATURES], frame['Debit EUR'], BASE_PARAMS, fold_count=3, space=SPACE,
+                       min_iterations=10, max_iterations=40, eta=2, max_workers=1)
+
+    assert reported == sorted(reported)
+    assert len(set(reported)) > 3
+    assert reported[0] == 0.0 and reported[-1] <= 1.0
+
+
+# Test case for checking tuned params are stored per dataset and reused without searching again
+def test_tune_cached(tmp_path):
+    cache = ModelCache(str(tmp_path))
+    frame = create_frame()
+    options = {'fold_count': 3, 'space': SPACE, 'min_iterations': 10, 'max_iterations': 20, 'max_workers': 1}
+    assert load_tuned(cache, frame, 'Debit EUR', FEATURES, BASE_PARAMS) is None
+
+    params, trials = tune_cached(cache, frame, 'Debit EUR', FEATURES, BASE_PARAMS, frame[FEATURES], frame['Debit EUR'], **options)
+    assert trials is not None
+    assert tune_cached(cache, frame, 'Debit EUR', FEATURES, BASE_PARAMS, None, None, **options) == (params, None)
+    assert load_tuned(ModelCache(str(tmp_path)), frame, 'Debit EUR', FEATURES, BASE_PARAMS) == params
+    assert load_tuned(cache, create_frame(seed=1), 'Debit EUR', FEATURES, BASE_PARAMS) is None
@@ -0,0 +1,124 @@
+import itertools
+import logging
+import random
+import time
+
+import pandas as pd
+
+from jobs import check_cancelled, report_progress
+from model_cache import make_cache_key
+from parallel_training import cv_catboost_target, run_parallel
+
+logger = logging.getLogger('Tuning')
+
+SEARCH_SPACE = {
+    'depth': [4, 6, 8],
+    'learning_rate': [0.03, 0.1, 0.3],
+    'l2_leaf_reg': [1, 3, 10],
+}
+# Successive halving: every trial gets MIN_ITERATIONS, then the best 1/ETA of them get ETA
+# times as many, until one is left or the iteration budget reaches MAX_ITERATIONS
+MIN_ITERATIONS = 60
+MAX_ITERATIONS = 500
+ETA = 3
+EARLY_STOPPING_ROUNDS = 50
+TRIAL_COLUMNS = ['rung', 'iterations', 'trial'] + list(SEARCH_SPACE) + ['score', 'best_iteration', 'stopped_early']
+
+
+# Function to list the configurations to try: the whole grid, or n_trials of it at random
+def sample_trials(space=SEARCH_SPACE, n_trials=None, seed=0):
+    names = list(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if n_trials is None or n_trials >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, n_trials)
+
+
+# Function run in a worker: cross-validate one configuration with early stopping and
+# report its best mean test loss and the iteration it was reached at
+def cv_trial(X, y, params, fold_count, early_stopping_rounds=EARLY_STOPPING_ROUNDS, threads=1):
+    results = cv_catboost_target(X, y, params, fold_count, threads, early_stopping_rounds)
+    scores = results[[c for c in results.columns if c.startswith('test-') and c.endswith('-mean')][0]]
+    best = int(scores.idxmin())
+    return {'score': float(scores.iloc[best]), 'best_iteration': int(results['iterations'].iloc[best]),
+            'stopped_early': len(results) < params['iterations']}
+
+
+# Function to list each rung's (trial count, iterations): every trial at min_iterations, then
+# the best 1/eta of them at eta times as many, until one is left or max_iterations is reached
+def rung_schedule(n_trials, min_iterations=MIN_ITERATIONS, max_iterations=MAX_ITERATIONS, eta=ETA):
+    size, iterations = n_trials, min(min_iterations, max_iterations)
+    schedule = [(size, iterations)]
+    while size > 1 and iterations < max_iterations:
+        size, iterations = max(1, size // eta), min(iterations * eta, max_iterations)
+        schedule.append((size, iterations))
+    return schedule
+
+
+# Function to search depth, learning rate and l2_leaf_reg by successive halving. Each rung's
+# trials run together in the process pool within total_threads; a trial that stopped early
+# already has its final score and is not run again at the next rung; the trials frame has
+# one row per trial run, so such a trial has no rows for the later rungs.
+# Returns (best params with iterations set to the best trial's best iteration, trials frame).
+def successive_halving(X, y, base_params, fold_count=3, space=SEARCH_SPACE, n_trials=None, min_iterations=MIN_ITERATIONS,
+                       max_iterations=MAX_ITERATIONS, eta=ETA, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                       max_workers=None, total_threads=None, seed=0):
+    configs = sample_trials(space, n_trials, seed)
+    schedule = rung_schedule(len(configs), min_iterations, max_iterations, eta)
+    # Progress is the share of the planned trial iterations in finished rungs and trials
+    total_work = sum(size * iterations for size, iterations in schedule)
+    survivors = list(range(len(configs)))
+    results = {}
+    rows = []
+    done_work = 0
+    for rung, (size, iterations) in enumerate(schedule):
+        check_cancelled()
+        if rung:
+            survivors = sorted(survivors, key=lambda trial: results[trial]['score'])[:size]
+        tasks = {
+            trial: (cv_trial, {'X': X, 'y': y, 'params': {**base_params, **configs[trial], 'iterations': iterations},
+                               'fold_count': fold_count, 'early_stopping_rounds': early_stopping_rounds})
+            for trial in survivors if trial not in results or not results[trial]['stopped_early']
+        }
+        progress_range = (done_work / total_work, (done_work + size * iterations) / total_work)
+        report_progress(progress_range[0],
+                        f"Rung {rung + 1}/{len(schedule)}: {len(tasks)} trial(s) x {iterations} iterations")
+        results.update(run_parallel(tasks, max_workers, total_threads, progress_range=progress_range))
+        rows.extend({'rung': rung, 'iterations': iterations, 'trial': trial, **configs[trial], **results[trial]}
+                    for trial in tasks)
+        done_work += size * iterations
+
+    best = min(survivors, key=lambda trial: results[trial]['score'])
+    params = {**base_params, **configs[best], 'iterations': results[best]['best_iteration'] + 1}
+    logger.info(f"Best of {len(configs)} trials: {configs[best]} with score {results[best]['score']:.4f} "
+                f"at {params['iterations']} iterations")
+    return params, pd.DataFrame(rows, columns=TRIAL_COLUMNS[:3] + list(space) + TRIAL_COLUMNS[-3:])
+
+
+# Function to build the key tuned params are stored under: the training rows' hash, the
+# target and features, and the params the search started from
+def tuning_key(frame, target, features, base_params):
+    return make_cache_key('params', frame, target, features, {'base': base_params})
+
+
+# Function to return the stored tuned params for this dataset, or None if it was never tuned
+def load_tuned(cache, frame, target, features, base_params):
+    stored = cache.get(tuning_key(frame, target, features, base_params), 'params')
+    return None if stored is None else stored['params']
+
+
+# Function to return the tuned params for a dataset, running the search only the first time.
+# X and y (frames or feature store handles) are the training rows the search cross-validates on.
+# Returns (params, trials frame or None when the stored result was used).
+def tune_cached(cache, frame, target, features, base_params, X, y, **options):
+    key = tuning_key(frame, target, features, base_params)
+    stored = cache.get(key, 'params')
+    if stored is not None:
+        logger.info(f"Using tuned params for {target} from {stored['tuned_seconds']:.1f}s search")
+        return stored['params'], None
+
+    start = time.perf_counter()
+    params, trials = successive_halving(X, y, base_params, **options)
+    cache.put(key, 'params', {'params': params, 'score': float(trials['score'].min()), 'trials': len(trials),
+                              'tuned_seconds': time.perf_counter() - start})
+    return params, trials